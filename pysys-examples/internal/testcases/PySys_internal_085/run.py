@@ -0,0 +1,34 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.filediff import filediff
+
+class PySysTest(BaseTest):
+	def execute(self):
+		with open(self.output+'/ref.txt', 'w') as f:
+			for i in range(50000): f.write('line %06d\n'%i)
+		with open(self.output+'/similar.txt', 'w') as f:
+			for i in range(50000): f.write('line %06d\n'%i if i not in [10, 40000] else 'changed %06d\n'%i)
+		with open(self.output+'/different.txt', 'w') as f:
+			for i in range(50000): f.write('other %06d\n'%i)
+
+		self.assertThat('%s == False', filediff(self.output+'/similar.txt', self.output+'/ref.txt', sort=False,
+			unifiedDiffOutput=self.output+'/similar.diff'))
+		self.assertThat('%s == False', filediff(self.output+'/different.txt', self.output+'/ref.txt', sort=False,
+			unifiedDiffOutput=self.output+'/different.diff', diffMaxEdits=100))
+		self.assertThat('%s == False', filediff(self.output+'/similar.txt', self.output+'/ref.txt', sort=False,
+			unifiedDiffOutput=self.output+'/similar-onehunk.diff', diffMaxHunks=1))
+
+	def validate(self):
+		self.assertOrderedGrep('similar.diff', exprList=[
+			'^--- ref.txt [(]50000 lines[)]', '^[+][+][+] similar.txt [(]50000 lines[)]', 
+			'^@@ -8,7 [+]8,7 @@', '^-line 000010', '^[+]changed 000010', 
+			'^@@ -39998,7 [+]39998,7 @@', '^-line 040000', '^[+]changed 040000'])
+		self.assertLineCount('similar.diff', expr='^[-+][^-+]', condition='==4')
+		self.assertGrep('similar.diff', expr='truncated', contains=False)
+		
+		self.assertLineCount('different.diff', expr='^-line', condition='==100')
+		self.assertLineCount('different.diff', expr='^[+]other', condition='==100')
+		self.assertLastGrep('different.diff', expr='^[.][.][.] diff truncated as the files differ by more than 100 lines')
+
+		self.assertLineCount('similar-onehunk.diff', expr='^@@', condition='==1')
+		self.assertLastGrep('similar-onehunk.diff', expr='^[.][.][.] diff truncated after 1 hunks')
@@ -0,0 +1,37 @@
+import io
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.filegrep import lastgrep
+from pysys.utils.fileutils import readlinesreverse
+from pysys.utils.pycompat import openfile
+
+class PySysTest(BaseTest):
+	def execute(self):
+		with io.open(self.output+'/big.txt', 'w', encoding='utf-8', newline='\r\n') as f:
+			for i in range(200000): f.write(u'line %06d\n'%i)
+			f.write(u'Caf\xe9 ignored trailer\n')
+			f.write(u'no final newline')
+		
+		with openfile(self.output+'/big.txt', 'r', encoding='utf-8') as f:
+			expected = f.readlines()
+		for blockSize in [7, 1000, 64*1024]:
+			self.assertThat('%s', list(reversed(list(readlinesreverse(self.output+'/big.txt', 
+				encoding='utf-8', blockSize=blockSize))))==expected)
+		
+		# bare \r line endings, and \r\n pairs split across a block boundary
+		with open(self.output+'/mixed.txt', 'wb') as f:
+			f.write(b'\r\rone\rtwo\r\nthree\nfour\r\n\r\nfive\r')
+		with openfile(self.output+'/mixed.txt', 'r', encoding='utf-8') as f:
+			expected = f.readlines()
+		self.log.info('Mixed line endings: %r', expected)
+		for blockSize in [1, 2, 3, 5, 1000]:
+			self.assertThat('%s', list(reversed(list(readlinesreverse(self.output+'/mixed.txt', 
+				encoding='utf-8', blockSize=blockSize))))==expected)
+
+	def validate(self):
+		f = self.output+'/big.txt'
+		self.assertThat('%s', lastgrep(f, 'no final newline', encoding='utf-8'))
+		self.assertThat('%s', lastgrep(f, '^line 199999$', ignore=['ignored', 'no final'], encoding='utf-8'))
+		self.assertThat('%s', lastgrep(f, '^Caf\xe9', ignore=['no final'], encoding='utf-8'))
+		self.assertThat('%s', lastgrep(f, '^line 000019$', include=['^line 0000[01]'], encoding='utf-8'))
+		self.assertThat('not %s', lastgrep(f, 'line', include=['does not match'], encoding='utf-8'))
@@ -0,0 +1,24 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.filegrep import orderedgrep
+
+class PySysTest(BaseTest):
+	def execute(self):
+		with open(self.output+'/events.log', 'w') as f:
+			for i in range(100000): f.write('event %06d\n'%i)
+		
+		self.assertOrderedGrep('events.log', exprList=['event 000010', 'event 050000$', 'event 099999'])
+		self.assertOrderedGrep('events.log', exprList=['event 050000', 'event 000010'], contains=False)
+		
+		self.assertOrderedGrep('events.log', exprList=['event 000010', 'event 050000$', 'event 000020', 'event 099999'])
+		self.failureReason = self.getOutcomeReason()
+		del self.outcome[:]
+		
+		self.matched = []
+		self.result = orderedgrep(self.output+'/events.log', ['event 00001', 'event 0000[12]'], matchedLines=self.matched)
+		
+	def validate(self):
+		self.assertThat('%r == %r', self.failureReason, 
+			'Ordered grep on input file events.log failed on expression "event 000020" (3 of 4) after matching the previous expression at line 50001')
+		self.assertThat('%r == None', self.result)
+		self.assertThat('%r == %r', self.matched, [(11, 'event 000010'), (12, 'event 000011')])
@@ -0,0 +1,59 @@
+from pysys.exceptions import *
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.filecopy import filecopy
+
+class PySysTest(BaseTest):
+	def execute(self):
+		for i in range(8):
+			with open(self.output+'/file%d.txt'%i, 'w') as f:
+				for j in range(20000): f.write('file %d line %06d\n'%(i, j))
+
+		# the first assertion is the slowest, so would complete last if outcomes were not gathered in order
+		self.submitAssertion(self.assertLineCount, 'file0.txt', expr='line', condition='==20000', assertMessage='Assertion 0')
+		for i in range(1, 8):
+			self.submitAssertion(self.assertGrep, 'file%d.txt'%i, expr='file %d line 019999'%i, assertMessage='Assertion %d'%i)
+		self.submitAssertion(self.assertGrep, 'file1.txt', expr='not there', assertMessage='Assertion 8')
+		self.submitAssertion(self.assertThat, '%s == 1', 1)
+		self.gatherAssertions()
+		self.gatheredOutcomes = list(self.outcome)
+		self.gatheredReason = self.getOutcomeReason()
+		
+		# exceptions abort the test once the outcomes of all the submitted assertions have been added
+		def badAssertion(): raise Exception('Simulated error')
+		del self.outcome[:]
+		self.submitAssertion(badAssertion)
+		self.submitAssertion(self.assertGrep, 'file1.txt', expr='not there', assertMessage='After exception')
+		try:
+			self.gatherAssertions()
+		except AbortExecution as e:
+			self.exception = (e.outcome, e.value, e.callRecord)
+		self.outcomesBeforeException = list(self.outcome)
+		
+		# abortOnError takes effect when gathered, after earlier assertions
+		del self.outcome[:]
+		try:
+			self.submitAssertion(self.assertGrep, 'file1.txt', expr='file 1', assertMessage='Before abort')
+			self.submitAssertion(self.assertGrep, 'file1.txt', expr='not there', assertMessage='Abort here', abortOnError=True)
+			self.submitAssertion(self.assertGrep, 'file1.txt', expr='file 1', assertMessage='After abort')
+			self.gatherAssertions()
+		except AbortExecution as e:
+			self.abortReason = e.value
+		del self.outcome[:]
+		
+		# assertions not gathered by the test are gathered during cleanup
+		self.submitAssertion(self.assertThat, '%s == 1', 1)
+		filecopy(os.path.join(self.output, 'run.log'), os.path.join(self.output, 'run.log.proc'))
+
+	def validate(self):
+		self.assertThat('%s == %s', self.gatheredOutcomes, [PASSED]*8+[FAILED, PASSED])
+		self.assertThat('%r == %r', self.gatheredReason, 'Assertion 8')
+		self.assertThat('%r == %r', self.exception, (BLOCKED, 'Submitted assertion badAssertion raised Exception: Simulated error', ['run.py:25']))
+		self.assertThat('%r == %r', self.outcomesBeforeException, [FAILED])
+		self.assertThat('%r == %r', self.abortReason, 'Abort here')
+
+		self.assertOrderedGrep('run.log.proc', exprList=['Assertion %d ... passed'%i for i in range(8)]+
+			['Assertion 8 ... failed \\[run.py:16\\]', 'Assertion on 1 == 1 ... passed', 'caught .*Exception.* from submitted assertion: Simulated error', 
+			'After exception ... failed', 'Before abort ... passed'])
+		self.assertGrep('run.log.proc', expr='Abort here', contains=False) # logged when the test is aborted, not from the worker thread
+		self.assertGrep('run.log.proc', expr='After abort', contains=False)
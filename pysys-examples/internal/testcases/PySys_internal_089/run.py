@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.writer import XMLResultsWriter
+from xml.dom import minidom
+
+class MockTest(object):
+	class descriptor(object): pass
+	def __init__(self, id, outcome, reason, output):
+		self.descriptor = MockTest.descriptor()
+		self.descriptor.id, self.descriptor.file = id, output+'/pysystest.xml'
+		self.output, self.outcome, self.reason = output, outcome, reason
+	def getOutcome(self): return self.outcome
+	def getOutcomeReason(self): return self.reason
+
+class PySysTest(BaseTest):
+	def execute(self):
+		writer = XMLResultsWriter('testsummary.xml')
+		writer.outputDir = self.output
+		writer.streaming = 'true'
+		writer.setup(numTests=6, cycles=2, xargs={'foo':'bar'})
+		self.documents = [minidom.parse(self.output+'/testsummary.xml')]
+		for cycle in range(2):
+			for i, outcome in enumerate([PASSED, FAILED, BLOCKED]):
+				writer.processResult(MockTest('Test_%d'%i, outcome, u'Reason <&> caf\xe9' if outcome != PASSED else '', self.output), 
+					cycle=cycle, testStart=0, testTime=1)
+				self.documents.append(minidom.parse(self.output+'/testsummary.xml'))
+		writer.cleanup()
+		self.documents.append(minidom.parse(self.output+'/testsummary.xml'))
+
+	def validate(self):
+		self.assertThat('%d == 8', len(self.documents))
+		for i, doc in enumerate(self.documents[:-1]):
+			root = doc.documentElement
+			self.assertThat('%r == %r', (root.getAttribute('status'), root.getAttribute('completed'), len(root.getElementsByTagName('result'))), 
+				('running', '%d/6'%i, i))
+		root = self.documents[-1].documentElement
+		self.assertThat('%r == %r', (root.getAttribute('status'), root.getAttribute('completed')), ('complete', '6/6'))
+		self.assertThat('%r == %r', [r.getAttribute('cycle') for r in root.getElementsByTagName('results')], ['1', '2'])
+		self.assertThat('%r == %r', [r.getAttribute('outcome') for r in root.getElementsByTagName('result')], 
+			['PASSED', 'FAILED', 'BLOCKED']*2)
+		self.assertThat('%r == %r', root.getElementsByTagName('outcomeReason')[1].firstChild.data, u'Reason <&> caf\xe9')
+		self.assertThat('%r == %r', root.getElementsByTagName('xarg')[0].getAttribute('value'), 'bar')
+		self.assertGrep('testsummary.xml', expr='<[?]xml-stylesheet href=".*" type="text/xsl"[?]>')
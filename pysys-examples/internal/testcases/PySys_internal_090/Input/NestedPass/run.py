@@ -0,0 +1,9 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.exceptions import *
+
+class PySysTest(BaseTest):
+	def execute(self):
+		self.addOutcome(PASSED)
+	def validate(self):
+		pass 
@@ -0,0 +1,23 @@
+import threading
+from pysys.constants import *
+from pysys.writer import BaseRecordResultsWriter
+
+class ThreadRecordingWriter(BaseRecordResultsWriter):
+	def __init__(self, logfile):
+		self.logfile = logfile
+	
+	def setup(self, **kwargs):
+		self.fp = open(self.logfile, 'w')
+		self.fp.write('setup: %s\n'%threading.current_thread().name)
+		
+	def processResult(self, testObj, cycle=0, **kwargs):
+		self.fp.write('processResult: %s %s %d %s %s %r\n'%(threading.current_thread().name, testObj.descriptor.id, cycle+1, 
+			LOOKUP[testObj.getOutcome()], os.path.basename(testObj.output), testObj))
+
+	def cleanup(self, **kwargs):
+		self.fp.write('cleanup: %s\n'%threading.current_thread().name)
+		self.fp.close()
+
+class FailingWriter(BaseRecordResultsWriter):
+	def processResult(self, testObj, **kwargs):
+		raise Exception('Simulated writer failure for %s'%testObj.descriptor.id)
@@ -0,0 +1,30 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from xml.dom import minidom
+import os, sys, shutil
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		runPySys(self, 'pysys', ['run', '-o', self.output+'/myoutdir', '--record', '--cycle', '2', '-n', '2'], workingDir='test', ignoreExitStatus=True)
+		self.logFileContents('pysys.out', maxLines=0)
+			
+	def validate(self):
+		self.assertLineCount('pysys.out', expr='Traceback', condition='==4')
+		self.assertLineCount('pysys.out', expr='caught .*Exception.* processing test result by FailingWriter: Simulated writer failure for Nested(Pass|Fail)', condition='==4')
+
+		self.assertOrderedGrep('test/threads.txt', exprList=['setup: MainThread'] + 
+			['processResult: writer-ThreadRecordingWriter Nested'] * 4 + ['cleanup: MainThread'])
+		self.assertLineCount('test/threads.txt', expr='processResult: .* Nested(Pass|Fail) [12] (PASSED|FAILED) cycle[12] TestResult[(]Nested(Pass|Fail), cycle=[12], (PASSED|FAILED)[)]', condition='==4')
+		self.assertLineCount('test/threads-foreground.txt', expr='processResult: MainThread', condition='==4')
+		
+		doc = minidom.parse(self.output+'/test/testsummary.xml')
+		self.assertThat('%r == %r', doc.documentElement.getAttribute('status'), 'complete')
+		self.assertThat('%d == 4', len(doc.getElementsByTagName('result')))
+		self.assertGrep('test/target/pysys-reports/TEST-NestedFail.2.xml', expr='<failure message="FAILED">')
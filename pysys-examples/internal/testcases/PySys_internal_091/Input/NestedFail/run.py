@@ -0,0 +1,9 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.exceptions import *
+
+class PySysTest(BaseTest):
+	def execute(self):
+		self.addOutcome(FAILED) # try one with no outcome reason
+	def validate(self):
+		pass 
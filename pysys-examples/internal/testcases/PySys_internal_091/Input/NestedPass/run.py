@@ -0,0 +1,10 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.exceptions import *
+
+class PySysTest(BaseTest):
+	def execute(self):
+		self.reportPerformanceResult(1000, 'Sample throughput', '/s')
+		self.addOutcome(PASSED)
+	def validate(self):
+		pass
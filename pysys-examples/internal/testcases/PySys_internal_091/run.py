@@ -0,0 +1,35 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.writer import readJSONLinesResults
+import os, sys, shutil
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		runPySys(self, 'pysys', ['run', '-o', self.output+'/myoutdir', '--record', '--cycle', '2'], workingDir='test', ignoreExitStatus=True)
+			
+	def validate(self):
+		self.assertGrep('pysys.out', expr='(Traceback.*|caught .*)', contains=False)
+		self.assertLineCount('test/testsummary.jsonl', expr='^[{].*[}]$', condition='==4')
+		
+		path = self.output+'/test/testsummary.jsonl'
+		results = list(readJSONLinesResults(path))
+		self.assertThat('%r == %r', [(r['id'], r['cycle'], r['outcome']) for r in results], 
+			[('NestedFail', 1, 'FAILED'), ('NestedPass', 1, 'PASSED'), ('NestedFail', 2, 'FAILED'), ('NestedPass', 2, 'PASSED')])
+		r = results[1]
+		self.assertThat('%r == %r', sorted(r.keys()), sorted(['id', 'title', 'cycle', 'outcome', 'outcomeReason', 'startTime', 
+			'duration', 'output', 'host', 'performanceResults']))
+		self.assertThat('%r == %r', r['performanceResults'], [{'resultKey':'Sample throughput', 'value':1000, 'unit':'/s', 'biggerIsBetter':True}])
+		self.assertThat('%r == %r', os.path.normpath(r['output']), os.path.normpath(self.output+'/myoutdir/NestedPass/cycle1'))
+		self.assertThat('%s >= 0', r['duration'])
+		self.assertThat('%s > 0', r['startTime'])
+		
+		self.assertThat('%r == %r', [(r['id'], r['cycle']) for r in readJSONLinesResults(path, outcomes=['FAILED'], cycles=[2])], [('NestedFail', 2)])
+		self.assertThat('%r == %r', [(r['id'], r['cycle']) for r in readJSONLinesResults(path, ids=['NestedPass'], 
+			filter=lambda r: r['cycle'] == 1)], [('NestedPass', 1)])
@@ -0,0 +1,10 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+
+class PySysTest(BaseTest):
+	def execute(self):
+		for i in range(2000):
+			self.log.info('Log line %d with <special> & "awkward" characters\x01', i)
+		self.addOutcome(FAILED, 'Failed because 1 < 2 & "quotes"')
+	def validate(self):
+		pass 
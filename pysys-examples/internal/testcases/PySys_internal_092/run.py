@@ -0,0 +1,45 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import os, shutil
+from xml.dom.minidom import parse
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		runPySys(self, 'pysys', ['run', '-o', self.output+'/myoutdir', '--record'], workingDir='test', ignoreExitStatus=True)
+		self.logFileContents('pysys.out', maxLines=0)
+			
+	def validate(self):
+		self.assertGrep('pysys.out', expr='(Traceback.*|caught .*)', contains=False)
+		
+		# all files must be well-formed XML
+		for f in ['reports/TEST-NestedFail.xml', 'reports/TEST-NestedPass.xml', 'single/all-results.xml']:
+			parse(self.output+'/test/'+f).unlink()
+		self.assertThat('%d == 1', len(os.listdir(self.output+'/test/single')))
+		
+		# the run.log is over 100KB, so only the last part should be included
+		self.assertThat('%d < 5000', os.path.getsize(self.output+'/test/reports/TEST-NestedFail.xml'))
+		self.assertOrderedGrep('test/reports/TEST-NestedFail.xml', exprList=[
+			'<testsuite failures="1" name="NestedFail" skipped="0" tests="1">',
+			'<failure message="FAILED">Failed because 1 &lt; 2 &amp; "quotes"</failure>',
+			'<system-out>[.][.][.] run.log truncated, showing the last [0-9]+ of [0-9]+ bytes [.][.][.]', 
+			'^[^<]*Log line 1999 with &lt;special&gt; &amp; "awkward" characters[?]$',
+			'</system-out>'
+			])
+		self.assertGrep('test/reports/TEST-NestedFail.xml', expr='Log line 1000 ', contains=False)
+		self.assertGrep('test/reports/TEST-NestedPass.xml', expr='<testcase classname="PySysTest" name="NestedPass"/>')
+
+		self.assertOrderedGrep('test/single/all-results.xml', exprList=[
+			'<testsuite failures="1" name="pysys" skipped="0" tests="2" *>',
+			'<testcase classname="PySysTest" name="NestedFail">',
+			'Log line 0 with',
+			'Log line 1999 with',
+			'<testcase classname="PySysTest" name="NestedPass"/>',
+			'</testsuite>',
+			])
@@ -0,0 +1,79 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.fileutils import mkdir, deletedir, BackgroundDeleter
+import os, glob
+
+class PySysTest(BaseTest):
+
+	def createTree(self, dir, files=20):
+		for d in ['', 'a', 'a/b', 'a/b/c', 'd']:
+			mkdir(os.path.join(dir, d))
+			for i in range(files):
+				with open(os.path.join(dir, d, 'file%d.txt'%i), 'w') as f: f.write('x')
+		return dir
+
+	def execute(self):
+		self.deleter = BackgroundDeleter(threads=2)
+		
+		# a file outside the trees, that must not be deleted via a symlink
+		self.createTree(self.output+'/keep', files=1)
+		
+		self.trees = [self.createTree(self.output+'/purge%d'%i) for i in range(5)]
+		if hasattr(os, 'symlink'):
+			os.symlink(self.output+'/keep', self.trees[0]+'/a/link')
+		for t in self.trees: self.deleter.purge(t)
+		
+		# the directory is immediately available and empty
+		self.emptyAfterPurge = [os.listdir(t) for t in self.trees]
+		
+		self.createTree(self.output+'/deltop')
+		self.deleter.purge(self.output+'/deltop', delTop=True)
+		self.deltopExistsAfterPurge = os.path.exists(self.output+'/deltop')
+		
+		self.deleter.purge(self.output+'/does-not-exist')
+		
+		if hasattr(os, 'symlink'):
+			# a symlinked directory has the contents of its target purged, leaving the link in place
+			self.createTree(self.output+'/linktarget')
+			os.symlink(self.output+'/linktarget', self.output+'/linked')
+			self.deleter.purge(self.output+'/linked')
+			self.linkedAfterPurge = (os.path.islink(self.output+'/linked'), os.listdir(self.output+'/linktarget'))
+			self.deleter.purge(self.output+'/linked', delTop=True)
+			self.linkedAfterDelTop = (os.path.lexists(self.output+'/linked'), os.path.isdir(self.output+'/linktarget'))
+		
+		# directories left aside by an earlier process are deleted when the directory is next purged
+		self.createTree(self.output+'/stale')
+		self.createTree(self.output+'/stale.deleting-0123456789ab')
+		self.createTree(self.output+'/stale.deleting-other')
+		self.deleter.purge(self.output+'/stale')
+		
+		self.failures = self.deleter.wait()
+		
+		self.createTree(self.output+'/sync')
+		deletedir(self.output+'/sync')
+		
+	def validate(self):
+		for t in self.emptyAfterPurge: self.assertThat('%s == []', repr(t))
+		self.assertThat('%s == False', self.deltopExistsAfterPurge)
+		self.assertThat('%s == []', repr(self.failures))
+		self.assertThat('%s == []', repr(glob.glob(self.output+'/*.deleting-????????????')))
+		self.assertThat('%s == True', os.path.isdir(self.output+'/stale.deleting-other'))
+		self.assertThat('%s == []', repr(os.listdir(self.output+'/stale')))
+		if hasattr(os, 'symlink'):
+			self.assertThat('%r == (True, [])', self.linkedAfterPurge)
+			self.assertThat('%r == (False, True)', self.linkedAfterDelTop)
+		self.assertThat('%d == 5', sum(len(files) for _, _, files in os.walk(self.output+'/keep')))
+		self.assertThat('%s == False', os.path.exists(self.output+'/sync'))
+		self.assertThat('%s == False', os.path.exists(self.output+'/does-not-exist'))
+		
+		# failures are reported rather than raised
+		self.deleter.purge(self.output+'/purge1')
+		self.deleter.purge(self.output+'/purge1')
+		try:
+			deletedir(self.output+'/does-not-exist')
+		except OSError as ex:
+			self.log.info('Got expected exception: %s', ex)
+		else:
+			self.addOutcome(FAILED, 'Expected deletedir to raise OSError')
+		self.assertThat('%s == []', repr(self.deleter.wait()))
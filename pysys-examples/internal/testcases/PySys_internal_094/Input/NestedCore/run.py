@@ -0,0 +1,9 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+
+class PySysTest(BaseTest):
+	def execute(self):
+		with open(self.output+'/core', 'w') as f: f.write('not really a core\n'*1000)
+		with open(self.output+'/not-a-core.txt', 'w') as f: f.write('hello\n')
+	def validate(self):
+		self.addOutcome(PASSED)
@@ -0,0 +1,75 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.coredetect import CoreDetector, coreFileRegex
+import os, shutil, time
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		runPySys(self, 'pysys', ['run', '-o', self.output+'/myoutdir'], workingDir='test', ignoreExitStatus=True)
+		self.logFileContents('pysys.out', maxLines=0)
+		
+		# cores written to memory must be compressed before the output is moved to disk
+		os.mkdir(self.output+'/ram')
+		runPySys(self, 'pysys-memory', ['run', '-o', self.output+'/memoryoutdir', '-XmemoryOutputDir=%s/ram'%self.output], 
+			workingDir='test', ignoreExitStatus=True)
+			
+	def validate(self):
+		self.assertGrep('pysys.out', expr='(Traceback.*|caught .*)', contains=False)
+		self.assertGrep('pysys.out', expr='DUMPED CORE: NestedCore')
+		self.assertGrep('pysys.out', expr='Core detected in output subdirectory')
+		self.assertThat('%s == True', os.path.exists(self.output+'/myoutdir/NestedCore/core.gz'))
+		self.assertThat('%s == False', os.path.exists(self.output+'/myoutdir/NestedCore/core'))
+		self.assertGrep('pysys-memory.out', expr='(Traceback.*|caught .*|Failed to .*)', contains=False)
+		self.assertGrep('pysys-memory.out', expr='DUMPED CORE: NestedCore')
+		self.assertThat('%r == ["core.gz", "not-a-core.txt", "run.log"]', sorted(os.listdir(self.output+'/memoryoutdir/NestedCore')))
+		
+		# core_pattern conversion
+		self.assertThat('%r == "1234"', coreFileRegex('core.%e.%p.%t').match('core.my.exe.1234.1550000000').group('pid'))
+		self.assertThat('%r == "99"', coreFileRegex('core', appendPid=True).match('core.99').group('pid'))
+		self.assertThat('%s == None', coreFileRegex('core', appendPid=True).match('core'))
+		self.assertThat('%s == None', coreFileRegex('%e.core').match('sub/dir.core'))
+		self.assertThat('%r == "100%%.core"', coreFileRegex('100%%.core').match('100%.core').group(0))
+		
+		# cores in an absolute core_pattern directory are only reported for our process ids
+		coredir = self.output+'/cores'
+		os.mkdir(coredir)
+		outdir = self.output+'/testoutput'
+		os.mkdir(outdir)
+		for name in ['core.server.1234', 'core.other.5678', 'unrelated.1234']:
+			with open(coredir+'/'+name, 'w') as f: f.write('x')
+		detector = CoreDetector(corePattern=coredir+'/core.%e.%p', patterns=['^core'])
+		self.assertThat('%r == [%r]', detector.detect(outdir, pids=[1234]), coredir+'/core.server.1234')
+		self.assertThat('%r == []', detector.detect(outdir, pids=[1]))
+		# a core from a reused pid that is older than the test is not reported
+		self.assertThat('%r == []', detector.detect(outdir, pids=[1234], since=time.time()+1000))
+		self.assertThat('%r == [%r]', detector.detect(outdir, pids=[1234], since=time.time()-1000), coredir+'/core.server.1234')
+		
+		# where there's no pid in the name, the modification time is used instead
+		detector = CoreDetector(corePattern=coredir+'/core.%e', patterns=[])
+		self.assertThat('%d == 2', len(detector.detect(outdir, pids=[], since=time.time()-1000)))
+		self.assertThat('%r == []', detector.detect(outdir, pids=[], since=time.time()+1000))
+		
+		# a relative pattern applies to the output directory
+		with open(outdir+'/myprog.dump', 'w') as f: f.write('x')
+		detector = CoreDetector(corePattern='%e.dump', patterns=['^core'])
+		self.assertThat('%r == [%r]', detector.detect(outdir), outdir+'/myprog.dump')
+		
+		detector.compress(outdir+'/myprog.dump')
+		self.assertThat('%r == []', detector.wait())
+		self.assertThat('%r == ["myprog.dump.gz"]', os.listdir(outdir))
+		
+		with open(outdir+'/myprog2.dump', 'w') as f: f.write('x')
+		detector.compress(outdir+'/myprog2.dump', background=False)
+		self.assertThat('%r == ["myprog.dump.gz", "myprog2.dump.gz"]', sorted(os.listdir(outdir)))
+		self.assertThat('%r == []', detector.wait())
+
+		# cores managed by systemd are never compressed or deleted
+		self.assertThat('%r == %r', detector.compress('/var/lib/systemd/coredump/core.prog.0.1234.zst'), '/var/lib/systemd/coredump/core.prog.0.1234.zst')
+		self.assertThat('%r == []', detector.wait())
@@ -0,0 +1,11 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import os
+
+class PySysTest(BaseTest):
+	def execute(self):
+		with open(self.output+'/clash.txt', 'w') as f: f.write('clash\n')
+		# make moving the output to disk fail, since the destination already exists
+		os.makedirs(os.path.join(self.runner.outsubdir, self.descriptor.id, 'clash.txt', 'clash.txt'))
+	def validate(self):
+		self.addOutcome(FAILED, "Deliberate failure")
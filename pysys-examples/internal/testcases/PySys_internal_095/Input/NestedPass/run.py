@@ -0,0 +1,9 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+
+class PySysTest(BaseTest):
+	def execute(self):
+		self.log.info('Output directory is: %s', self.output)
+		with open(self.output+'/scratch.txt', 'w') as f: f.write('scratch\n'*1000)
+	def validate(self):
+		self.addOutcome(PASSED)
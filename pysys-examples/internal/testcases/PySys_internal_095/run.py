@@ -0,0 +1,31 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import os, shutil
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+		os.mkdir(self.output+'/ram')
+
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		runPySys(self, 'pysys', ['run', '-o', self.output+'/myoutdir', '-XmemoryOutputDir=%s/ram'%self.output], workingDir='test', ignoreExitStatus=True)
+		self.logFileContents('pysys.out', maxLines=0)
+			
+	def validate(self):
+		self.assertGrep('pysys.out', expr='(Traceback.*|caught .*)', contains=False)
+		self.assertGrep('pysys.out', expr='FAILED: NestedFail')
+		
+		for t in ['NestedFail', 'NestedPass']:
+			self.assertGrep('myoutdir/%s/run.log'%t, expr='Output directory is: .*/ram/pysys-[0-9]+/%s$'%t)
+		self.assertThat('%r == ["run.log", "scratch.txt"]', sorted(os.listdir(self.output+'/myoutdir/NestedFail')))
+		self.assertThat('%r == ["run.log"]', sorted(os.listdir(self.output+'/myoutdir/NestedPass')))
+		self.assertThat('%r == []', os.listdir(self.output+'/ram'))
+		
+		# a failure to move the output is included in the outcome logged to the run.log and stdout
+		self.assertGrep('pysys.out', expr='BLOCKED: NestedBlocked')
+		self.assertGrep('myoutdir/NestedBlocked/run.log', expr='Test final outcome: *BLOCKED')
+		self.assertGrep('myoutdir/NestedBlocked/run.log', expr='Test failure reason: Failed to move output from .*clash.txt.* already exists')
@@ -0,0 +1,40 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.filecopy import stagefile
+import os, stat, filecmp
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		# symlinks can't be stored in the Input dir reliably across platforms, so create them here
+		self.src = self.output+'/src'
+		self.stageInput('data', self.src)
+		os.symlink('hello.txt', self.src+'/link.txt')
+		
+		self.copied = self.stageInput()
+		self.single = self.stageInput('data/hello.txt', 'single/hello-copy.txt')
+		self.linked = self.stageInput('data/sub/file1.txt', hardlink=True)
+		inputDir, self.input = self.input, self.output # so we can stage the tree that includes a symlink
+		self.withlink = self.stageInput('src', 'withlink')
+		self.input = inputDir
+		
+		self.method = stagefile(self.output+'/data/hello.txt', self.output+'/hello-method.txt')
+		
+	def validate(self):
+		self.assertThat('%r == %r', self.copied, self.output+'/')
+		cmp = filecmp.dircmp(self.input+'/data', self.output+'/data')
+		self.assertThat('%r == []', cmp.diff_files + cmp.left_only + cmp.right_only)
+		self.assertThat('%r == []', cmp.subdirs['sub'].diff_files + cmp.subdirs['sub'].left_only + cmp.subdirs['sub'].right_only)
+		self.assertThat('%s == True', os.access(self.output+'/data/sub/script.sh', os.X_OK))
+		self.assertThat('%s == False', os.path.samefile(self.output+'/data/hello.txt', self.input+'/data/hello.txt'))
+		
+		self.assertThat('%r == %r', self.single, self.output+'/single/hello-copy.txt')
+		self.assertDiff('single/hello-copy.txt', 'data/hello.txt', filedir2=self.input)
+		
+		self.assertThat('%r == %r', self.linked, self.output+'/data/sub/file1.txt')
+		self.assertThat('%s == True', os.path.samefile(self.linked, self.input+'/data/sub/file1.txt'))
+		
+		self.assertThat('%s == True', os.path.islink(self.withlink+'/link.txt'))
+		self.assertThat('%r == "hello.txt"', os.readlink(self.withlink+'/link.txt'))
+		self.assertThat('%r in ["copy", "reflink"]', self.method)
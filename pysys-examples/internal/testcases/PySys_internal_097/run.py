@@ -0,0 +1,48 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.filecopy import filecopy, copyfileobj, kernelcopy
+import os, io, filecmp
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		self.sizes = [0, 1, 64*1024-1, 3*1024*1024+7]
+		for size in self.sizes:
+			with open(self.output+'/src%d'%size, 'wb') as f: f.write(os.urandom(size))
+			filecopy(self.output+'/src%d'%size, self.output+'/dst%d'%size)
+			
+			# the buffered fallback, with both the adaptive and a small buffer size
+			with open(self.output+'/src%d'%size, 'rb') as fsrc:
+				with open(self.output+'/buffered%d'%size, 'wb') as fdst:
+					copyfileobj(fsrc, fdst)
+			with open(self.output+'/src%d'%size, 'rb') as fsrc:
+				with open(self.output+'/smallbuffer%d'%size, 'wb') as fdst:
+					copyfileobj(fsrc, fdst, length=1000)
+		
+		# file-like objects with no fileno or readinto
+		class Reader(object):
+			def __init__(self, data): self.stream = io.BytesIO(data)
+			def read(self, length): return self.stream.read(length)
+		self.fileLike = io.BytesIO()
+		copyfileobj(Reader(b'hello world'*10000), self.fileLike, length=100)
+		
+		with open(self.output+'/src1', 'rb') as fsrc:
+			with open(self.output+'/kernel1', 'wb') as fdst:
+				self.log.info('Kernel copy supported: %s', kernelcopy(fsrc, fdst))
+		
+		# a kernel copier that reports nothing copied for a non-empty file must not be treated as success
+		if hasattr(os, 'copy_file_range'):
+			copy_file_range, os.copy_file_range = os.copy_file_range, lambda *args: 0
+			try:
+				filecopy(self.output+'/src1', self.output+'/nothingcopied1')
+			finally:
+				os.copy_file_range = copy_file_range
+			
+	def validate(self):
+		for size in self.sizes:
+			for prefix in ['dst', 'buffered', 'smallbuffer']:
+				self.assertThat('%s == True', filecmp.cmp(self.output+'/src%d'%size, self.output+'/%s%d'%(prefix, size), shallow=False))
+		self.assertThat('%s == True', self.fileLike.getvalue() == b'hello world'*10000)
+		if hasattr(os, 'copy_file_range'):
+			self.assertThat('%s == True', filecmp.cmp(self.output+'/src1', self.output+'/nothingcopied1', shallow=False))
@@ -0,0 +1,66 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.exceptions import *
+from pysys.utils.fileunzip import unzip, unzipall
+import os, gzip, bz2, tarfile, zipfile, io
+
+try:
+	import lzma
+except ImportError:
+	lzma = None
+
+DATA = os.urandom(100*1024) + b'\nend\n'
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		dir = self.mkdir(self.output+'/archives')
+		with gzip.open(dir+'/a.bin.gz', 'wb') as f: f.write(DATA*30)
+		with bz2.BZ2File(dir+'/b.bin.bz2', 'wb') as f: f.write(DATA)
+		if lzma:
+			with lzma.open(dir+'/c.bin.xz', 'wb') as f: f.write(DATA)
+		with zipfile.ZipFile(dir+'/d.zip', 'w') as f: 
+			f.writestr('zipdir/d1.bin', DATA)
+			f.writestr('d2.bin', DATA)
+		with open(self.output+'/e.bin', 'wb') as f: f.write(DATA)
+		with tarfile.open(dir+'/e.tar.gz', 'w:gz') as f: f.add(self.output+'/e.bin', 'tardir/e.bin')
+		with open(dir+'/notanarchive.txt', 'w') as f: f.write('hello')
+		
+		unzipall(dir, binary=True, threads=4, extensions=['.gz', '.bz2', '.xz', '.zip'])
+		
+		# by default only .gz files are unzipped
+		gzonly = self.mkdir(self.output+'/gzonly')
+		with gzip.open(gzonly+'/a.bin.gz', 'wb') as f: f.write(DATA)
+		with bz2.BZ2File(gzonly+'/b.bin.bz2', 'wb') as f: f.write(DATA)
+		with zipfile.ZipFile(gzonly+'/d.zip', 'w') as f: f.writestr('d1.bin', DATA)
+		unzipall(gzonly, binary=True)
+		
+		# unsafe and unsupported archives
+		with tarfile.open(self.output+'/unsafe.tar', 'w') as f: f.add(self.output+'/e.bin', '../escaped.bin')
+		try:
+			unzip(self.output+'/unsafe.tar')
+		except Exception as ex:
+			self.log.info('Got expected exception: %s', ex)
+		else:
+			self.addOutcome(FAILED, 'Expected unzip of unsafe tar to fail')
+		
+		try:
+			unzip(self.output+'/e.bin')
+		except IncorrectFileTypeException as ex:
+			self.log.info('Got expected exception: %s', ex)
+		else:
+			self.addOutcome(FAILED, 'Expected IncorrectFileTypeException')
+		
+	def validate(self):
+		dir = self.output+'/archives'
+		expected = {'a.bin':DATA*30, 'b.bin':DATA, 'zipdir/d1.bin':DATA, 'd2.bin':DATA, 'tardir/e.bin':DATA}
+		if lzma: expected['c.bin'] = DATA
+		for name, data in sorted(expected.items()):
+			with open(dir+'/'+name, 'rb') as f:
+				self.assertThat('%s == True', f.read() == data)
+		
+		self.assertThat('%r == []', [f for f in os.listdir(dir) if '.gz' in f or '.bz2' in f or '.xz' in f or '.zip' in f])
+		self.assertThat('%s == True', os.path.exists(dir+'/notanarchive.txt'))
+		self.assertThat('%r == %r', sorted(os.listdir(self.output+'/gzonly')), ['a.bin', 'b.bin.bz2', 'd.zip'])
+		self.assertThat('%s == False', os.path.exists(os.path.dirname(self.output)+'/escaped.bin'))
@@ -0,0 +1,36 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.filereplace import replace, replacetree
+import os
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		keys = dict(('KEY%d'%i, 'value%d'%i) for i in range(500))
+		keys['CAT'] = 'cat'
+		keys['CATSEAT'] = 'mat'
+		keys['LOOP'] = '$CAT$' # inserted text is not itself replaced
+		
+		with open(self.output+'/template.txt', 'w') as f:
+			for i in range(0, 500, 7):
+				f.write('line %d: $KEY%d$ and $KEY%d$ $unknown$ $$\n'%(i, i, i+1))
+			f.write('The $CAT$ sat on the $CATSEAT$ $LOOP$\n')
+		replace(self.output+'/template.txt', self.output+'/replaced.txt', keys, marker='$')
+		
+		tree = self.mkdir(self.output+'/tree/sub')
+		with open(tree+'/a.xml', 'w') as f: f.write('<x>$KEY1$</x>\n')
+		with open(tree+'/b.txt', 'w') as f: f.write('$KEY2$\n')
+		with open(self.output+'/tree/data.bin', 'wb') as f: f.write(b'\x00\xff$KEY3$\x80')
+		self.count = replacetree(self.output+'/tree', self.output+'/treeout', keys, marker='$', includes=['*.xml', '*.txt'], threads=4)
+	
+	def validate(self):
+		self.assertGrep('replaced.txt', expr='^line 497: value497 and value498 [$]unknown[$] [$][$]$')
+		self.assertGrep('replaced.txt', expr='^The cat sat on the mat [$]CAT[$]$')
+		self.assertGrep('replaced.txt', expr='KEY', contains=False)
+		
+		self.assertThat('%d == 2', self.count)
+		self.assertGrep('treeout/sub/a.xml', expr='^<x>value1</x>$')
+		self.assertGrep('treeout/sub/b.txt', expr='^value2$')
+		with open(self.output+'/treeout/data.bin', 'rb') as f:
+			self.assertThat('%r == %r', f.read(), b'\x00\xff$KEY3$\x80')
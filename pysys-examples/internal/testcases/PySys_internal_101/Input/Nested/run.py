@@ -0,0 +1,8 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+
+class PySysTest(BaseTest):
+	def execute(self):
+		self.addOutcome(PASSED)
+	def validate(self):
+		pass
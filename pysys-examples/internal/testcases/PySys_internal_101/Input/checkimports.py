@@ -0,0 +1,12 @@
+# Reports which expensive modules and resources have been loaded once the project 
+# file has been parsed and the launcher imported, as happens for every pysys command
+import os, sys
+from pysys.constants import loadproject
+loadproject(os.getcwd())
+import pysys.launcher.console
+
+for module in ['pysys.basetest', 'pysys.baserunner', 'pysys.writer', 'pysys.utils.perfreporter', 'tkinter', 'Tkinter']:
+	print('module %s: %s'%(module, 'loaded' if module in sys.modules else 'not loaded'))
+print('hostname: %s'%('resolved' if vars(sys.modules['pysys.constants'])['__hostname'] else 'not resolved'))
+allocport = sys.modules.get('pysys.utils.allocport')
+print('port pool: %s'%('initialized' if allocport and allocport.tcpServerPortPool is not None else 'not initialized'))
@@ -0,0 +1,37 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.perfreporter import PerformanceUnit
+import os, sys, shutil, time
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+		
+		self.startProcess(command=sys.executable, arguments=[self.output+'/test/checkimports.py'], 
+			environs=dict(os.environ), workingDir='test', stdout='checkimports.out', stderr='checkimports.err', 
+			displayName='checkimports')
+
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		for command, args in [('print', ['print']), ('run', ['run', '-o', self.output+'/myoutdir', 'Nested'])]:
+			times = []
+			for i in range(3):
+				start = time.time()
+				runPySys(self, 'pysys-%s-%d'%(command, i), args, workingDir='test')
+				times.append(time.time()-start)
+			self.log.info('Fastest time for pysys %s was %0.3f seconds', command, min(times))
+			self.reportPerformanceResult(min(times), 'Time to execute pysys %s'%command, 's', 
+				resultDetails={'command':command})
+
+	def validate(self):
+		self.assertGrep('checkimports.err', expr='.+', contains=False)
+		for module in ['pysys.basetest', 'pysys.baserunner', 'pysys.writer', 'pysys.utils.perfreporter', 'tkinter', 'Tkinter']:
+			self.assertGrep('checkimports.out', expr='^module %s: not loaded$'%module)
+		self.assertGrep('checkimports.out', expr='^hostname: not resolved$')
+		self.assertGrep('checkimports.out', expr='^port pool: not initialized$')
+		
+		self.assertGrep('pysys-print-0.out', expr='Nested')
+		self.assertGrep('pysys-run-0.out', expr='Test final outcome: *PASSED')
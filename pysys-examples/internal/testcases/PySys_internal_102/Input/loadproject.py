@@ -0,0 +1,11 @@
+# Loads the project in this directory and prints its configuration, and whether the XML was parsed
+import os, sys
+from pysys.constants import loadproject
+loadproject(os.path.dirname(os.path.abspath(__file__)))
+from pysys.constants import PROJECT
+
+print('parsed: %s'%('yes' if 'xml.dom.minidom' in sys.modules else 'no'))
+for p in ['fromFile', 'nested', 'fromEnv', 'combined', 'optional']:
+	print('property %s=%s'%(p, getattr(PROJECT, p, '<missing>')))
+print('path: %s'%[p for p in sys.path if p.endswith('lib')])
+print('formatter: %s'%PROJECT.formatters.stdout.__class__.__name__)
@@ -0,0 +1,60 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import os, sys, shutil
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+		self.step = 0
+		env = dict(os.environ)
+		env['PYSYS_PROJECT_CACHE_DIR'] = self.output+'/cache'
+		env.pop('CACHE_TEST_VALUE', None)
+		
+		self.loadProject(env) # 1: nothing cached
+		self.loadProject(env) # 2: cached
+		
+		env['CACHE_TEST_VALUE'] = 'env1'
+		self.loadProject(env) # 3: environment changed
+		self.loadProject(env) # 4: cached
+		
+		with open(self.output+'/test/my.properties', 'w') as f: f.write('fromFile=file2-modified\n')
+		self.loadProject(env) # 5: property file changed
+		
+		with open(self.output+'/test/optional.properties', 'w') as f: f.write('optional=now exists\n')
+		self.loadProject(env) # 6: property file created
+		
+		with open(self.output+'/test/pysysproject.xml', 'a') as f: f.write('\n<!-- modified -->\n')
+		self.loadProject(env) # 7: project file changed
+		self.loadProject(env) # 8: cached
+		
+		env['PYSYS_PROJECT_CACHE_DIR'] = ''
+		self.loadProject(env) # 9: caching disabled
+		
+		del env['PYSYS_PROJECT_CACHE_DIR']
+		self.loadProject(env) # 10: caching disabled by default
+		
+	def loadProject(self, env):
+		self.step += 1
+		self.startProcess(command=sys.executable, arguments=[self.output+'/test/loadproject.py'], 
+			environs=env, workingDir='test', stdout='load%d.out'%self.step, stderr='load%d.err'%self.step, 
+			displayName='loadproject %d'%self.step)
+
+	def validate(self):
+		for step, parsed in [(1, 'yes'), (2, 'no'), (3, 'yes'), (4, 'no'), (5, 'yes'), (6, 'yes'), (7, 'yes'), (8, 'no'), (9, 'yes'), (10, 'yes')]:
+			self.assertGrep('load%d.err'%step, expr='.+', contains=False)
+			self.assertGrep('load%d.out'%step, expr='^parsed: %s$'%parsed)
+			self.assertGrep('load%d.out'%step, expr="^path: .*test.lib'\\]$")
+			self.assertGrep('load%d.out'%step, expr='^formatter: ColorLogFormatter$')
+		
+		self.assertGrep('load2.out', expr='^property nested=file1.file1$')
+		self.assertGrep('load2.out', expr='^property combined=file1-none$')
+		self.assertGrep('load2.out', expr='^property optional=<missing>$')
+		self.assertGrep('load4.out', expr='^property combined=file1-env1$')
+		self.assertGrep('load5.out', expr='^property combined=file2-modified-env1$')
+		self.assertGrep('load5.out', expr='^property nested=<missing>$')
+		self.assertGrep('load8.out', expr='^property optional=now exists$')
+		self.assertGrep('load8.out', expr='^property combined=file2-modified-env1$')
+		
+		self.assertThat('%d == 1', len(os.listdir(self.output+'/cache')))
@@ -0,0 +1,9 @@
+# Tries to lease a port from a separate process; usage: leaseport.py LEASEDIR PORT [exit-without-release]
+import os, sys
+from pysys.utils.allocport import TCPPortLeases
+
+lease = TCPPortLeases(sys.argv[1]).acquire(int(sys.argv[2]))
+print('lease %s: %s'%(sys.argv[2], 'held by another process' if lease is None else 'acquired'))
+sys.stdout.flush()
+if len(sys.argv) > 3: os._exit(0)
+if lease is not None: lease.release()
@@ -0,0 +1,75 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.allocport import TCPPortLeases, TCPPortOwner, portLeases
+import os, sys
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		leases = TCPPortLeases(self.output+'/leases')
+		self.step = 0
+		
+		lease = leases.acquire(20001)
+		self.assertTrue(lease is not None)
+		self.assertTrue(leases.acquire(20001) is None)
+		self.leasePort(20001) # 1: held
+		self.leasePort(20002) # 2: acquired
+		lease.release()
+		self.leasePort(20001) # 3: acquired
+		
+		self.leasePort(20003, exitWithoutRelease=True) # 4: acquired, then exits
+		lease = leases.acquire(20003)
+		self.assertTrue(lease is not None)
+		lease.release()
+		self.leases = sorted(os.listdir(self.output+'/leases'))
+		
+		owner = TCPPortOwner()
+		self.assertTrue(portLeases.acquire(owner.port) is None)
+		owner.cleanup()
+		lease = portLeases.acquire(owner.port)
+		self.assertTrue(lease is not None)
+		lease.release()
+		
+		self.ports = [self.getNextAvailableTCPPort() for i in range(20)]
+		
+		if OSFAMILY != 'windows':
+			# lease directories and files that other users could tamper with are not used
+			warnings = []
+			class StderrCapture(object):
+				def write(self, s): warnings.append(s)
+			stderr, sys.stderr = sys.stderr, StderrCapture()
+			try:
+				os.mkdir(self.output+'/insecure')
+				os.chmod(self.output+'/insecure', 0o777)
+				self.insecureLease = TCPPortLeases(self.output+'/insecure').acquire(20004)
+				
+				os.symlink(self.output+'/symlinktarget.lock', self.output+'/leases/20005.lock')
+				self.symlinkLease = leases.acquire(20005)
+			finally:
+				sys.stderr = stderr
+			self.warnings = ''.join(warnings)
+
+	def leasePort(self, port, exitWithoutRelease=False):
+		self.step += 1
+		self.startProcess(command=sys.executable, 
+			arguments=[self.input+'/leaseport.py', self.output+'/leases', str(port)]+(['exit'] if exitWithoutRelease else []), 
+			environs=dict(os.environ), stdout='lease%d.out'%self.step, stderr='lease%d.err'%self.step, 
+			displayName='leaseport %d'%self.step)
+
+	def validate(self):
+		for step, result in [(1, 'held by another process'), (2, 'acquired'), (3, 'acquired'), (4, 'acquired')]:
+			self.assertGrep('lease%d.err'%step, expr='.+', contains=False)
+			self.assertGrep('lease%d.out'%step, expr='^lease [0-9]+: %s$'%result)
+		
+		# released leases do not leave files behind
+		self.assertThat('%r == []', self.leases)
+		self.assertThat('%d == %d', len(set(self.ports)), len(self.ports))
+		
+		if OSFAMILY != 'windows':
+			self.assertThat('%r is None', self.insecureLease.path)
+			self.assertThat('%r is None', self.symlinkLease.path)
+			self.assertThat('not os.path.exists(%r)', self.output+'/symlinktarget.lock')
+			self.assertThat('%r == %r', [l.split(':')[0] for l in self.warnings.strip().split('\n')], 
+				['Cannot lease TCP ports in %s/insecure'%self.output, 'Cannot lease TCP port 20005 in %s/leases'%self.output])
+			self.assertThat('%r in %r', 'does not have the sticky bit set', self.warnings)
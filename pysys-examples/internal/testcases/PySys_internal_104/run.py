@@ -0,0 +1,56 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.allocport import TCPPortsOwner, portLeases, portIsInUse
+import socket, sys, os
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		self.batch = self.allocateTCPPorts(30)
+		self.block = self.allocateTCPPorts(8, contiguous=True)
+		self.single = self.getNextAvailableTCPPort()
+		self.leased = [portLeases.acquire(port) is None for port in self.batch+self.block]
+		self.inUse = [portIsInUse(port) for port in self.batch+self.block]
+		
+		# a free port from the pool is detected as in use while bound by a server
+		owner = TCPPortsOwner(1)
+		self.serverPort = owner.ports[0]
+		owner.cleanup()
+		server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		server.bind(('', self.serverPort))
+		server.listen(1)
+		self.serverPortInUse = portIsInUse(self.serverPort)
+		server.close()
+		
+		owner = TCPPortsOwner(4, contiguous=True)
+		self.released = owner.ports
+		owner.cleanup()
+		self.leasedAfterCleanup = [portLeases.acquire(port) for port in self.released]
+		for lease in self.leasedAfterCleanup: lease.release()
+		
+		# running out of ports fails rather than retrying forever, and returns the ports taken to the pool
+		self.startProcess(command=sys.executable, arguments=['-c', '\n'.join([
+			'from pysys.utils import allocport', 
+			'pool = allocport.getPortPool()', 
+			'ports = [pool.popleft() for i in range(3)]', 
+			'pool.clear()', 
+			'pool.extend(ports)', 
+			'try:', 
+			'	allocport.TCPPortsOwner(5)', 
+			'except Exception as e:', 
+			'	print("error: %s"%e)', 
+			'print("pool: %d"%len(pool))', 
+			])], environs=dict(os.environ), stdout='exhausted.out', stderr='exhausted.err', displayName='exhausted pool', timeout=60)
+		
+	def validate(self):
+		allPorts = self.batch+self.block+[self.single]
+		self.assertThat('%d == 30', len(self.batch))
+		self.assertThat('%d == %d', len(set(allPorts)), 39)
+		self.assertThat('%r == %r', self.block, list(range(self.block[0], self.block[0]+8)))
+		self.assertThat('%r == %r', self.leased, [True]*38)
+		self.assertThat('%r == %r', self.inUse, [False]*38)
+		self.assertTrue(self.serverPortInUse)
+		self.assertThat('%r == %r', [lease is not None for lease in self.leasedAfterCleanup], [True]*4)
+		self.assertGrep('exhausted.err', expr='.+', contains=False)
+		self.assertOrderedGrep('exhausted.out', exprList=['^error: Cannot allocate 5 TCP ports$', '^pool: 3$'])
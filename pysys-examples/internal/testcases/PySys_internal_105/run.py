@@ -0,0 +1,46 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import socket, threading, time
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		ports = self.allocateTCPPorts(3)
+		servers = []
+		def listen(port, delay):
+			time.sleep(delay)
+			s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			s.bind(('', port))
+			s.listen(5)
+			servers.append(s)
+		threads = [threading.Thread(target=listen, args=(port, 1.0)) for port in ports]
+		for t in threads: t.start()
+		
+		startTime = time.time()
+		self.allConnected = self.waitForSockets([('localhost', ports[0]), ('127.0.0.1', ports[1]), ports[2]], timeout=20, abortOnError=False)
+		self.waitTime = time.time()-startTime
+		for t in threads: t.join()
+		
+		# timeout reports the endpoints that are still pending
+		unused = self.getNextAvailableTCPPort()
+		self.timedOut = self.waitForSockets([ports[0], unused], timeout=1, abortOnError=False)
+		
+		# terminated process stops the wait early
+		process = self.startProcess(command=sys.executable, arguments=['-c', 'pass'], 
+			environs=dict(os.environ), stdout='process.out', stderr='process.err', state=BACKGROUND)
+		startTime = time.time()
+		self.processTerminated = self.waitForSocket(unused, timeout=20, abortOnError=False, process=process)
+		self.processWaitTime = time.time()-startTime
+		
+		for s in servers: s.close()
+
+	def validate(self):
+		self.assertTrue(self.allConnected)
+		# the servers were waited for in parallel
+		self.assertThat('%f < 3.0', self.waitTime)
+		self.assertFalse(self.timedOut)
+		self.assertGrep('run.log', expr='Timed out waiting for creation of socket after [0-9]+ secs [(]still waiting for localhost:[0-9]+[)]$')
+		self.assertFalse(self.processTerminated)
+		self.assertThat('%f < 15.0', self.processWaitTime)
+		self.assertGrep('run.log', expr='Waiting for socket connection aborted due to unexpected process .* termination$')
@@ -0,0 +1,59 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.process.conditions import *
+import socket, threading, time, io
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		port = self.getNextAvailableTCPPort()
+		server = self.startProcess(command=sys.executable, arguments=['-c', 'import time; time.sleep(60)'], 
+			environs=dict(os.environ), stdout='server.out', stderr='server.err', state=BACKGROUND)
+		
+		listener = []
+		def startServer():
+			with io.open(self.output+'/server.log', 'w', encoding='utf-8') as f:
+				f.write(u'Starting\n')
+				f.flush()
+				time.sleep(0.5)
+				s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+				s.bind(('', port))
+				s.listen(5)
+				listener.append(s)
+				f.write(u'Listener started\nServer st')
+				f.flush()
+				time.sleep(0.5)
+				f.write(u'arted £\n')
+			with open(self.output+'/ready.txt', 'w') as f: pass
+		with open(self.output+'/windows.log', 'wb') as f: f.write(b'Starting\r\ndone\r\n')
+		t = threading.Thread(target=startServer)
+		t.start()
+		
+		self.ready = self.waitForConditions([
+			ProcessRunning(server), 
+			SocketAccepts(port), 
+			SocketAccepts(port), 
+			FileContains('server.log', 'started', condition='==2'),
+			FileContains('windows.log', '^done$'),
+			FileExists('ready.txt'),
+		], timeout=20, abortOnError=False)
+		t.join()
+		
+		self.timedOut = self.waitForConditions([
+			ProcessRunning(server), 
+			SocketAccepts(port), 
+			FileContains('server.log', 'Stopped'),
+		], timeout=1, abortOnError=False)
+		
+		self.stopProcess(server)
+		self.processTerminated = self.waitForConditions([ProcessRunning(server), FileExists('never.txt')], timeout=20, abortOnError=False)
+		listener[0].close()
+
+	def validate(self):
+		self.assertTrue(self.ready)
+		self.assertGrep('run.log', expr='Wait for 6 conditions completed successfully')
+		self.assertFalse(self.timedOut)
+		self.assertGrep('run.log', expr='Wait for conditions timed out after 1 secs, still waiting for: signal "Stopped" >=1 in server.log [(]0 matches[)]$')
+		self.assertFalse(self.processTerminated)
+		self.assertGrep('run.log', expr='Wait for conditions aborted due to process .* terminated, still waiting for: file never.txt exists$')
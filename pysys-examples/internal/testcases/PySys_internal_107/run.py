@@ -0,0 +1,77 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.perfreporter import CSVPerformanceFile, PerformanceComparison
+import os, sys
+
+class PySysTest(BaseTest):
+
+	def writeResults(self, path, results):
+		self.mkdir(os.path.dirname(path))
+		with open(path, 'w') as f:
+			f.write('# '+CSVPerformanceFile.toCSVLine(CSVPerformanceFile.COLUMNS+[CSVPerformanceFile.RUN_DETAILS, {'outdir':'test'}])+'\n')
+			for key, value, stdDev, samples, unit, biggerIsBetter, tolerance in results:
+				f.write(CSVPerformanceFile.toCSVLine({'resultKey':key, 'testId':'MyTest', 'value':value, 'unit':unit, 
+					'biggerIsBetter':str(biggerIsBetter).upper(), 'toleranceStdDevs':tolerance, 'samples':samples, 'stdDev':stdDev})+'\n')
+
+	def execute(self):
+		self.writeResults(self.output+'/baseline/perf.csv', [
+			('Throughput', 100, 2, 10, '/s', True, ''),
+			('Latency', 1.0, 0.1, 10, 's', False, ''),
+			('Stable', 50, 5, 10, '/s', True, ''),
+			('Single sample', 10, 0, 1, '/s', True, ''),
+			('Within tolerance', 100, 2, 10, '/s', True, '3'),
+			('Removed', 5, 0, 1, 's', False, ''),
+		])
+		# the candidate set is split across two files which are aggregated
+		self.writeResults(self.output+'/candidate/perf1.csv', [
+			('Throughput', 90, 2, 5, '/s', True, ''),
+			('Latency', 0.8, 0.1, 10, 's', False, ''),
+			('Stable', 50.5, 5, 10, '/s', True, ''),
+			('Single sample', 5, 0, 1, '/s', True, ''),
+		])
+		self.writeResults(self.output+'/candidate/perf2.csv', [
+			('Throughput', 90, 2, 5, '/s', True, ''),
+			('Within tolerance', 95, 2, 10, '/s', True, '3'),
+			('Added', 7, 0, 1, 's', False, ''),
+		])
+		
+		def load(path):
+			return [CSVPerformanceFile(open(os.path.join(path, f)).read()) for f in sorted(os.listdir(path))]
+		comparison = PerformanceComparison(load(self.output+'/baseline'), load(self.output+'/candidate'))
+		self.statuses = dict((r['resultKey'], r['status']) for r in comparison.results)
+		self.throughput = [r for r in comparison.results if r['resultKey'] == 'Throughput'][0]
+		self.withTolerance = dict((r['resultKey'], r['status']) for r in 
+			PerformanceComparison(load(self.output+'/baseline'), load(self.output+'/candidate'), tolerancePercent=30).results)
+		
+		self.exitStatus = {}
+		for name, args in [('compare', []), ('compare-bykey', ['--sort', 'resultKey']), ('compare-tolerance', ['-t', '30'])]:
+			self.exitStatus[name] = self.startProcess(command=sys.executable, 
+				arguments=['-m', 'pysys.utils.perfreporter', 'compare']+args+[self.output+'/baseline', self.output+'/candidate'], 
+				environs=dict(os.environ), stdout=name+'.csv', stderr=name+'.err', displayName='perfreporter '+name, 
+				ignoreExitStatus=True).exitStatus
+		
+	def validate(self):
+		self.assertThat('%r == %r', self.statuses, {
+			'Throughput':'REGRESSION', 'Latency':'IMPROVEMENT', 'Stable':'UNCHANGED', 'Single sample':'INCONCLUSIVE', 
+			'Within tolerance':'UNCHANGED', 'Removed':'MISSING', 'Added':'NEW'})
+		self.assertThat('%d == 10', self.throughput['samples'])
+		self.assertThat('%f == -10.0', self.throughput['percentChange'])
+		self.assertThat('%f < 0.0001', self.throughput['pValue'])
+		
+		# a percentage tolerance makes the single sample result comparable, and hides smaller changes
+		self.assertThat('%r == %r', [self.withTolerance[k] for k in ['Single sample', 'Throughput', 'Latency']], 
+			['REGRESSION', 'UNCHANGED', 'UNCHANGED'])
+		
+		self.assertGrep('compare.err', expr='Compared 7 results: 1 REGRESSION, 1 IMPROVEMENT, 2 UNCHANGED, 1 INCONCLUSIVE, 1 NEW, 1 MISSING')
+		self.assertGrep('compare-tolerance.err', expr='Compared 7 results: 1 REGRESSION, 0 IMPROVEMENT')
+		# sorted by default with the biggest change in the worse direction first
+		self.assertLineCount('compare.csv', expr='.', condition='==8')
+		self.assertOrderedGrep('compare.csv', exprList=['^# status,resultKey', '^INCONCLUSIVE,Single sample', 
+			'^REGRESSION,Throughput,MyTest,/s,TRUE,-10,', '^UNCHANGED,Within tolerance', '^UNCHANGED,Stable', 
+			'^IMPROVEMENT,Latency', '^NEW,Added', '^MISSING,Removed'])
+		self.assertOrderedGrep('compare-bykey.csv', exprList=['^NEW,Added', '^IMPROVEMENT,Latency', '^MISSING,Removed', '^INCONCLUSIVE,Single sample'])
+		
+		for name in ['compare', 'compare-bykey', 'compare-tolerance']:
+			self.assertThat('%d == 2', self.exitStatus[name])
+			self.assertGrep(name+'.err', expr='Traceback', contains=False)
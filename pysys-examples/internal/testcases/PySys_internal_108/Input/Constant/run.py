@@ -0,0 +1,14 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import os
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		cycle = self.testCycle
+		self.reportPerformanceResult(1000 if cycle == 1 else 50, 'Constant throughput', '/s')
+		self.reportPerformanceResult(2.5, 'Constant latency', 's', resultDetails={'mode':'fast'})
+
+	def validate(self):
+		pass
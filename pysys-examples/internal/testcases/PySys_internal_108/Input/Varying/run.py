@@ -0,0 +1,13 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import os
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		cycle = self.testCycle
+		self.reportPerformanceResult([100, 10, 12, 14, 16, 18][cycle-1], 'Varying throughput', '/s', toleranceStdDevs=2)
+
+	def validate(self):
+		pass
@@ -0,0 +1,39 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.perfreporter import CSVPerformanceFile
+import os, sys, shutil
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		runPySys(self, 'pysys', ['run', '-c', '6', '-o', self.output+'/myoutdir'], workingDir='test')
+
+	def validate(self):
+		results = CSVPerformanceFile(open(self.output+'/test/perf.csv').read()).results
+		self.assertThat('%r == %r', [r['resultKey'] for r in results], ['Constant throughput', 'Constant latency', 'Varying throughput'])
+		constant, latency, varying = results
+		
+		# the first cycle is discarded as a warm-up, and the constant results converge after 3 more cycles
+		self.assertThat('%r == %r', (constant['value'], constant['samples'], constant['stdDev']), (50.0, 3, 0.0))
+		self.assertThat('%r == %r', dict(latency['resultDetails']), {'mode':'fast', 'min':'2.5', 'max':'2.5', 
+			'p50':'2.5', 'p90':'2.5', 'p99':'2.5', 'warmupSamples':'1'})
+		self.assertGrep('pysys.out', expr='SKIPPED', contains=False)
+		self.assertGrep('myoutdir/Constant/cycle4/run.log', expr='Performance result: Constant throughput = 50')
+		self.assertGrep('myoutdir/Constant/cycle1/run.log', expr='Performance result "Constant throughput" is from a warm-up cycle')
+		for cycle in [5, 6]:
+			self.assertGrep('pysys.out', expr='Not running cycle %d of Constant as its performance results have converged'%cycle)
+			self.assertThat('not os.path.exists(%r)', self.output+'/myoutdir/Constant/cycle%d'%cycle)
+		
+		# the varying results never converge so run for all cycles
+		self.assertThat('%r == %r', (varying['value'], varying['samples'], varying['toleranceStdDevs']), (14.0, 5, 2.0))
+		self.assertThat('abs(%f - 10**0.5) < 0.000001', varying['stdDev'])
+		self.assertThat('%r == %r', [varying['resultDetails'][k] for k in ['min', 'max', 'p50', 'p90']], ['10.0', '18.0', '14.0', '17.2'])
+		self.assertGrep('myoutdir/Varying/cycle6/run.log', expr='Performance result: Varying throughput = 18')
+
+		# the per-test file contains just the individual sample
+		self.assertLineCount('myoutdir/Varying/cycle2/performance_results.csv', expr='^Varying throughput,Varying,10,', condition='==1')
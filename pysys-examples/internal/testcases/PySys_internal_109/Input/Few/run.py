@@ -0,0 +1,12 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		self.reportPerformanceResult(1, 'Few results throughput', '/s')
+		self.reportPerformanceResult(2, 'Few results latency', 's')
+
+	def validate(self):
+		pass
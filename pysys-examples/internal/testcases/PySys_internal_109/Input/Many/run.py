@@ -0,0 +1,12 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		for i in range(500):
+			self.reportPerformanceResult(i, 'Many results %03d'%i, '/s')
+
+	def validate(self):
+		pass
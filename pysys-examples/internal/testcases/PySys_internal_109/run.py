@@ -0,0 +1,43 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.perfreporter import CSVPerformanceReporter, CSVPerformanceFile
+import os, sys, shutil
+
+class BufferingReporter(CSVPerformanceReporter):
+	FLUSH_INTERVAL = 1000
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		runPySys(self, 'pysys', ['run', '-c', '2', '-n', '2', '-o', self.output+'/myoutdir'], workingDir='test')
+		
+		# use the reporter API directly to check when the files are written
+		reporter = BufferingReporter(PROJECT, self.output+'/direct/summary.csv', self.output)
+		reporter.reportResult(self, 1, 'Direct result before test complete', '/s')
+		self.writtenBeforeTestComplete = os.path.exists(self.output+'/performance_results.csv')
+		reporter.testComplete(self)
+		self.writtenBeforeClose = os.path.exists(self.output+'/direct/summary.csv')
+		reporter.close()
+		reporter.reportResult(self, 2, 'Direct result after close', '/s')
+
+	def validate(self):
+		self.assertGrep('pysys.out', expr='(Traceback|caught)', contains=False)
+		for test, count in [('Many', 500), ('Few', 2)]:
+			summary = CSVPerformanceFile(open(self.output+'/test/perf/%s.csv'%test).read())
+			self.assertThat('%d == %d', len(summary.results), count*2)
+			self.assertThat('%d == %d', len(set(r['resultKey'] for r in summary.results)), count)
+			for cycle in [1, 2]:
+				self.assertLineCount('myoutdir/%s/cycle%d/performance_results.csv'%(test, cycle), expr='.', condition='==%d'%(count+1))
+				self.assertLineCount('myoutdir/%s/cycle%d/performance_results.csv'%(test, cycle), expr='^# resultKey', condition='==1')
+		self.assertOrderedGrep('myoutdir/Many/cycle2/performance_results.csv', exprList=['^Many results 000,Many,0,', '^Many results 499,Many,499,'])
+		self.assertLineCount('pysys.out', expr='Creating performance summary log file', condition='==2')
+
+		self.assertThat('%r == True', self.writtenBeforeTestComplete)
+		self.assertThat('%r == False', self.writtenBeforeClose)
+		self.assertOrderedGrep('performance_results.csv', exprList=['^# resultKey', '^Direct result before test complete,', '^Direct result after close,'])
+		self.assertOrderedGrep('direct/summary.csv', exprList=['^# resultKey', '^Direct result before test complete,', '^Direct result after close,'])
@@ -0,0 +1,27 @@
+import pysys
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import pysys.constants
+import os, sys
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		# check the lookup is not done on import or when the performance reporter is created in a new process
+		self.startProcess(command=sys.executable, arguments=['-c', '\n'.join([
+			'import pysys.constants', 
+			'from pysys.utils.perfreporter import CSVPerformanceReporter', 
+			'def resolved(): return bool(pysys.constants.__dict__["_"+"_hostname"])', 
+			'print("resolved on import: %s" % resolved())', 
+			'reporter = CSVPerformanceReporter(None, "summary.csv", "outdir")', 
+			'print("resolved by reporter: %s" % resolved())', 
+			'print("reporter hostname: %s" % reporter.hostname)', 
+			'print("resolved by hostname: %s" % resolved())', 
+			])], environs=dict(os.environ), stdout='import.out', stderr='import.err', displayName='import constants')
+
+	def validate(self):
+		self.assertThat('isinstance(%r, str)', pysys.constants.HOSTNAME)
+		self.assertThat('%r == %r', pysys.constants.HOSTNAME, getHostname())
+		self.assertGrep('import.err', expr='.+', contains=False)
+		self.assertOrderedGrep('import.out', exprList=['^resolved on import: False$', '^resolved by reporter: False$', 
+			'^reporter hostname: %s$'%getHostname().lower().split('.')[0], '^resolved by hostname: True$'])
@@ -0,0 +1,12 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+import os, time
+
+class PySysTest(BaseTest):
+	def execute(self):
+		with open(self.output+'/cycle.txt', 'w') as f: f.write('cycle %d'%self.testCycle)
+		time.sleep(0.2)
+
+	def validate(self):
+		self.assertGrep('cycle.txt', expr='cycle %d'%self.testCycle)
+		self.assertGrep('run.log', expr='Cycle: %d'%self.testCycle)
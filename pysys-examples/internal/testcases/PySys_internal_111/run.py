@@ -0,0 +1,26 @@
+from pysys.constants import *
+from pysys.basetest import BaseTest
+from pysys.utils.fileutils import mkdir
+import os, shutil
+
+class PySysTest(BaseTest):
+
+	def execute(self):
+		shutil.copytree(self.input, self.output+'/test')
+		l = {}
+		exec(open(self.input+'/../../../utilities/resources/runpysys.py').read(), {}, l) # define runPySys
+		runPySys = l['runPySys']
+		
+		# stale output from a previous run
+		for d in ['', 'cycle3']:
+			mkdir(self.output+'/myoutdir/Cycles/'+d)
+			with open(self.output+'/myoutdir/Cycles/'+d+'/stale.txt', 'w') as f: f.write('stale')
+		
+		runPySys(self, 'pysys', ['run', '-c', '8', '-n', '8', '-o', self.output+'/myoutdir'], workingDir='test')
+
+	def validate(self):
+		self.assertGrep('pysys.out', expr='(FAILED|BLOCKED)', contains=False)
+		for cycle in range(1, 9):
+			self.assertGrep('myoutdir/Cycles/cycle%d/run.log'%cycle, expr='Test final outcome: +PASSED')
+		self.assertThat('not os.path.exists(%r)', self.output+'/myoutdir/Cycles/stale.txt')
+		self.assertThat('not os.path.exists(%r)', self.output+'/myoutdir/Cycles/cycle3/stale.txt')
@@ -27,33 +27,29 @@ API documentation.
 
 """
 from __future__ import print_function
-import os.path, stat, math, logging, textwrap, sys
+import os.path, stat, math, logging, textwrap, sys, shutil
 if sys.version_info[0] == 2:
 	from StringIO import StringIO
+	import Queue
 else:
 	from io import StringIO
+	import queue as Queue
 
 from pysys import ThreadedFileHandler, ThreadedStreamHandler
 from pysys.constants import *
 from pysys.exceptions import *
 from pysys.utils.threadpool import *
 from pysys.utils.loader import import_module
-from pysys.utils.fileutils import mkdir
+from pysys.utils.fileutils import mkdir, backgroundDeleter
+from pysys.utils.coredetect import CoreDetector
 from pysys.basetest import BaseTest
 from pysys.process.user import ProcessUser
 from pysys.utils.logutils import BaseLogFormatter
-from pysys.writer import ConsoleSummaryResultsWriter, ConsoleProgressResultsWriter, BaseSummaryResultsWriter, BaseProgressResultsWriter
+from pysys.writer import ConsoleSummaryResultsWriter, ConsoleProgressResultsWriter, BaseSummaryResultsWriter, BaseProgressResultsWriter, BaseRecordResultsWriter
+from pysys.writer import TestResult
 
 global_lock = threading.Lock()
 
-N_CPUS = 1
-try:
-	# multiprocessing is a new module in 2.6 so we can't assume it
-	import multiprocessing
-	N_CPUS = multiprocessing.cpu_count()
-except ImportError:
-	pass
-
 class BaseRunner(ProcessUser):
 	"""The base class for executing a set of PySys testcases.
 
@@ -77,6 +73,14 @@ class BaseRunner(ProcessUser):
 	@type mode: string
 	@ivar outsubdir: The directory name for the output subdirectory 
 	@type outsubdir: string
+	@ivar memoryOutputDir: A RAM-backed directory such as C{/dev/shm} in which to write the output of each test while 
+	it runs, or an empty string to write it directly to the output subdirectory. If a test passes only its run.log 
+	is moved to the output subdirectory, otherwise all of its output is moved there. Set using the project property 
+	or C{-XmemoryOutputDir=DIR} 
+	@type memoryOutputDir: string
+	@ivar memoryOutputMaxMB: The maximum space in MB that test output may use on the file system of C{memoryOutputDir}, 
+	after which further tests write their output directly to the output subdirectory; 0 for no limit 
+	@type memoryOutputMaxMB: string
 	@ivar log: Reference to the logger instance of this class
 	@type log: logging.Logger
 	@ivar project: Reference to the project details as set on the module load of the launching executable  
@@ -147,8 +151,50 @@ class BaseRunner(ProcessUser):
 		self.duration = 0 # no longer needed
 		self.results = {}
 		self.__remainingTests = self.cycle * len(self.descriptors)
+		self.__backgroundWriters = {}
 		
 		self.performanceReporters = PROJECT._createPerformanceReporters(self.outsubdir)
+		
+		self.coreDetector = CoreDetector()
+		self.compressCoreFiles = getattr(PROJECT, 'compressCoreFiles', 'false').lower() == 'true'
+		
+		# optionally write test output to a RAM-backed directory, and only persist it to disk if the test does not pass
+		if not getattr(self, 'memoryOutputDir', None): self.memoryOutputDir = getattr(PROJECT, 'memoryOutputDir', '')
+		if not getattr(self, 'memoryOutputMaxMB', None): self.memoryOutputMaxMB = getattr(PROJECT, 'memoryOutputMaxMB', '0')
+		self.__memoryOutputRoot = None
+		if self.memoryOutputDir:
+			self.__memoryOutputRoot = os.path.join(self.memoryOutputDir, 'pysys-%d'%os.getpid())
+			mkdir(self.__memoryOutputRoot)
+			self.__memoryOutputBaseline = self.__getUsedBytes(self.__memoryOutputRoot)
+
+
+	def getMemoryOutputDir(self, descriptor, cycle):
+		"""Return a directory under C{memoryOutputDir} to hold the output of a test, or None if the output should 
+		be written directly to the normal output subdirectory. 
+		
+		None is returned if no C{memoryOutputDir} is configured, or if the space used on its file system since the 
+		start of the run exceeds C{memoryOutputMaxMB}. 
+		
+		@param descriptor: The descriptor of the test
+		@param cycle: The cycle the test is being run in (0-based)
+		
+		"""
+		if not self.__memoryOutputRoot or self.validateOnly: return None
+		maxBytes = int(float(self.memoryOutputMaxMB or 0)*1024*1024)
+		if maxBytes > 0 and self.__memoryOutputBaseline is not None and self.__getUsedBytes(self.__memoryOutputRoot)-self.__memoryOutputBaseline >= maxBytes:
+			log.debug("Not using %s for the output of %s as it has exceeded its size budget", self.memoryOutputDir, descriptor.id)
+			return None
+		
+		dir = os.path.join(self.__memoryOutputRoot, descriptor.id)
+		if self.cycle > 1: dir = os.path.join(dir, 'cycle%d' % (cycle+1))
+		mkdir(dir)
+		return dir
+
+
+	def __getUsedBytes(self, path):
+		if not hasattr(os, 'statvfs'): return None
+		stats = os.statvfs(path)
+		return (stats.f_blocks-stats.f_bfree)*stats.f_frsize
 
 
 	def setKeywordArgs(self, xargs):
@@ -279,6 +325,10 @@ class BaseRunner(ProcessUser):
 			except Exception: 
 				log.warn("caught %s setting up %s: %s", sys.exc_info()[0], writer.__class__.__name__, sys.exc_info()[1], exc_info=1)
 				self.writers.remove(writer) # if setup fails, nothing else is going to work
+		self.__backgroundWriters = {}
+		for writer in self.writers:
+			if isinstance(writer, BaseRecordResultsWriter) and str(writer.background).lower() == 'true':
+				self.__backgroundWriters[writer] = _BackgroundWriterQueue(writer)
 
 		# create the thread pool if running with more than one thread
 		if self.threads > 1: threadPool = ThreadPool(self.threads)
@@ -292,6 +342,7 @@ class BaseRunner(ProcessUser):
 		# join each cycle before starting the next, so we can invoke 
 		# cycleComplete reliably
 		concurrentcycles = type(self).cycleComplete == BaseRunner.cycleComplete
+		outputPurged = {}
 		
 		for cycle in range(self.cycle):
 			# loop through tests for the cycle
@@ -301,6 +352,7 @@ class BaseRunner(ProcessUser):
 		
 				for descriptor in self.descriptors:
 					container = TestContainer(descriptor, cycle, self)
+					container.outputPurged = outputPurged.setdefault(descriptor.id, threading.Event())
 					if self.threads > 1:
 						request = WorkRequest(container, callback=self.containerCallback, exc_callback=self.containerExceptionCallback)
 						threadPool.putRequest(request)
@@ -338,7 +390,14 @@ class BaseRunner(ProcessUser):
 				threadPool.dismissWorkers(self.threads, True)
 				self.handleKbrdInt(prompt=False)
 		
+		# remove the directory used for any in-memory test output
+		if self.__memoryOutputRoot: backgroundDeleter.purge(self.__memoryOutputRoot, True)
+
+		# wait for any output directories still being purged and cores being compressed in the background
+		self.__waitForBackgroundFileTasks()
+
 		# perform cleanup on the test writers - this also takes care of logging summary results
+		self.__drainBackgroundWriters()
 		for writer in self.writers:
 			try: writer.cleanup()
 			except Exception: log.warn("caught %s cleaning up writer %s: %s", sys.exc_info()[0], writer.__class__.__name__, sys.exc_info()[1], exc_info=1)
@@ -348,6 +407,10 @@ class BaseRunner(ProcessUser):
 		for perfreporter in self.performanceReporters:
 				try: perfreporter.cleanup()
 				except Exception as e: log.warn("caught %s performing performance writer cleanup: %s", sys.exc_info()[0], sys.exc_info()[1], exc_info=1)
+				# ensure buffered results are written even if a subclass overrides cleanup
+				try: 
+					if hasattr(perfreporter, 'close'): perfreporter.close()
+				except Exception as e: log.warn("caught %s closing performance writer: %s", sys.exc_info()[0], sys.exc_info()[1], exc_info=1)
 
 		# call the hook to cleanup after running tests
 		self.cleanup()
@@ -372,6 +435,11 @@ class BaseRunner(ProcessUser):
 		"""
 		self.__remainingTests -= 1
 		
+		# cycles that were not needed are not reported
+		if container.converged:
+			log.info("Not running cycle %d of %s as its performance results have converged", container.cycle+1, container.descriptor.id)
+			return
+		
 		if self.threads > 1: 
 			# write out cached messages from the worker thread
 			sys.stdout.write(container.testFileHandlerStdout.stream.getvalue())
@@ -380,19 +448,26 @@ class BaseRunner(ProcessUser):
 		
 		# call the hook for end of test execution
 		self.testComplete(container.testObj, container.outsubdir)
+		
+		# after this the writers only need the result record, so the test object can be released
+		result = TestResult.fromTest(container.testObj, cycle=container.cycle, testStart=container.testStart, testTime=container.testTime)
+		container.testObj = None
 				
-		# pass the test object to the test writers is recording
+		# pass the test result to the test writers is recording
 		for writer in self.writers:
-			try: writer.processResult(container.testObj, cycle=container.cycle,
-									  testStart=container.testStart, testTime=container.testTime)
+			try: 
+				if writer in self.__backgroundWriters:
+					self.__backgroundWriters[writer].put(result, cycle=result.cycle, testStart=result.testStart, testTime=result.testTime)
+				else:
+					writer.processResult(result, cycle=result.cycle, testStart=result.testStart, testTime=result.testTime)
 			except Exception: log.warn("caught %s processing test result by %s: %s", sys.exc_info()[0], writer.__class__.__name__, sys.exc_info()[1], exc_info=1)
 		
 		# prompt for continuation on control-C
 		if container.kbrdInt == True: self.handleKbrdInt()
 	
 		# store the result
-		self.duration = self.duration + container.testTime
-		self.results[container.cycle][container.testObj.getOutcome()].append(container.descriptor.id)
+		self.duration = self.duration + result.testTime
+		self.results[result.cycle][result.finalOutcome].append(result.id)
 		
 
 	def containerExceptionCallback(self, thread, exc_info):
@@ -404,6 +479,29 @@ class BaseRunner(ProcessUser):
 		log.warn("caught %s from executing test container: %s", exc_info[0], exc_info[1], exc_info=exc_info)
 
 
+	def __drainBackgroundWriters(self):
+		"""Wait for writers running in the background to process all queued results. 
+		
+		"""
+		for writer in self.writers:
+			if writer in self.__backgroundWriters: self.__backgroundWriters.pop(writer).drain()
+
+
+	def __waitForBackgroundFileTasks(self):
+		"""Wait for output directories being purged and core files being compressed in the background, and 
+		report any failures. 
+		
+		"""
+		for path, ex in self.coreDetector.wait():
+			log.warn("Failed to compress core file %s: %s", path, ex)
+		
+		failures = backgroundDeleter.wait()
+		if not failures: return
+		log.warn("Failed to delete %d file(s) while purging output directories, for example %s: %s", len(failures), failures[0][0], failures[0][1])
+		for path, ex in failures:
+			log.debug("Failed to delete %s: %s", path, ex)
+
+
 	def handleKbrdInt(self, prompt=True):
 		"""Handle a keyboard exception caught during running of a set of testcases.
 		
@@ -413,6 +511,7 @@ class BaseRunner(ProcessUser):
 		
 		def finish():
 			# perform cleanup on the test writers - this also takes care of logging summary results
+			self.__drainBackgroundWriters()
 			for writer in self.writers:
 				try: writer.cleanup()
 				except Exception: log.warn("caught %s cleaning up writer %s: %s", sys.exc_info()[0], writer.__class__.__name__, sys.exc_info()[1], exc_info=1)
@@ -437,6 +536,45 @@ class BaseRunner(ProcessUser):
 			self.handleKbrdInt(prompt)
 
 
+class _BackgroundWriterQueue(object):
+	"""Queue of test results for a record writer, processed by a dedicated background thread. 
+	
+	Exceptions from the writer are held until the next result is queued or the queue is 
+	drained, then logged from the calling thread (since only the main thread logs to stdout). 
+	
+	"""
+	def __init__(self, writer):
+		self.writer = writer
+		self.queue = Queue.Queue()
+		self.errors = []
+		self.thread = threading.Thread(target=self.__run, name='writer-%s'%writer.__class__.__name__)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def put(self, testResult, **kwargs):
+		self.logErrors()
+		self.queue.put((testResult, kwargs))
+
+	def drain(self):
+		self.queue.put(None)
+		self.thread.join()
+		self.logErrors()
+
+	def logErrors(self):
+		while self.errors:
+			exc_info = self.errors.pop(0)
+			log.warn("caught %s processing test result by %s: %s", exc_info[0], self.writer.__class__.__name__, exc_info[1], exc_info=exc_info)
+
+	def __run(self):
+		while True:
+			item = self.queue.get()
+			if item is None: return
+			try: 
+				self.writer.processResult(item[0], **item[1])
+			except Exception: 
+				self.errors.append(sys.exc_info())
+
+
 class TestContainer(object):
 	"""Class used for co-ordinating the execution of a single test case.
 	
@@ -456,11 +594,15 @@ class TestContainer(object):
 		self.outsubdir = ""
 		self.testObj = None
 		self.testStart = None
+		self.cores = []
+		self.diskOutsubdir = None
 		self.testTime = None
 		self.testBuffer = []
 		self.testFileHandlerRunLog = None
 		self.testFileHandlerStdout = None
 		self.kbrdInt = False
+		self.converged = False
+		self.outputPurged = None
 
 		
 	def __call__(self, *args, **kwargs):
@@ -471,6 +613,14 @@ class TestContainer(object):
 		"""		
 		exc_info = []
 		self.testStart = time.time()
+		
+		# no need to run further cycles once the performance results have converged
+		try:
+			self.converged = self.cycle > 0 and any(p.hasConverged(self.descriptor.id) for p in self.runner.performanceReporters if hasattr(p, 'hasConverged'))
+		except Exception:
+			log.warn("caught %s checking whether performance results have converged: %s", sys.exc_info()[0], sys.exc_info()[1], exc_info=1)
+		if self.converged: return self
+		
 		try:
 			# stdout - set this up right at the very beginning to ensure we can see the log output in case any later step fails
 			self.testFileHandlerStdout = ThreadedStreamHandler(StringIO())
@@ -488,11 +638,19 @@ class TestContainer(object):
 					
 			if self.cycle == 0 and not self.runner.validateOnly: 
 				self.purgeDirectory(self.outsubdir)
+			elif self.cycle > 0 and self.outputPurged: 
+				# cycles can run concurrently, so must not add to the output until the first cycle has purged it
+				self.outputPurged.wait()
 				
 			if self.runner.cycle > 1: 
 				self.outsubdir = os.path.join(self.outsubdir, 'cycle%d' % (self.cycle+1))
 				mkdir(self.outsubdir)
 
+			# if configured, write the output to memory and move it to the output subdirectory when the test completes
+			memoryOutsubdir = self.runner.getMemoryOutputDir(self.descriptor, self.cycle)
+			if memoryOutsubdir: 
+				self.diskOutsubdir, self.outsubdir = self.outsubdir, memoryOutsubdir
+
 			# run.log handler
 			self.testFileHandlerRunLog = ThreadedFileHandler(os.path.join(self.outsubdir, 'run.log'))
 			self.testFileHandlerRunLog.setFormatter(PROJECT.formatters.runlog)
@@ -515,6 +673,9 @@ class TestContainer(object):
 		
 		except Exception:
 			exc_info.append(sys.exc_info())
+		
+		finally:
+			if self.cycle == 0 and self.outputPurged: self.outputPurged.set()
 			
 		# import the test class
 		with global_lock:
@@ -528,6 +689,7 @@ class TestContainer(object):
 			except Exception:
 				exc_info.append(sys.exc_info())
 				self.testObj = BaseTest(self.descriptor, self.outsubdir, self.runner)
+		if self.runner.cycle > 1: self.testObj.testCycle = self.cycle+1
 
 		for writer in self.runner.writers:
 			try: 
@@ -552,7 +714,7 @@ class TestContainer(object):
 			elif self.kbrdInt:
 				log.warn("test interrupt from keyboard")
 				self.testObj.addOutcome(BLOCKED, 'Test interrupt from keyboard', abortOnError=False)
-		
+
 			else:
 				try:
 					if not self.runner.validateOnly:
@@ -565,7 +727,15 @@ class TestContainer(object):
 					log.warn('Aborted test due to abortOnError set to true')
 
 				if self.detectCore(self.outsubdir):
-					self.testObj.addOutcome(DUMPEDCORE, 'Core detected in output subdirectory', abortOnError=False)
+					for core in self.cores:
+						log.warn("Detected core file: %s", core)
+						# cores in memory are compressed before the output is moved to disk, rather than in the background
+						if self.runner.compressCoreFiles: self.runner.coreDetector.compress(core, 
+							background=not (self.diskOutsubdir and core.startswith(self.outsubdir+os.sep)))
+					if all(os.path.dirname(core) == self.outsubdir for core in self.cores):
+						self.testObj.addOutcome(DUMPEDCORE, 'Core detected in output subdirectory', abortOnError=False)
+					else:
+						self.testObj.addOutcome(DUMPEDCORE, 'Core detected: %s'%', '.join(self.cores), abortOnError=False)
 		
 		except KeyboardInterrupt:
 			self.kbrdInt = True
@@ -582,7 +752,21 @@ class TestContainer(object):
 		except KeyboardInterrupt:
 			self.kbrdInt = True
 			self.testObj.addOutcome(BLOCKED, 'Test interrupt from keyboard', abortOnError=False)
+
+		# write any performance results buffered for this test to its output directory
+		for perfreporter in self.runner.performanceReporters:
+			try: 
+				if hasattr(perfreporter, 'testComplete'): perfreporter.testComplete(self.testObj)
+			except Exception: 
+				log.warn("caught %s completing performance results for %s: %s", sys.exc_info()[0], self.descriptor.id, sys.exc_info()[1], exc_info=1)
 			
+		# persist output that was written to memory before the summary, so that any failure is included in it
+		if self.diskOutsubdir:
+			try:
+				self.persistMemoryOutput()
+			except Exception:
+				self.testObj.addOutcome(BLOCKED, 'Failed to move output from %s to %s: %s'%(self.outsubdir, self.diskOutsubdir, sys.exc_info()[1]), abortOnError=False)
+		
 		# print summary and close file handles
 		try:
 			self.testTime = math.floor(100*(time.time() - self.testStart))/100.0
@@ -595,38 +779,65 @@ class TestContainer(object):
 			
 			self.testFileHandlerRunLog.close()
 			log.removeHandler(self.testFileHandlerRunLog)
-			log.removeHandler(self.testFileHandlerStdout)
 		except Exception: 
 			pass
 		
+		# the run.log can only be moved once it is closed, so a failure here can only be reported to stdout
+		if self.diskOutsubdir:
+			memoryOutsubdir, diskOutsubdir = self.outsubdir, self.diskOutsubdir
+			try:
+				self.persistMemoryRunLog()
+			except Exception:
+				log.warn("caught %s moving run.log from %s to %s: %s", sys.exc_info()[0], memoryOutsubdir, diskOutsubdir, sys.exc_info()[1])
+				self.testObj.addOutcome(BLOCKED, 'Failed to move run.log from %s to %s: %s'%(memoryOutsubdir, diskOutsubdir, sys.exc_info()[1]), abortOnError=False)
+		log.removeHandler(self.testFileHandlerStdout)
+		
 		# return a reference to self
 		return self
 	
 	
 	# utility methods
+	def persistMemoryOutput(self):
+		"""Move the output of a test that was written to memory into the output subdirectory. 
+		
+		All files are moved if the test did not pass; for a test that passed only the run.log is kept, and 
+		the rest of the output is discarded. This is called before the test outcome is logged, while the run.log 
+		is still being written, so the run.log is moved later by L{persistMemoryRunLog}. 
+		
+		"""
+		if self.testObj.getOutcome() == PASSED: return
+		for file in os.listdir(self.outsubdir):
+			if file != 'run.log':
+				shutil.move(os.path.join(self.outsubdir, file), os.path.join(self.diskOutsubdir, file))
+
+
+	def persistMemoryRunLog(self):
+		"""Move the run.log of a test that was written to memory into the output subdirectory once it has been 
+		closed, and delete the output directory in memory. 
+		
+		"""
+		try:
+			if os.path.exists(os.path.join(self.outsubdir, 'run.log')):
+				shutil.move(os.path.join(self.outsubdir, 'run.log'), os.path.join(self.diskOutsubdir, 'run.log'))
+		finally:
+			self.purgeDirectory(self.outsubdir, True)
+			self.outsubdir, self.diskOutsubdir = self.diskOutsubdir, None
+			self.testObj.output = self.outsubdir
+
+
 	def purgeDirectory(self, dir, delTop=False):
-		"""Recursively purge a directory removing all files and sub-directories.
+		"""Purge a directory removing all files and sub-directories.
+		
+		The directory is moved aside and then deleted in the background by 
+		L{pysys.utils.fileutils.backgroundDeleter}, so the test can start without waiting for the 
+		deletion to complete. Any files that could not be deleted are reported at the end of the run. 
 		
 		@param dir: The top level directory to be purged
 		@param delTop: Indicates if the top level directory should also be deleted
 
 		"""
 		try:
-			for file in os.listdir(dir):
-				path = os.path.join(dir, file)
-				if PLATFORM in ['sunos', 'linux']:
-					mode = os.lstat(path)[stat.ST_MODE]
-				else:
-					mode = os.stat(path)[stat.ST_MODE]
-			
-				if stat.S_ISLNK(mode):
-					os.unlink(path)
-				if stat.S_ISREG(mode):
-					os.remove(path)
-				elif stat.S_ISDIR(mode):
-					self.purgeDirectory(path, delTop=True)
-			if delTop: os.rmdir(dir)
-
+			backgroundDeleter.purge(dir, delTop)
 		except OSError as ex:
 			log.warning("Caught OSError in purgeDirectory():")
 			log.warning(ex)
@@ -634,18 +845,20 @@ class TestContainer(object):
 
 
 	def detectCore(self, dir):
-		"""Detect any core files in a directory (unix systems only), returning C{True} if a core is present.
+		"""Detect any core files produced by the test, returning C{True} if a core is present.
+		
+		Cores are found using the L{pysys.utils.coredetect.CoreDetector} of the runner, which searches the output 
+		directory and (on Linux) the location given by the kernel core_pattern for cores from the processes 
+		started by the test. The paths of any cores found are stored in C{self.cores}. 
 		
 		@param dir: The directory to search for core files
 		@return: C{True} if a core detected, None if no core detected
 		@rtype: integer 
 		"""
 		try:
-			for file in os.listdir(dir):
-				path = os.path.join(dir, file)
-				mode = os.stat(path)[stat.ST_MODE]
-				if stat.S_ISREG(mode):
-					if re.search('^core', file): return True
+			pids = [process.pid for process in getattr(self.testObj, 'processList', [])]
+			self.cores = self.runner.coreDetector.detect(dir, pids=pids, since=self.testStart)
+			if self.cores: return True
 
 		except OSError as ex:
 			log.warning("Caught OSError in detectCore():")
@@ -22,21 +22,28 @@ Contains the base test class for test execution and validation.
 For more information see the L{pysys.basetest.BaseTest} API documentation. 
 
 """
-import os.path, time, threading, logging
+import os.path, time, threading, logging, inspect
 
 from pysys import log
 from pysys.constants import *
 from pysys.exceptions import *
 from pysys.utils.filegrep import filegrep
 from pysys.utils.filegrep import lastgrep
-from pysys.utils.filediff import filediff
+from pysys.utils.filediff import filediff, DIFF_MAX_EDITS, DIFF_MAX_HUNKS
 from pysys.utils.filegrep import orderedgrep
 from pysys.utils.linecount import linecount
+from pysys.utils.filecopy import stagefile, stagedir
+from pysys.utils.fileutils import mkdir
+from pysys.utils.perfreporter import PerformanceUnit
 from pysys.process.monitor import ProcessMonitor
-from pysys.manual.ui import ManualTester
 from pysys.process.user import ProcessUser
 from pysys.utils.pycompat import *
 
+try:
+	import Queue
+except Exception:
+	import queue as Queue
+
 TEST_TEMPLATE = '''%s
 %s
 
@@ -49,6 +56,35 @@ class %s(%s):
 '''
 
 
+class _CapturingLogHandler(logging.Handler):
+	"""Log handler that captures the log records from the thread that created it, so they 
+	can be logged later from the test thread. 
+	
+	"""
+	def __init__(self, records):
+		logging.Handler.__init__(self, logging.DEBUG)
+		self.threadId = threading.current_thread().ident
+		self.records = records
+	
+	def emit(self, record):
+		if self.threadId != threading.current_thread().ident: return
+		self.records.append((_PendingAssertion.LOG, record))
+
+
+class _PendingAssertion(object):
+	"""Holds an assertion submitted with L{BaseTest.submitAssertion}, and the log records and 
+	outcomes it produces until they are gathered. 
+	
+	"""
+	LOG, OUTCOME, EXCEPTION = range(3)
+	
+	def __init__(self, assertion, args, kwargs, callRecord):
+		self.assertion, self.args, self.kwargs = assertion, args, kwargs
+		self.callRecord = callRecord
+		self.events = []
+		self.done = threading.Event()
+
+
 class BaseTest(ProcessUser):
 	"""The base class for all PySys testcases.
 
@@ -78,6 +114,9 @@ class BaseTest(ProcessUser):
 	@ivar mode: The user defined mode the test is running within. Subclasses can use this in conditional checks
 	           to modify the test execution based upon the mode.
 	@type mode: string
+	@ivar testCycle: The cycle in which this test is running. Numbering starts from 1 in a multi-cycle test run. 
+	The special value of 0 is used to indicate that this is not part of a multi-cycle run. 
+	@type testCycle: integer
 	@ivar input: Full path to the input directory of the testcase. This is used both by the class and its 
 	            subclasses to locate the default directory containing all input data to the testcase, as defined
 	            in the testcase descriptor.  
@@ -92,6 +131,9 @@ class BaseTest(ProcessUser):
 	            subclasses to locate the default directory containing all reference data to the testcase, as defined
 	            in the testcase descriptor.  
 	@type reference: string
+	@ivar performanceResults: A list of (resultKey, value, unit) tuples for each performance result reported 
+	by this test using L{reportPerformanceResult}
+	@type performanceResults: list
 	@ivar log: Reference to the logger instance of this class
 	@type log: logging.Logger
 	@ivar project: Reference to the project details as set on the module load of the launching executable  
@@ -114,10 +156,16 @@ class BaseTest(ProcessUser):
 		self.reference = descriptor.reference
 		self.runner = runner
 		self.mode = runner.mode
+		self.testCycle = 0
 		self.setKeywordArgs(runner.xargs)
 		self.monitorList = []
 		self.manualTester = None
 		self.resources = []
+		self.performanceResults = []
+		self.__pendingAssertions = []
+		self.__assertionQueue = None
+		self.__assertionThreads = []
+		self.__assertionThreadState = threading.local()
 
 
 	def setKeywordArgs(self, xargs):
@@ -172,6 +220,15 @@ class BaseTest(ProcessUser):
 				
 		"""
 		try:
+			if self.__pendingAssertions:
+				log.warn('Gathering %d submitted assertion(s) that were not gathered by the test', len(self.__pendingAssertions))
+				try:
+					self.gatherAssertions()
+				except AbortExecution as e:
+					self.addOutcome(e.outcome, e.value, abortOnError=False, callRecord=e.callRecord)
+			for t in self.__assertionThreads: self.__assertionQueue.put(None)
+			self.__assertionThreads = []
+			
 			if self.manualTester and self.manualTester.running():
 				self.stopManualTester()
 		
@@ -193,6 +250,35 @@ class BaseTest(ProcessUser):
 		self.resources.append(resource)
 
 
+	def stageInput(self, path=None, dest=None, hardlink=False):
+		"""Populate the output directory with a file or directory from the test input directory. 
+		
+		This is much faster than copying for large input data, since where possible each file is cloned 
+		using a copy-on-write reflink, or hard linked if requested, falling back to a normal copy if not 
+		supported. The files of a directory are staged in parallel. See L{pysys.utils.filecopy.stagefile} 
+		for details. 
+		
+		@param path: The path of the file or directory relative to the input directory, or None to stage 
+		the entire input directory
+		@param dest: The destination path relative to the output directory, defaulting to the same relative 
+		path as the source
+		@param hardlink: Indicates if files should be hard linked rather than copied. This is only suitable 
+		for files that are not modified by the test, since any change would also affect the input file. 
+		@return: The absolute path of the staged file or directory
+		
+		"""
+		src = os.path.join(self.input, path) if path else self.input
+		dest = os.path.join(self.output, dest if dest is not None else (path or ''))
+		if os.path.isdir(src):
+			count = stagedir(src, dest, hardlink=hardlink, threads=min(8, max(2, N_CPUS)))
+			self.log.debug("Staged %d input files from %s to %s", count, src, dest)
+		else:
+			mkdir(os.path.dirname(dest))
+			method = stagefile(src, dest, hardlink=hardlink)
+			self.log.debug("Staged input file %s to %s using %s", src, dest, method)
+		return dest
+
+
 	def startProcessMonitor(self, process, interval, file, **kwargs):
 		"""Start a separate thread to log process statistics to logfile, and return a handle to the process monitor.
 		
@@ -254,6 +340,7 @@ class BaseTest(ProcessUser):
 		if filedir is None: filedir = self.input
 	
 		if not self.manualTester or self.manualTester.running() == 0:
+			from pysys.manual.ui import ManualTester
 			self.manualTester = ManualTester(self, os.path.join(filedir, file))
 			t = threading.Thread(target=self.manualTester.start, name=self.__class__.__name__+'.manualtester')
 			t.start()
@@ -392,6 +479,10 @@ class BaseTest(ProcessUser):
 		after pre-processing be equivalent a C{PASSED} outcome is added to the test outcome list, otherwise
 		a C{FAILED} outcome is added.
 		
+		On failure a unified diff is written to the output directory and logged. To keep failing runs fast 
+		the diff is capped, which can be configured with the diffMaxEdits and diffMaxHunks project 
+		properties (see L{pysys.utils.filediff.unifiedDiff}).
+		
 		@param file1: The basename of the first file used in the file comparison
 		@param file2: The basename of the second file used in the file comparison (often a reference file)
 		@param filedir1: The dirname of the first file (defaults to the testcase output subdirectory)
@@ -424,7 +515,8 @@ class BaseTest(ProcessUser):
 		unifiedDiffOutput=os.path.join(self.output, os.path.basename(f1)+'.diff')
 		result = False
 		try:
-			result = filediff(f1, f2, ignores, sort, replace, includes, unifiedDiffOutput=unifiedDiffOutput, encoding=encoding or self.getDefaultFileEncoding(f1))
+			result = filediff(f1, f2, ignores, sort, replace, includes, unifiedDiffOutput=unifiedDiffOutput, encoding=encoding or self.getDefaultFileEncoding(f1),
+				diffMaxEdits=int(getattr(PROJECT, 'diffMaxEdits', DIFF_MAX_EDITS)), diffMaxHunks=int(getattr(PROJECT, 'diffMaxHunks', DIFF_MAX_HUNKS)))
 		except Exception:
 			log.warn("caught %s: %s", sys.exc_info()[0], sys.exc_info()[1], exc_info=1)
 			self.addOutcome(BLOCKED, '%s failed due to %s: %s'%(msg, sys.exc_info()[0], sys.exc_info()[1]), abortOnError=self.__abortOnError(xargs))
@@ -570,8 +662,9 @@ class BaseTest(ProcessUser):
 		
 		msg = self.__assertMsg(xargs, 'Ordered grep on input file %s' % file)
 		expr = None
+		matchedLines = []
 		try:
-			expr = orderedgrep(f, exprList, encoding=encoding or self.getDefaultFileEncoding(f))
+			expr = orderedgrep(f, exprList, encoding=encoding or self.getDefaultFileEncoding(f), matchedLines=matchedLines)
 		except Exception:
 			log.warn("caught %s: %s", sys.exc_info()[0], sys.exc_info()[1], exc_info=1)
 			self.addOutcome(BLOCKED, '%s failed due to %s: %s'%(msg, sys.exc_info()[0], sys.exc_info()[1]), abortOnError=self.__abortOnError(xargs))
@@ -586,7 +679,11 @@ class BaseTest(ProcessUser):
 				result = FAILED
 
 			if result == FAILED and expr: 
-				msg += ' failed on expression \"%s\"'% expr
+				msg += ' failed on expression \"%s\" (%d of %d)'% (expr, len(matchedLines)+1, len(exprList))
+				if matchedLines:
+					msg += ' after matching the previous expression at line %d'%matchedLines[-1][0]
+					for (lineno, line), e in zip(matchedLines, exprList):
+						log.debug('  Matched expression "%s" at line %d: %s', e, lineno, line)
 			self.addOutcome(result, msg, abortOnError=self.__abortOnError(xargs))
 
 	
@@ -658,6 +755,109 @@ class BaseTest(ProcessUser):
 		return PROJECT.defaultAbortOnError.lower()=='true' if hasattr(PROJECT, 'defaultAbortOnError') else DEFAULT_ABORT_ON_ERROR
 
 
+	def addOutcome(self, outcome, outcomeReason='', printReason=True, abortOnError=None, callRecord=None):
+		"""Add a validation outcome (and optionally a reason string) to the validation list.
+		
+		See L{ProcessUser.addOutcome}. When called from an assertion submitted with L{submitAssertion} 
+		the outcome is held back until L{gatherAssertions} is called. 
+		
+		"""
+		pending = getattr(self.__assertionThreadState, 'pending', None)
+		if pending is None:
+			ProcessUser.addOutcome(self, outcome, outcomeReason, printReason=printReason, abortOnError=abortOnError, callRecord=callRecord)
+		else:
+			pending.events.append((_PendingAssertion.OUTCOME, (outcome, outcomeReason, printReason, abortOnError, callRecord or pending.callRecord)))
+
+
+	# methods for running independent assertions in parallel
+	def submitAssertion(self, assertion, *args, **kwargs):
+		"""Submit an assertion to be run on a background thread, in parallel with other submitted assertions. 
+		
+		This allows slow assertions that do not depend on each other (such as L{assertDiff} or L{assertGrep} 
+		on large files) to run at the same time on multi-core machines. The outcomes of the submitted 
+		assertions are only added to the test, and their log output written, when L{gatherAssertions} is called. 
+		This is done in the order the assertions were submitted, so the run.log is the same as if they had been 
+		called one after another. For example ::
+		
+		    self.submitAssertion(self.assertDiff, 'server.out', 'ref_server.out')
+		    self.submitAssertion(self.assertGrep, 'server.log', expr=' ERROR ', contains=False)
+		    self.gatherAssertions()
+		
+		Any assertions not gathered by the test are gathered during L{cleanup}. The maximum number of threads used 
+		for each test can be set with the parallelAssertionThreads project property, which defaults to 
+		the number of CPUs (up to a maximum of 4). 
+		
+		Submitted assertions must not depend on each other, or on anything else the test does before calling 
+		gatherAssertions. 
+		
+		@param assertion: The assertion method to call, for example C{self.assertDiff}
+		@param args: The positional arguments to pass to the assertion
+		@param kwargs: The keyword arguments to pass to the assertion
+		
+		"""
+		caller = inspect.getframeinfo(inspect.currentframe().f_back)
+		pending = _PendingAssertion(assertion, args, kwargs, ['%s:%s'%(os.path.basename(caller.filename), caller.lineno)])
+		
+		if self.__assertionQueue is None: self.__assertionQueue = Queue.Queue()
+		maxThreads = int(getattr(PROJECT, 'parallelAssertionThreads', min(4, N_CPUS)))
+		if len(self.__assertionThreads) < maxThreads:
+			t = threading.Thread(target=self.__assertionWorker, name='assertions-%d'%len(self.__assertionThreads))
+			t.daemon = True
+			t.start()
+			self.__assertionThreads.append(t)
+		
+		self.__pendingAssertions.append(pending)
+		self.__assertionQueue.put(pending)
+
+
+	def gatherAssertions(self):
+		"""Wait for all assertions submitted with L{submitAssertion} to complete, and add their outcomes to the test.
+		
+		Outcomes and log output are added in the order the assertions were submitted. If an assertion 
+		fails and abortOnError is enabled, the test is aborted after the log output for that assertion is written. 
+		If a submitted assertion raised an exception, the outcomes and log output of all the submitted assertions 
+		are still added, and then the test is aborted with a C{BLOCKED} outcome for the first exception. 
+		
+		"""
+		pendingAssertions, self.__pendingAssertions = self.__pendingAssertions, []
+		error = None
+		for pending in pendingAssertions:
+			while not pending.done.wait(1.0): pass # wait with a timeout so we can be interrupted
+			for event, value in pending.events:
+				if event == _PendingAssertion.LOG:
+					log.handle(value)
+				elif event == _PendingAssertion.OUTCOME:
+					outcome, outcomeReason, printReason, abortOnError, callRecord = value
+					ProcessUser.addOutcome(self, outcome, outcomeReason, printReason=printReason, abortOnError=abortOnError, callRecord=callRecord)
+				else:
+					log.warn("caught %s from submitted assertion: %s", value[0], value[1], exc_info=value)
+					if error is None: 
+						error = ('Submitted assertion %s raised %s: %s'%(getattr(pending.assertion, '__name__', pending.assertion), 
+							value[0].__name__, value[1]), pending.callRecord)
+		if error: self.abort(BLOCKED, error[0], error[1])
+
+
+	def __assertionWorker(self):
+		"""Run submitted assertions from the queue, capturing their outcomes and log output. 
+		
+		"""
+		while True:
+			pending = self.__assertionQueue.get()
+			if pending is None: return
+			
+			handler = _CapturingLogHandler(pending.events)
+			log.addHandler(handler)
+			self.__assertionThreadState.pending = pending
+			try:
+				pending.assertion(*pending.args, **pending.kwargs)
+			except Exception:
+				pending.events.append((_PendingAssertion.EXCEPTION, sys.exc_info()))
+			finally:
+				self.__assertionThreadState.pending = None
+				log.removeHandler(handler)
+				pending.done.set()
+
+
 	def reportPerformanceResult(self, value, resultKey, unit, toleranceStdDevs=None, resultDetails=None):
 		""" Reports a new performance result, with an associated unique key that identifies it for  comparison purposes.
 		
@@ -691,5 +891,6 @@ class BaseTest(ProcessUser):
 		test is running in.
 
 		"""
+		self.performanceResults.append((resultKey, value, {'s':PerformanceUnit.SECONDS, '/s':PerformanceUnit.PER_SECOND}.get(unit, unit)))
 		for p in self.runner.performanceReporters:
 			p.reportResult(self, value, resultKey, unit, toleranceStdDevs=toleranceStdDevs, resultDetails=resultDetails)
\ No newline at end of file
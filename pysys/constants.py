@@ -27,7 +27,7 @@ about the structure and contents of the project file, see the PySys examples
 distribution. 
 
 """
-import sys, re, os, os.path, socket, traceback
+import sys, re, os, os.path, socket, traceback, threading
 
 # if set is not available (>python 2.6) fall back to the sets module
 try:  
@@ -38,8 +38,44 @@ except NameError:
 
 from pysys import stdoutHandler
 
+# the maximum time to wait for the DNS lookup of the fully qualified host name
+HOSTNAME_LOOKUP_TIMEOUT = 5
+
+__hostnameLock = threading.Lock()
+__hostname = []
+
+def getHostname():
+	"""Return the fully qualified name of this host. 
+	
+	The name is resolved on first use rather than when this module is imported, since the DNS lookup 
+	can be slow on machines with a misconfigured network. If the lookup takes longer than 
+	C{HOSTNAME_LOOKUP_TIMEOUT} seconds, the unqualified host name is used instead. 
+	
+	The C{HOSTNAME} constant is deprecated in favour of this function. On Python 3.7+ it is only available 
+	as C{pysys.constants.HOSTNAME} (or by importing it explicitly), not using C{from pysys.constants import *}. 
+	
+	@return: The host name. 
+	"""
+	with __hostnameLock:
+		if not __hostname:
+			result = []
+			lookup = threading.Thread(target=lambda: result.append(socket.getfqdn()), name='pysys.hostname')
+			lookup.daemon = True
+			lookup.start()
+			lookup.join(HOSTNAME_LOOKUP_TIMEOUT)
+			__hostname.append(result[0] if result else socket.gethostname())
+		return __hostname[0]
+
+# HOSTNAME is deprecated in favour of getHostname(). On Python 3.7+ it is resolved when first accessed as 
+# pysys.constants.HOSTNAME, so it is not included in "from pysys.constants import *" (which would resolve it)
+if sys.version_info[:2] >= (3, 7):
+	def __getattr__(name):
+		if name == 'HOSTNAME': return getHostname()
+		raise AttributeError("module %r has no attribute %r" % (__name__, name))
+else:
+	HOSTNAME = getHostname()
+
 # set the platform and platform related constants
-HOSTNAME = socket.getfqdn()
 if re.search('win32', sys.platform):
 	PLATFORM='win32'	
 	OSFAMILY='windows'
@@ -92,6 +128,14 @@ else:
 	DYLD_LIBRARY_PATH = ''
 	SITE_PACKAGES_DIR = os.path.join(sys.prefix, "lib", "python%s" % sys.version[:3], "site-packages")
 
+N_CPUS = 1
+try:
+	# multiprocessing is a new module in 2.6 so we can't assume it
+	import multiprocessing
+	N_CPUS = multiprocessing.cpu_count()
+except ImportError:
+	pass
+
 # constants used in testing
 TRUE=True
 FALSE=False
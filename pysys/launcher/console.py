@@ -25,8 +25,8 @@ from pysys import __version__
 from pysys.constants import *
 from pysys.launcher import createDescriptors
 from pysys.xml.descriptor import DESCRIPTOR_TEMPLATE
-from pysys.basetest import TEST_TEMPLATE
 from pysys.utils.loader import import_module
+from pysys.utils.fileutils import backgroundDeleter
 
 EXPR1 = re.compile("^[\w\.]*=.*$")
 EXPR2 = re.compile("^[\w\.]*$")
@@ -111,23 +111,12 @@ class ConsoleCleanTestHelper(object):
 				else:
 					log.debug("Output directory does not exist: " + pathToDelete)
 
+			for path, ex in backgroundDeleter.wait():
+				log.warn("Failed to delete %s: %s", path, ex)
 
-	def purgeDirectory(self, dir, delTop=False):
-		for file in os.listdir(dir):
-			path = os.path.join(dir, file)
-			if PLATFORM in ['sunos', 'linux']:
-				mode = os.lstat(path)[stat.ST_MODE]
-			else:
-				mode = os.stat(path)[stat.ST_MODE]
-		
-			if stat.S_ISLNK(mode):
-				os.unlink(path)
-			if stat.S_ISREG(mode):
-				os.remove(path)
-			elif stat.S_ISDIR(mode):
-				self.purgeDirectory(path, delTop=True)
 
-		if delTop: os.rmdir(dir)
+	def purgeDirectory(self, dir, delTop=False):
+		backgroundDeleter.purge(dir, delTop)
 
 
 class ConsolePrintHelper(object):
@@ -359,6 +348,7 @@ class ConsoleMakeTestHelper(object):
 			log.info("Created descriptor %s " % os.path.join(self.testdir, self.testId, descriptor))
 			testclass_fp = open(os.path.join(self.testdir, self.testId, "%s.py" % module), "w")
 			if teststring == None:
+				from pysys.basetest import TEST_TEMPLATE
 				testclass_fp.write(TEST_TEMPLATE % (constantsImport, basetestImport, testclass, basetest))
 			else:
 				testclass_fp.write(teststring)
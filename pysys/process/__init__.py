@@ -34,7 +34,8 @@ correct modules based on their current operation system.
 from pysys.constants import *
 
 # set the modules to import when imported the pysys.process package
-__all__ = [ "helper",
+__all__ = [ "conditions",
+			"helper",
 			"monitor",
 			"user" ]
 
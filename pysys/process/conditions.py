@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# PySys System Test Framework, Copyright (C) 2006-2018  M.B.Grieve
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# Contact: moraygrieve@users.sourceforge.net
+"""
+Conditions that can be waited for together using L{pysys.process.user.ProcessUser.waitForConditions},
+for example to wait until a server has started.
+
+e.g.
+	self.waitForConditions([
+		ProcessRunning(server),
+		SocketAccepts(port),
+		FileContains('server.log', 'Server started'),
+	])
+
+"""
+
+import os, re, codecs, locale
+
+from pysys.constants import *
+
+__all__ = ['WaitCondition', 'FileExists', 'FileContains', 'SocketAccepts', 'ProcessRunning']
+
+class WaitCondition(object):
+	"""Base class for conditions that can be waited for.
+
+	Once a condition has been satisfied it is not checked again, however L{getFailure} is called for every
+	condition each time the conditions are checked.
+	"""
+	def check(self, owner):
+		"""Check whether the condition is satisfied.
+
+		@param owner: The L{pysys.process.user.ProcessUser} that is waiting.
+		@return: True if the condition is satisfied.
+		"""
+		raise NotImplementedError()
+
+	def getFailure(self):
+		"""Return a message if the condition can never be satisfied, in which case the wait will
+		be aborted, otherwise None.
+		"""
+		return None
+
+class FileExists(WaitCondition):
+	"""Satisfied when a file exists.
+	"""
+	def __init__(self, file, filedir=None):
+		"""
+		@param file: The absolute or relative name of the file.
+		@param filedir: The dirname of the file (defaults to the testcase output subdirectory)
+		"""
+		self.file, self.filedir = file, filedir
+
+	def check(self, owner):
+		return os.path.exists(os.path.join(self.filedir or owner.output, self.file))
+
+	def __str__(self):
+		return 'file %s exists'%self.file
+
+class FileContains(WaitCondition):
+	"""Satisfied when the number of lines in a text file matching a regular expression meets a condition,
+	as for L{pysys.process.user.ProcessUser.waitForSignal}.
+
+	Only the data appended to the file since it was last checked is read each time.
+	"""
+	def __init__(self, file, expr, condition='>=1', filedir=None, encoding=None):
+		"""
+		@param file: The absolute or relative name of the file.
+		@param expr: The regular expression to search for in the file.
+		@param condition: The condition to be met for the number of lines matching the regular expression.
+		@param filedir: The dirname of the file (defaults to the testcase output subdirectory)
+		@param encoding: The encoding to use to read the file, or None to use
+		L{pysys.process.user.ProcessUser.getDefaultFileEncoding}.
+		"""
+		self.file, self.expr, self.condition, self.filedir, self.encoding = file, expr, condition, filedir, encoding
+		self.matches = 0
+		self.__regex = re.compile(expr)
+		self.__offset = 0
+		self.__partial = ''
+		self.__decoder = None
+
+	def check(self, owner):
+		path = os.path.join(self.filedir or owner.output, self.file)
+		try:
+			f = open(path, 'rb')
+		except (IOError, OSError):
+			return False
+		with f:
+			if os.fstat(f.fileno()).st_size < self.__offset:
+				# the file has been replaced or truncated so start again
+				self.__offset, self.__partial, self.__decoder, self.matches = 0, '', None, 0
+			if self.__decoder is None:
+				encoding = self.encoding or owner.getDefaultFileEncoding(path) or locale.getpreferredencoding()
+				self.__decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+			f.seek(self.__offset)
+			data = f.read()
+		self.__offset += len(data)
+
+		lines = (self.__partial+self.__decoder.decode(data)).split('\n')
+		self.__partial = lines.pop()
+		self.matches += sum(1 for line in lines if self.__regex.search(line[:-1] if line.endswith('\r') else line))
+		return eval('%d %s'%(self.matches, self.condition))
+
+	def __str__(self):
+		return 'signal "%s" %s in %s (%d matches)'%(self.expr, self.condition, os.path.basename(self.file), self.matches)
+
+class SocketAccepts(WaitCondition):
+	"""Satisfied when a connection can be made to a server socket.
+
+	All sockets being waited for are connected to at the same time using
+	L{pysys.utils.netutils.SocketConnector}.
+	"""
+	def __init__(self, port, host='localhost'):
+		"""
+		@param port: The port of the server.
+		@param host: The host of the server.
+		"""
+		self.endpoint = (host, port)
+
+	def check(self, owner):
+		# sockets are checked by the waiting loop together
+		return False
+
+	def __str__(self):
+		return 'socket %s:%d accepts connections'%self.endpoint
+
+class ProcessRunning(WaitCondition):
+	"""Requires a process to remain running for the whole wait, which is aborted if it terminates.
+	"""
+	def __init__(self, process):
+		"""
+		@param process: The process handle returned by startProcess.
+		"""
+		self.process = process
+
+	def check(self, owner):
+		return self.process.running()
+
+	def getFailure(self):
+		if not self.process.running(): return 'process %s terminated'%self.process
+		return None
+
+	def __str__(self):
+		return 'process %s running'%self.process
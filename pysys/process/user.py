@@ -25,8 +25,9 @@ from pysys.exceptions import *
 from pysys.utils.filegrep import getmatches
 from pysys.utils.logutils import BaseLogFormatter
 from pysys.process.helper import ProcessWrapper
-from pysys.utils.allocport import TCPPortOwner
-from pysys.utils.fileutils import mkdir
+from pysys.utils.allocport import TCPPortOwner, TCPPortsOwner
+from pysys.utils.netutils import SocketConnector
+from pysys.utils.fileutils import mkdir, readlinesreverse
 from pysys.utils.pycompat import *
 
 STDOUTERR_TUPLE = collections.namedtuple('stdouterr', ['stdout', 'stderr'])
@@ -306,54 +307,60 @@ class ProcessUser(object):
 		@param process: If a handle to a process is specified, the wait will abort if 
 		the process dies before the socket becomes available.
 		"""
+		return self.waitForSockets([(host, port)], timeout=timeout, abortOnError=abortOnError, process=process)
+
+
+	def waitForSockets(self, endpoints, timeout=TIMEOUTS['WaitForSocket'], abortOnError=None, process=None):
+		"""Wait until it is possible to establish socket connections to servers on all of the specified 
+		endpoints. 
+		
+		Connections to all endpoints are attempted at the same time using non-blocking sockets, so 
+		waiting for the nodes of a cluster takes no longer than waiting for the slowest of them. A connection 
+		that is refused is retried after a short delay, which increases exponentially up to 
+		C{pysys.utils.netutils.CONNECT_RETRY_MAX} seconds. If the connections cannot all be made within 
+		the specified timeout interval, the method returns to the caller, or aborts the test if abortOnError=True. 
+		
+		@param endpoints: A list of (host, port) tuples, or port numbers on localhost. 
+		@param timeout: The timeout in seconds to wait for connections to all the sockets
+		@param abortOnError: If true abort the test on any error outcome (defaults to the defaultAbortOnError
+		project setting)
+		@param process: If a handle to a process is specified, the wait will abort if 
+		the process dies before the sockets become available.
+		@return: True if connections were made to all of the endpoints, or False if not. 
+		"""
 		if abortOnError == None: abortOnError = self.defaultAbortOnError
+		endpoints = [('localhost', e) if isinstance(e, int) else tuple(e) for e in endpoints]
 
 		log.debug("Performing wait for socket creation:")
-		log.debug("  port:       %d" % port)
-		log.debug("  host:       %s" % host)
-
-		with process_lock:
-			s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-			# the following lines are to prevent handles being inherited by 
-			# other processes started while this test is runing
-			if OSFAMILY =='windows':
-				s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, 0)
-				import win32api, win32con
-				win32api.SetHandleInformation(s.fileno(), win32con.HANDLE_FLAG_INHERIT, 0)
-				s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-			else:
-				import fcntl
-				fcntl.fcntl(s.fileno(), fcntl.F_SETFD, 1)
-			
+		for host, port in endpoints:
+			log.debug("  host:port:  %s:%d" % (host, port))
+
+		connector = SocketConnector(endpoints)
 		startTime = time.time()
-		while True:
-			try:
-				s.connect((host, port))
-				s.shutdown(socket.SHUT_RDWR)
+		try:
+			while True:
+				# check the process and timeout at least every 100ms
+				pending = connector.poll(0.1 if not timeout else max(0, min(0.1, startTime+timeout-time.time())))
+				if not pending:
+					log.debug("Wait for socket creation completed successfully")
+					if time.time()-startTime>10:
+						log.info("Wait for socket creation completed after %d secs", time.time()-startTime)
+					return True
 				
-				log.debug("Wait for socket creation completed successfully")
-				if time.time()-startTime>10:
-					log.info("Wait for socket creation completed after %d secs", time.time()-startTime)
-				return True
-			except socket.error:
+				pendingDetails = '' if len(endpoints) == 1 else ' (still waiting for %s)'%', '.join('%s:%d'%e for e in pending)
+				msg = None
 				if process and not process.running():
-					msg = "Waiting for socket connection aborted due to unexpected process %s termination"%(process)
+					msg, outcome = "Waiting for socket connection aborted due to unexpected process %s termination%s"%(process, pendingDetails), BLOCKED
+				elif timeout and time.time() > startTime + timeout:
+					msg, outcome = "Timed out waiting for creation of socket after %d secs%s"%(time.time()-startTime, pendingDetails), TIMEDOUT
+				if msg:
 					if abortOnError:
-						self.abort(BLOCKED, msg, self.__callRecord())
+						self.abort(outcome, msg, self.__callRecord())
 					else:
 						log.warn(msg)
 					return False
-
-				if timeout:
-					currentTime = time.time()
-					if currentTime > startTime + timeout:
-						msg = "Timed out waiting for creation of socket after %d secs"%(time.time()-startTime)
-						if abortOnError:
-							self.abort(TIMEDOUT, msg, self.__callRecord())
-						else:
-							log.warn(msg)
-						return False
-			time.sleep(0.01)
+		finally:
+			connector.close()
 
 
 	def waitForFile(self, file, filedir=None, timeout=TIMEOUTS['WaitForFile'], abortOnError=None):
@@ -484,6 +491,72 @@ class ProcessUser(object):
 		return matches
 
 
+	def waitForConditions(self, conditions, timeout=TIMEOUTS['WaitForSignal'], poll=0.1, abortOnError=None):
+		"""Wait until a set of conditions are all satisfied, for example that a server process is still 
+		running, is accepting connections on its ports and has logged that it has started. 
+		
+		The conditions are all checked in one loop with a single timeout; sockets are connected to in parallel, 
+		and only new data appended to files is read each time they are checked. If the conditions are not 
+		satisfied within the timeout, or a condition fails (e.g. a process terminates), the message 
+		lists the conditions that were still pending. 
+		
+		e.g.
+			from pysys.process.conditions import *
+			self.waitForConditions([ProcessRunning(server), SocketAccepts(port), FileContains('server.log', 'Started')])
+		
+		@param conditions: A list of L{pysys.process.conditions.WaitCondition} instances. 
+		@param timeout: The timeout in seconds to wait for all of the conditions to be satisfied
+		@param poll: The time in seconds between checks of the conditions
+		@param abortOnError: If true abort the test on any error outcome (defaults to the defaultAbortOnError
+			project setting)
+		@return: True if all the conditions were satisfied, or False if not. 
+		"""
+		from pysys.process.conditions import SocketAccepts
+		if abortOnError == None: abortOnError = self.defaultAbortOnError
+		pending = list(conditions)
+		sockets = [c for c in pending if isinstance(c, SocketAccepts)]
+		endpoints = []
+		for c in sockets: 
+			# the connector tracks each endpoint once, however many conditions refer to it
+			if c.endpoint not in endpoints: endpoints.append(c.endpoint)
+		connector = SocketConnector(endpoints)
+		
+		log.debug("Performing wait for conditions:")
+		for c in conditions: log.debug("  %s" % c)
+		
+		startTime = time.time()
+		try:
+			while True:
+				pending = [c for c in pending if not (c.endpoint not in connector.pending if c in sockets else c.check(self))]
+				
+				failures = dict((c, c.getFailure()) for c in conditions)
+				failures = dict((c, f) for (c, f) in failures.items() if f)
+				pending = [c for c in pending if c not in failures]
+				if not pending and not failures:
+					log.info("Wait for %d conditions completed successfully after %0.1f secs", len(conditions), time.time()-startTime)
+					return True
+				
+				msg = None
+				if failures:
+					msg, outcome = "Wait for conditions aborted due to %s"%', '.join(failures[c] for c in conditions if c in failures), BLOCKED
+				elif time.time() > startTime + timeout:
+					msg, outcome = "Wait for conditions timed out after %d secs"%timeout, TIMEDOUT
+				if msg:
+					msg = '%s, still waiting for: %s'%(msg, ', '.join(str(c) for c in pending))
+					if abortOnError:
+						self.abort(outcome, msg, self.__callRecord())
+					else:
+						log.warn(msg, extra=BaseLogFormatter.tag(LOG_TIMEOUTS) if outcome == TIMEDOUT else None)
+					return False
+				
+				if connector.pending:
+					connector.poll(max(0, min(poll, startTime+timeout-time.time())))
+				else:
+					time.sleep(poll)
+		finally:
+			connector.close()
+
+
 	def addCleanupFunction(self, fn):
 		""" Registers a zero-arg function that will be called as part of the cleanup of this object.
 		
@@ -627,6 +700,24 @@ class ProcessUser(object):
 		return o.port
 
 
+	def allocateTCPPorts(self, count, contiguous=False):
+		"""Allocate several TCP ports at once, for example for the nodes of a cluster. 
+		
+		This is faster than calling L{getNextAvailableTCPPort} repeatedly, as the candidate ports are reserved 
+		in a single operation and checked together. 
+		The ports are freed when this object is cleaned up. 
+
+		@param count: The number of ports required. 
+		@param contiguous: Set to True to allocate a block of consecutive ports, for applications that are 
+		configured with a port range. 
+		@return: A list of the allocated port numbers, in ascending order if contiguous. 
+		@raises Exception: Raised if the requested number of ports (or a contiguous block of them) is not available. 
+		"""
+		o = TCPPortsOwner(count, contiguous=contiguous)
+		self.addCleanupFunction(lambda: o.cleanup())
+		return o.ports
+
+
 	def __callRecord(self):
 		"""Retrieve a call record outside of this module, up to the execute or validate method of the test case.
 
@@ -716,13 +807,18 @@ class ProcessUser(object):
 		"""
 		if not path: return False
 		actualpath= os.path.join(self.output, path)
+		encoding = encoding or self.getDefaultFileEncoding(actualpath)
 		try:
-			f = openfile(actualpath, 'r', encoding=encoding or self.getDefaultFileEncoding(actualpath))
+			if tail and maxLines:
+				# read backwards from the end of the file so we only need to read as much as will be logged
+				open(actualpath, 'rb').close() # the generator opens lazily, so check we can open it now
+				f = readlinesreverse(actualpath, encoding=encoding)
+			else:
+				f = openfile(actualpath, 'r', encoding=encoding)
 		except Exception as e:
 			self.log.debug('logFileContents cannot open file "%s": %s', actualpath, e)
 			return False
 		try:
-			lineno = 0
 			def matchesany(s, regexes):
 				assert not isstring(regexes), 'must be a list of strings not a string'
 				for x in regexes:
@@ -739,14 +835,14 @@ class ProcessUser(object):
 					l = matchesany(l, includes)
 					if not l: continue
 				if excludes and matchesany(l, excludes): continue
-				lineno +=1
 				tolog.append(l)
 				if maxLines:
 					if not tail and len(tolog) == maxLines:
 						tolog.append('...')
 						break
-					if tail and len(tolog)==maxLines+1:
-						del tolog[0]
+					if tail and len(tolog) == maxLines:
+						break
+			if tail and maxLines: tolog.reverse()
 		finally:
 			f.close()
 			
@@ -17,14 +17,22 @@
 
 # Contact: moraygrieve@users.sourceforge.net
 
-import collections, random, subprocess, sys
+import collections, random, subprocess, sys, threading, errno, stat
 from pysys import process_lock
 from pysys.constants import *
+if OSFAMILY == 'windows':
+	import msvcrt
+else:
+	import fcntl
 
 # LRU queue of server TCP ports for allocation to tests which need to
 # start TCP servers. Initialized to None since it might not actually be used.
 # Properly initialize only on demand.
 tcpServerPortPool = None
+tcpServerPortPoolLock = threading.Lock()
+
+# sockets are inherited by child processes before Python 3.4 (PEP 446)
+SOCKETS_INHERITABLE = sys.version_info[:2] < (3, 4)
 
 def getEphemeralTCPPortRange():
 	"""Returns the range of TCP ports the operating system uses to allocate
@@ -83,74 +91,323 @@ def initializePortPool():
 	ephemeral_low, ephemeral_high = getEphemeralTCPPortRange()
 
 	# Allocate server ports from all non-privileged, non-ephemeral ports
-	tcpServerPortPool = list(range(1024, ephemeral_low)) + list(range(ephemeral_high,65536))
+	pool = list(range(1024, ephemeral_low)) + list(range(ephemeral_high,65536))
 
 	# Randomize the port set to reduce the chance of clashes between
 	# simultaneous runs on the same machine
-	random.shuffle(tcpServerPortPool)
+	random.shuffle(pool)
 
-	# Convert to an LRU queue of ports
-	tcpServerPortPool = collections.deque(tcpServerPortPool)
+	# Convert to an LRU queue of ports; only assigned once complete since getPortPool 
+	# checks it without holding the lock
+	tcpServerPortPool = collections.deque(pool)
 
 def portIsInUse(port):
-	# Try to bind to it to see if anyone else is using it
+	"""Check whether a port is in use by trying to bind to it. 
+
+	The probe is always serialized with process creation, since even a non-inheritable socket is 
+	copied into a forked child until it executes the new program, during which time the port could not 
+	be bound by the caller. 
+	"""
 	with process_lock:
-		s = None
-		try:
-			s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		
-			# Set SO_LINGER since we don't want any accidentally
-			# connecting clients to cause the socket to hang
-			# around
-			if OSFAMILY == 'windows':
-				s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, 0)
+		return _probePort(port)
 
-			# Set non-blocking since we want to fail fast rather
-			# than block
-			s.setblocking(0)
+def _probePort(port):
+	# Try to bind to it to see if anyone else is using it
+	s = None
+	try:
+		s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	
+		# Set SO_LINGER since we don't want any accidentally
+		# connecting clients to cause the socket to hang
+		# around
+		if OSFAMILY == 'windows':
+			s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, 0)
 
-			# Bind to empty host i.e wildcard interface
-			try:
-				s.bind(("", port))
-			except Exception:
-				# If we get any exception assume it is because
-				# the port is in use
-				s.close()
-				return True
-
-			# Listen may not be necessary, but on unix it seems to
-			# help do a more complete shutdown if listen is called
-			s.listen(1)
-			try:
-				s.shutdown(socket.SHUT_RDWR)
-			except Exception:
-				# Do nothing - on windows shutdown sometimes
-				# fails even after listen
-				pass
+		# Set non-blocking since we want to fail fast rather
+		# than block
+		s.setblocking(0)
+
+		# Bind to empty host i.e wildcard interface
+		try:
+			s.bind(("", port))
+		except Exception:
+			# If we get any exception assume it is because
+			# the port is in use
 			s.close()
-			return False
-		except Exception as e:
-			# Don't expect this but just in case
-			sys.stderr.write('Exception from port allocator: %s\n'%e)
-			if s != None:
-				s.close()
 			return True
 
+		# Listen may not be necessary, but on unix it seems to
+		# help do a more complete shutdown if listen is called
+		s.listen(1)
+		try:
+			s.shutdown(socket.SHUT_RDWR)
+		except Exception:
+			# Do nothing - on windows shutdown sometimes
+			# fails even after listen
+			pass
+		s.close()
+		return False
+	except Exception as e:
+		# Don't expect this but just in case
+		sys.stderr.write('Exception from port allocator: %s\n'%e)
+		if s != None:
+			s.close()
+		return True
+
+def getPortPool():
+	"""Return the pool of TCP server ports, initializing it on first use. 
+	"""
+	if tcpServerPortPool is None:
+		with tcpServerPortPoolLock:
+			if tcpServerPortPool is None: initializePortPool()
+	return tcpServerPortPool
+
 def allocateTCPPort():
+	"""Return a TCP server port that is not in use by any other process. 
+	
+	Note that the port is not leased (see L{TCPPortLeases}), so other PySys processes on this machine 
+	may allocate the same port; use L{TCPPortOwner} or 
+	L{pysys.process.user.ProcessUser.getNextAvailableTCPPort} unless the port is returned to the pool 
+	by some other means. 
+	"""
 	while True:
-		port = tcpServerPortPool.popleft()
-		if portIsInUse(port):
-			# Toss the port back at the end of the queue
-			tcpServerPortPool.append(port)
+		port = _takePorts()[0]
+		if not portIsInUse(port): return port
+		_returnPorts([port])
+
+class TCPPortLease(object):
+	"""A machine-wide lease on a TCP port, held by an exclusive lock on a file in the lease directory. 
+	
+	Since the lock is held by an open file, the operating system releases it if the process holding it 
+	terminates without calling L{release}. 
+	"""
+	def __init__(self, port, path, fd):
+		self.port, self.path, self.__fd = port, path, fd
+
+	def release(self):
+		"""Release the lease, allowing other processes to allocate the port. 
+		"""
+		if self.__fd is None: return
+		fd, self.__fd = self.__fd, None
+		if OSFAMILY != 'windows':
+			# delete while still locked, so that any process waiting on this file will see it has been 
+			# replaced and try again
+			try:
+				os.remove(self.path)
+			except OSError:
+				pass
 		else:
-			return port
+			try:
+				os.lseek(fd, 0, os.SEEK_SET)
+				msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+			except (IOError, OSError):
+				pass
+		os.close(fd)
+
+class TCPPortLeases(object):
+	"""Allocates machine-wide leases on TCP ports, so that concurrent PySys processes (including separate 
+	test runs on the same machine) never use the same port at the same time. 
+	
+	The lease directory is shared by all users, and defaults to C{pysys-tcp-port-leases} in the system 
+	temporary directory. It can be changed with the C{PYSYS_PORT_LEASE_DIR} environment variable, or set to 
+	an empty string to disable machine-wide leasing so that ports are only allocated uniquely within 
+	each process. 
+	
+	On Unix leasing is also disabled (with a warning) if the lease directory is not owned by the current 
+	user or root, or is writable by other users without having the sticky bit set, and lease files are 
+	never opened through a symbolic link. 
+	"""
+	def __init__(self, dir=None):
+		self.__dir = dir
+		self.__checkedDir = False
+	
+	@property
+	def dir(self):
+		"""The lease directory, or an empty string if leasing is disabled. 
+		"""
+		if self.__dir is None:
+			dir = os.getenv('PYSYS_PORT_LEASE_DIR', None)
+			if dir is None:
+				import tempfile
+				dir = os.path.join(tempfile.gettempdir(), 'pysys-tcp-port-leases')
+			self.__dir = dir
+		return self.__dir
+		
+	def acquire(self, port):
+		"""Try to lease the specified port. 
+		
+		@param port: The TCP port number.
+		@return: A L{TCPPortLease} which must be released when the port is no longer needed, or None if 
+		another process holds the lease. If leasing is disabled or the lease directory cannot be used, 
+		a lease with no effect is returned. 
+		"""
+		if not self.dir: return TCPPortLease(port, None, None)
+		if not self.__checkedDir:
+			try:
+				self.__checkDir()
+			except (IOError, OSError) as e:
+				sys.stderr.write('Cannot lease TCP ports in %s: %s\n'%(self.dir, e))
+				self.__dir = ''
+				return TCPPortLease(port, None, None)
+			self.__checkedDir = True
+		path = os.path.join(self.dir, '%d.lock'%port)
+		while True:
+			try:
+				fd = self.__open(path)
+			except (IOError, OSError) as e:
+				sys.stderr.write('Cannot lease TCP port %d in %s: %s\n'%(port, self.dir, e))
+				return TCPPortLease(port, None, None)
+			try:
+				if OSFAMILY == 'windows':
+					msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+				else:
+					fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except (IOError, OSError):
+				os.close(fd)
+				return None
+			
+			# if the file was deleted by the previous holder after we opened it, we have locked a file that 
+			# no other process can see, so try again
+			if OSFAMILY != 'windows':
+				try:
+					if os.fstat(fd).st_ino != os.stat(path).st_ino: raise OSError(errno.ENOENT, 'Lease file was replaced')
+				except OSError:
+					os.close(fd)
+					continue
+			return TCPPortLease(port, path, fd)
+	
+	def __checkDir(self):
+		if not os.path.isdir(self.dir):
+			try:
+				os.makedirs(self.dir)
+				# allow other users to create leases, but not to delete each other's files
+				if OSFAMILY != 'windows': os.chmod(self.dir, 0o1777)
+			except OSError:
+				if not os.path.isdir(self.dir): raise
+		if OSFAMILY == 'windows': return
+		
+		# since other users can create files in the directory, only trust it if they cannot replace it or 
+		# each other's lease files
+		st = os.lstat(self.dir)
+		if not stat.S_ISDIR(st.st_mode): 
+			raise OSError(errno.EPERM, 'Lease directory is not a directory')
+		if st.st_uid not in [0, os.getuid()]: 
+			raise OSError(errno.EPERM, 'Lease directory is owned by another user (uid %d)'%st.st_uid)
+		if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH) and not st.st_mode & stat.S_ISVTX:
+			raise OSError(errno.EPERM, 'Lease directory is writable by other users but does not have the sticky bit set')
+
+	def __open(self, path):
+		if OSFAMILY == 'windows':
+			return os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOINHERIT', 0), 0o666)
+		
+		fd = os.open(path, os.O_RDONLY | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o666)
+		# ensure child processes do not inherit the lock (the default from Python 3.4)
+		fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+		return fd
+
+portLeases = TCPPortLeases()
+
+def _takePorts(count=1, contiguous=False):
+	"""Remove ports from the pool in a single locked operation, returning a list of ports, or None if 
+	there is no contiguous block of the requested size. 
+	"""
+	tcpServerPortPool = getPortPool()
+	with tcpServerPortPoolLock:
+		if not contiguous:
+			return [tcpServerPortPool.popleft() for i in range(min(count, len(tcpServerPortPool)))]
+		available = set(tcpServerPortPool)
+		for start in tcpServerPortPool:
+			block = list(range(start, start+count))
+			if available.issuperset(block):
+				for port in block: tcpServerPortPool.remove(port)
+				return block
+		return None
+
+def _returnPorts(ports):
+	# Toss the ports back at the end of the queue
+	with tcpServerPortPoolLock:
+		tcpServerPortPool.extend(ports)
+
+def _leaseFreePorts(ports):
+	"""Return leases on those of the specified ports that no other process is leasing or using. 
+	
+	The leased ports are all probed within a single acquisition of process_lock (see L{portIsInUse}). 
+	"""
+	leases = [lease for lease in (portLeases.acquire(port) for port in ports) if lease is not None]
+	with process_lock:
+		inUse = set(lease.port for lease in leases if _probePort(lease.port))
+	for lease in leases:
+		if lease.port in inUse: lease.release()
+	return [lease for lease in leases if lease.port not in inUse]
+
+def _leaseFreePort(port):
+	"""Return a lease on the port if no other process is leasing or using it, otherwise None. 
+	"""
+	leases = _leaseFreePorts([port])
+	return leases[0] if leases else None
 
 class TCPPortOwner(object):
+	"""Owns a TCP server port that is not in use by any other process, which is leased machine-wide 
+	using L{portLeases} until L{cleanup} is called. 
+	"""
 	def __init__(self):
-		self.port = allocateTCPPort()
+		while True:
+			port = _takePorts()[0]
+			lease = _leaseFreePort(port)
+			if lease is not None: break
+			_returnPorts([port])
+		self.port, self.__lease = port, lease
 
 	def cleanup(self):
-		tcpServerPortPool.append(self.port)
+		self.__lease.release()
+		_returnPorts([self.port])
 
-# Initialize the TCP port pool
-initializePortPool()
+class TCPPortsOwner(object):
+	"""Owns several TCP server ports, optionally as a contiguous block, which are leased machine-wide 
+	until L{cleanup} is called. 
+	
+	Candidate ports are taken from the pool in a single locked operation, and are then all probed within 
+	a single acquisition of the lock that serializes process creation. 
+	
+	@ivar ports: The list of allocated ports, in ascending order if they are contiguous. 
+	"""
+	def __init__(self, count, contiguous=False, attempts=1000):
+		"""
+		@param count: The number of ports to allocate. 
+		@param contiguous: Set to True to allocate a block of consecutive port numbers. 
+		@param attempts: The maximum number of times to take candidate ports (or contiguous blocks) from the 
+		pool before giving up. 
+		@raises Exception: Raised if the requested number of ports cannot be allocated. 
+		"""
+		self.__leases = []
+		if not contiguous:
+			for attempt in range(attempts):
+				if len(self.__leases) == count: break
+				candidates = _takePorts(count-len(self.__leases))
+				if not candidates: break
+				leases = _leaseFreePorts(candidates)
+				self.__leases.extend(leases)
+				leased = set(lease.port for lease in leases)
+				_returnPorts([port for port in candidates if port not in leased])
+			if len(self.__leases) < count:
+				self.cleanup()
+				raise Exception('Cannot allocate %d TCP ports'%count)
+		else:
+			for attempt in range(attempts):
+				block = _takePorts(count, contiguous=True)
+				if block is None: break
+				leases = _leaseFreePorts(block)
+				if len(leases) == count:
+					self.__leases = leases
+					break
+				# return the whole block, including the ports that could not be leased
+				for lease in leases: lease.release()
+				_returnPorts(block)
+			if len(self.__leases) < count:
+				raise Exception('Cannot allocate a contiguous block of %d TCP ports'%count)
+		self.ports = [lease.port for lease in self.__leases]
+	
+	def cleanup(self):
+		leases, self.__leases = self.__leases, []
+		for lease in leases: lease.release()
+		_returnPorts([lease.port for lease in leases])
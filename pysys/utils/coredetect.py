@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# PySys System Test Framework, Copyright (C) 2006-2018  M.B.Grieve
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# Contact: moraygrieve@users.sourceforge.net
+"""
+Detection of core files written by processes started from a test.
+
+Core files are always searched for in the test output directory, which is the default working directory
+of processes started by the test. On Linux the kernel core_pattern is also read, so that cores written to
+a different directory, or with a name that does not start with "core", are found too. Where the core
+file name includes the process id, only cores from processes started by the test are reported.
+
+"""
+
+import os, re, threading, gzip, shutil
+
+from pysys.constants import *
+from pysys.utils.pycompat import PY2
+if PY2:
+	import Queue
+else:
+	import queue as Queue
+
+# the directory where systemd-coredump stores cores when core_pattern pipes to it
+SYSTEMD_COREDUMP_DIR = '/var/lib/systemd/coredump'
+
+# directories whose cores are managed (and usually already compressed) by the system, so are never 
+# compressed or deleted
+SYSTEM_MANAGED_CORE_DIRS = [SYSTEMD_COREDUMP_DIR]
+
+def _readfile(path, default=None):
+	try:
+		with open(path) as f: return f.read().strip()
+	except (IOError, OSError):
+		return default
+
+def coreFileRegex(corePattern, appendPid=False):
+	"""
+	Convert a Linux kernel core_pattern (without any directory) into a regular expression matching the
+	file names it produces.
+
+	The first process id specifier in the pattern is captured as the named group C{pid}.
+
+	@param corePattern: The file name part of the core_pattern, e.g. C{core.%e.%p}.
+	@param appendPid: Indicates if the kernel appends .PID to the name, i.e. core_uses_pid is set
+	and the pattern does not already contain the process id.
+	@return: The compiled regular expression.
+	"""
+	regex = ''
+	hasPid = False
+	for token in re.split('(%.)', corePattern):
+		if token in ['%p', '%P', '%i', '%I']:
+			regex += '[0-9]+' if hasPid else '(?P<pid>[0-9]+)'
+			hasPid = True
+		elif token in ['%u', '%g', '%s', '%t', '%d']:
+			regex += '[0-9]+'
+		elif token == '%%':
+			regex += '%'
+		elif len(token) == 2 and token[0] == '%':
+			regex += '[^/]*'
+		else:
+			regex += re.escape(token)
+	if appendPid and not hasPid: regex += r'\.(?P<pid>[0-9]+)'
+	return re.compile('^%s$'%regex)
+
+class CoreDetector(object):
+	"""
+	Finds core files produced by the processes of a test, and optionally compresses them in the background.
+
+	File names in the output directory are matched against the configured patterns (by default any
+	file whose name starts with "core") together with any pattern derived from a relative core_pattern.
+	If core_pattern writes cores to an absolute directory (or pipes them to systemd-coredump) that
+	directory is also searched, for cores modified since the test started and (if the name contains the
+	process id) from the process ids started by the test.
+
+	Directories are read using os.scandir where available, so no extra stat call is needed for
+	each entry in the output directory.
+
+	@ivar patterns: The list of compiled regular expressions matched against file names in the output directory.
+	@ivar coreDir: The absolute directory that cores are written to according to core_pattern, or None.
+	@ivar coreDirRegex: The compiled regular expression for core file names in coreDir, or None.
+	"""
+	def __init__(self, patterns=None, corePattern=None, coreUsesPid=None):
+		"""
+		Create a detector.
+
+		@param patterns: The list of regular expressions to match against the names of files in the output
+		directory, or None to use the coreFilePatterns project property (a comma-separated list,
+		defaulting to C{^core}).
+		@param corePattern: The kernel core_pattern to use, or None to read it from
+		C{/proc/sys/kernel/core_pattern} on Linux.
+		@param coreUsesPid: Indicates if the kernel appends the process id to cores, or None to read it
+		from C{/proc/sys/kernel/core_uses_pid} on Linux.
+		"""
+		if patterns is None:
+			patterns = [p.strip() for p in getattr(PROJECT, 'coreFilePatterns', '^core').split(',') if p.strip()]
+		self.patterns = [re.compile(p) for p in patterns]
+
+		if corePattern is None and PLATFORM == 'linux':
+			corePattern = _readfile('/proc/sys/kernel/core_pattern')
+		if coreUsesPid is None and PLATFORM == 'linux':
+			coreUsesPid = _readfile('/proc/sys/kernel/core_uses_pid', '0') != '0'
+
+		self.coreDir, self.coreDirRegex = None, None
+		if not corePattern:
+			pass
+		elif corePattern.startswith('|'):
+			if 'systemd-coredump' in corePattern:
+				self.coreDir = SYSTEMD_COREDUMP_DIR
+				self.coreDirRegex = re.compile(r'^core\..+\.(?P<pid>[0-9]+)\.[0-9]+(\.[a-z0-9]+)?$')
+		elif os.path.isabs(corePattern):
+			self.coreDir = os.path.dirname(corePattern)
+			self.coreDirRegex = coreFileRegex(os.path.basename(corePattern), coreUsesPid)
+		else:
+			self.patterns.append(coreFileRegex(corePattern, coreUsesPid))
+
+		self.__compressQueue = None
+		self.__compressFailures = []
+		self.__lock = threading.Lock()
+
+	def detect(self, dir, pids=None, since=None):
+		"""
+		Return the paths of any core files produced by a test.
+
+		@param dir: The output directory of the test.
+		@param pids: The process ids started by the test, used to identify cores in the core_pattern directory.
+		@param since: The time the test started, used to identify cores in the core_pattern directory. Since
+		process ids are reused, this applies to cores whose name includes the process id too.
+		@return: A list of the absolute paths of the cores found, which is empty if there are none.
+		"""
+		cores = [path for path, name in self.__scanFiles(dir) if any(p.search(name) for p in self.patterns)]
+
+		if self.coreDir and (pids or since) and os.path.normpath(self.coreDir) != os.path.normpath(dir):
+			pids = set(str(pid) for pid in (pids or []))
+			for path, name in self.__scanFiles(self.coreDir):
+				m = self.coreDirRegex.match(name)
+				if not m: continue
+				hasPid = 'pid' in m.groupdict()
+				if hasPid and m.group('pid') not in pids: continue
+				# process ids are reused, so a matching pid is not enough for a core left by an earlier process
+				if since:
+					if os.path.getmtime(path) < since: continue
+				elif not hasPid: 
+					continue
+				cores.append(path)
+		return cores
+
+	def __scanFiles(self, dir):
+		"""
+		Return (path, name) for the regular files in a directory, or an empty list if it does not exist.
+		"""
+		try:
+			if hasattr(os, 'scandir'):
+				return [(e.path, e.name) for e in os.scandir(dir) if e.is_file()]
+			return [(os.path.join(dir, f), f) for f in os.listdir(dir) if os.path.isfile(os.path.join(dir, f))]
+		except OSError:
+			return []
+
+	def compress(self, path, background=True):
+		"""
+		Compress a core file with gzip on a background thread, deleting the original once it is compressed.
+
+		Cores in a directory managed by the system (see C{SYSTEM_MANAGED_CORE_DIRS}) are left unchanged.
+
+		@param path: The absolute path of the core file.
+		@param background: Set to False to compress the core before returning, for example if the directory 
+		containing it is about to be moved. Any failure is still reported by L{wait}. 
+		@return: The path of the compressed file that will be created, or of the unchanged core.
+		"""
+		if os.path.normpath(os.path.dirname(path)) in [os.path.normpath(d) for d in SYSTEM_MANAGED_CORE_DIRS]:
+			return path
+		if not background:
+			self.__compress(path)
+			return path+'.gz'
+		with self.__lock:
+			if self.__compressQueue is None:
+				self.__compressQueue = Queue.Queue()
+				worker = threading.Thread(target=self.__run, name='core-compressor')
+				worker.daemon = True
+				worker.start()
+		self.__compressQueue.put(path)
+		return path+'.gz'
+
+	def wait(self):
+		"""
+		Wait for all queued core files to be compressed.
+
+		@return: A list of (path, exception) tuples for any cores that could not be compressed.
+		"""
+		if self.__compressQueue is not None: self.__compressQueue.join()
+		with self.__lock:
+			failures, self.__compressFailures = self.__compressFailures, []
+		return failures
+
+	def __run(self):
+		while True:
+			path = self.__compressQueue.get()
+			try:
+				self.__compress(path)
+			finally:
+				self.__compressQueue.task_done()
+
+	def __compress(self, path):
+		try:
+			with open(path, 'rb') as src:
+				with gzip.open(path+'.gz', 'wb') as dest:
+					shutil.copyfileobj(src, dest, 1024*1024)
+			os.remove(path)
+		except Exception as ex:
+			if os.path.exists(path) and os.path.exists(path+'.gz'): os.remove(path+'.gz')
+			with self.__lock: self.__compressFailures.append((path, ex))
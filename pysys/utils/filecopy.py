@@ -18,27 +18,101 @@
 # Contact: moraygrieve@users.sourceforge.net
 
 from __future__ import print_function
-import sys, os
+import sys, os, shutil, errno
+from multiprocessing.pool import ThreadPool
 from pysys.exceptions import *
 
-def copyfileobj(fsrc, fdst, length=16*1024):
-	"""Internal method to read bytes from a source file descriptor, and write to a destination file descriptor.
+try:
+	import fcntl
+except ImportError: # not available on windows
+	fcntl = None
+
+# the Linux ioctl to clone (reflink) the contents of one file into another
+FICLONE = 0x40049409
+
+# the buffer size used when copying in Python, large enough to keep the per-call overhead insignificant
+COPY_BUFFER_SIZE = 1024*1024
+
+# the maximum number of bytes to copy in a single kernel call
+KERNEL_COPY_CHUNK = 1024*1024*1024
+
+def copyfileobj(fsrc, fdst, length=None):
+	"""Internal method to read bytes from a source file object, and write to a destination file object.
+	
+	Data is read into a single reusable buffer to avoid allocating a new bytes object for each read. 
 	
-	@param fsrc: The source file descriptor
-	@param fdst: The destination file descriptor
-	@param length: The buffer length to read from the src and write to the destination
+	@param fsrc: The source file object
+	@param fdst: The destination file object
+	@param length: The buffer length to read from the src and write to the destination, or None to use 
+	an adaptive size of up to C{COPY_BUFFER_SIZE} based on the size of the source file
 	
 	"""
+	if length is None:
+		length = COPY_BUFFER_SIZE
+		try:
+			length = max(64*1024, min(length, os.fstat(fsrc.fileno()).st_size))
+		except Exception: # not a real file
+			pass
+	
+	if not hasattr(fsrc, 'readinto'):
+		while 1:
+			buf = fsrc.read(length)
+			if not buf:
+				break
+			fdst.write(buf)
+		return
+	
+	buf = bytearray(length)
+	view = memoryview(buf)
 	while 1:
-		buf = fsrc.read(length)
-		if not buf:
+		read = fsrc.readinto(buf)
+		if not read:
 			break
-		fdst.write(buf)
+		fdst.write(view[:read] if sys.version_info[0] > 2 else bytes(buf[:read]))
+
+
+def kernelcopy(fsrc, fdst):
+	"""Internal method to copy the contents of one file to another without reading the data into Python, 
+	using os.copy_file_range (Python 3.8+) or os.sendfile (Python 3.3+) on Linux. 
+	
+	Both file objects must be unbuffered or not yet used, and are read and written from their current positions. 
+	
+	@param fsrc: The source file object
+	@param fdst: The destination file object
+	@return: True if the file was copied, or False if kernel copying is not supported for these files, in which 
+	case nothing has been copied
+	
+	"""
+	if not sys.platform.startswith('linux'): return False
+	infd, outfd = fsrc.fileno(), fdst.fileno()
+	
+	# files in pseudo file systems such as /proc report a zero size but are not empty
+	if os.fstat(infd).st_size == 0: return False
+	
+	copiers = []
+	if hasattr(os, 'copy_file_range'): copiers.append(lambda: os.copy_file_range(infd, outfd, KERNEL_COPY_CHUNK))
+	if hasattr(os, 'sendfile'): copiers.append(lambda: os.sendfile(outfd, infd, None, KERNEL_COPY_CHUNK))
+	for copier in copiers:
+		copied = 0
+		try:
+			while 1:
+				sent = copier()
+				if sent == 0: break
+				copied += sent
+			# some file systems report nothing copied for a non-empty file, so fall back to the next method
+			if copied > 0: return True
+		except OSError as ex:
+			if copied > 0 or ex.errno not in [errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EBADF, errno.EPERM]: 
+				raise
+	return False
 
 
 def filecopy(src, dst):
 	"""Copy source file to a destination file.
 	
+	Where possible the data is copied by the kernel without being read into Python (see L{kernelcopy}), 
+	otherwise it is copied using a large reusable buffer. 
+	
 	@param src: Full path to the source filename
 	@param dst: Full path the destination filename
  	@raises FileNotFoundException: Raised if the source file does not exist
@@ -52,7 +126,8 @@ def filecopy(src, dst):
 	try:
 		fsrc = open(src, 'rb')
 		fdst = open(dst, 'wb')
-		copyfileobj(fsrc, fdst)
+		if not kernelcopy(fsrc, fdst):
+			copyfileobj(fsrc, fdst)
 	finally:
 		if fdst:
 			fdst.close()
@@ -60,6 +135,105 @@ def filecopy(src, dst):
 			fsrc.close()
 
 
+def reflinkfile(src, dst):
+	"""Create a copy-on-write clone (reflink) of a file, where the file system supports it. 
+	
+	Cloning a file is almost instant regardless of its size, since the data blocks are shared between 
+	the two files until one of them is modified. This is supported on Linux by file systems 
+	such as btrfs and XFS. 
+	
+	@param src: Full path to the source filename
+	@param dst: Full path the destination filename
+	@return: True if the file was cloned, or False if cloning is not supported, in which case the destination 
+	file is not created. 
+	
+	"""
+	if fcntl is None or not sys.platform.startswith('linux'): return False
+	with open(src, 'rb') as fsrc:
+		with open(dst, 'wb') as fdst:
+			try:
+				fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+				return True
+			except (IOError, OSError):
+				pass
+	os.remove(dst)
+	return False
+
+
+def stagefile(src, dst, hardlink=False):
+	"""Populate a destination file from a source file as cheaply as possible. 
+	
+	If hardlink is True a hard link to the source is created, which is only suitable if the file will not be 
+	modified since changes would also affect the source. Otherwise the file is cloned using L{reflinkfile}. 
+	Either falls back to a normal copy using L{filecopy} if not supported for these files. The permission 
+	bits of the source file are copied to the destination. 
+	
+	@param src: Full path to the source filename
+	@param dst: Full path the destination filename, which is replaced if it already exists
+	@param hardlink: Indicates if a hard link should be used
+	@return: The method used - one of "hardlink", "reflink" or "copy"
+	@raises FileNotFoundException: Raised if the source file does not exist
+	
+	"""
+	if not os.path.exists(src):
+		raise FileNotFoundException("unable to find file %s" % (os.path.basename(src)))
+	if os.path.lexists(dst): os.remove(dst)
+	
+	if hardlink and hasattr(os, 'link'):
+		try:
+			os.link(src, dst)
+			return 'hardlink'
+		except OSError as ex:
+			if ex.errno not in [errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP]: raise
+	
+	method = 'reflink' if reflinkfile(src, dst) else 'copy'
+	if method == 'copy': filecopy(src, dst)
+	shutil.copymode(src, dst)
+	return method
+
+
+def stagedir(src, dst, hardlink=False, threads=4):
+	"""Populate a destination directory tree from a source directory using L{stagefile} for each file. 
+	
+	The directory tree is created first, then the files are staged using a pool of threads since 
+	copying many small files (or reading from network file systems) is limited by latency rather than 
+	bandwidth. Symbolic links are recreated in the destination rather than followed. 
+	
+	@param src: Full path to the source directory
+	@param dst: Full path the destination directory, which is created if it does not exist
+	@param hardlink: Indicates if hard links should be used, see L{stagefile}
+	@param threads: The maximum number of files to stage in parallel
+	@return: The number of files staged
+	@raises FileNotFoundException: Raised if the source directory does not exist
+	
+	"""
+	if not os.path.isdir(src):
+		raise FileNotFoundException("unable to find directory %s" % (os.path.basename(src)))
+	
+	files = []
+	for root, dirs, names in os.walk(src):
+		target = os.path.join(dst, os.path.relpath(root, src))
+		if not os.path.isdir(target): os.makedirs(target)
+		for name in names + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+			path = os.path.join(root, name)
+			if os.path.islink(path):
+				if os.path.lexists(os.path.join(target, name)): os.remove(os.path.join(target, name))
+				os.symlink(os.readlink(path), os.path.join(target, name))
+			else:
+				files.append((path, os.path.join(target, name)))
+	
+	if threads <= 1 or len(files) <= 1:
+		for f in files: stagefile(f[0], f[1], hardlink)
+	else:
+		pool = ThreadPool(min(threads, len(files)))
+		try:
+			pool.map(lambda f: stagefile(f[0], f[1], hardlink), files, chunksize=1)
+		finally:
+			pool.close()
+			pool.join()
+	return len(files)
+
+
 # entry point for running the script as an executable
 if __name__ == "__main__":
 	if len(sys.argv) < 2:
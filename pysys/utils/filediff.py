@@ -18,7 +18,7 @@
 # Contact: moraygrieve@users.sourceforge.net
 
 from __future__ import print_function
-import os.path, copy, difflib
+import os.path, copy
 
 from pysys import log
 from pysys.constants import *
@@ -94,7 +94,195 @@ def logContents(message, list):
 
 
 
-def filediff(file1, file2, ignore=[], sort=True, replacementList=[], include=[], unifiedDiffOutput=None, encoding=None):
+DIFF_MAX_EDITS = 1000
+"""The default maximum number of inserted/deleted lines the diff engine will search for before falling back to a coarse diff."""
+
+DIFF_MAX_HUNKS = 100
+"""The default maximum number of hunks written to the unified diff output."""
+
+
+def _myersdiff(a, b, maxEdits):
+	"""Compute the shortest edit script between two lists using the Myers O(ND) algorithm.
+	
+	The running time is proportional to the size of the inputs multiplied by the number of differences, 
+	so files which are large but similar are diffed quickly. The search is abandoned if more than 
+	maxEdits lines need to be inserted or deleted, which keeps the cost linear for files which are very different. 
+	
+	@param a: The first list of strings
+	@param b: The second list of strings
+	@param maxEdits: The maximum number of insertions and deletions to search for
+	@return: A list of (tag, i, j) tuples where tag is one of '=', '-' or '+', or None if the budget was exceeded
+	@rtype: list
+	
+	"""
+	n, m = len(a), len(b)
+	maxd = min(n + m, maxEdits)
+	offset = maxd + 1
+	v = [0] * (2 * maxd + 3)
+	trace = []
+	for d in range(maxd + 1):
+		# only the frontier for diagonals -d-1..d+1 is needed to backtrack from step d
+		trace.append(v[offset-d-1:offset+d+2])
+		for k in range(-d, d + 1, 2):
+			if k == -d or (k != d and v[offset+k-1] < v[offset+k+1]):
+				x = v[offset+k+1]
+			else:
+				x = v[offset+k-1] + 1
+			y = x - k
+			while x < n and y < m and a[x] == b[y]:
+				x, y = x + 1, y + 1
+			v[offset+k] = x
+			if x >= n and y >= m:
+				return _myersbacktrack(trace, n, m)
+	return None
+
+
+def _myersbacktrack(trace, x, y):
+	"""Walk back through the saved Myers search frontiers to recover the edit script. """
+	edits = []
+	for d in range(len(trace) - 1, -1, -1):
+		v = trace[d]
+		offset = d + 1
+		k = x - y
+		if k == -d or (k != d and v[offset+k-1] < v[offset+k+1]):
+			prevk = k + 1
+		else:
+			prevk = k - 1
+		prevx = v[offset+prevk]
+		prevy = prevx - prevk
+		while x > prevx and y > prevy:
+			x, y = x - 1, y - 1
+			edits.append(('=', x, y))
+		if d > 0:
+			if x == prevx: 
+				edits.append(('+', x, prevy))
+			else:
+				edits.append(('-', prevx, y))
+		x, y = prevx, prevy
+	edits.reverse()
+	return edits
+
+
+def _getopcodes(a, b, maxEdits):
+	"""Return a list of difflib-style opcodes describing how to turn list a into list b.
+	
+	Common leading and trailing lines are stripped before searching for the differences. If the remaining 
+	lines need more than maxEdits insertions and deletions the whole of the remaining region is reported 
+	as a single replacement. 
+	
+	@return: A tuple of (opcodes, complete) where complete is False if the edit budget was exceeded
+	
+	"""
+	prefix = 0
+	while prefix < len(a) and prefix < len(b) and a[prefix] == b[prefix]: prefix += 1
+	suffix = 0
+	while suffix < len(a)-prefix and suffix < len(b)-prefix and a[-1-suffix] == b[-1-suffix]: suffix += 1
+	
+	ahi, bhi = len(a)-suffix, len(b)-suffix
+	opcodes = []
+	if prefix > 0: opcodes.append(('equal', 0, prefix, 0, prefix))
+	
+	complete = True
+	edits = _myersdiff(a[prefix:ahi], b[prefix:bhi], maxEdits)
+	if edits is None:
+		complete = False
+		opcodes.append(('replace', prefix, ahi, prefix, bhi))
+	else:
+		# coalesce the per-line edits into equal/delete/insert/replace ranges
+		for tag, x, y in edits:
+			x, y = x + prefix, y + prefix
+			if tag == '=':
+				if opcodes and opcodes[-1][0] == 'equal' and opcodes[-1][2] == x:
+					opcodes[-1] = ('equal', opcodes[-1][1], x+1, opcodes[-1][3], y+1)
+				else:
+					opcodes.append(('equal', x, x+1, y, y+1))
+			else:
+				if opcodes and opcodes[-1][0] != 'equal':
+					last = opcodes[-1]
+				else:
+					last = ('replace', x, x, y, y)
+					opcodes.append(last)
+				if tag == '-':
+					opcodes[-1] = ('replace', last[1], last[2]+1, last[3], last[4])
+				else:
+					opcodes[-1] = ('replace', last[1], last[2], last[3], last[4]+1)
+		opcodes = [(('delete' if j1 == j2 else 'insert' if i1 == i2 else tag) if tag != 'equal' else tag, i1, i2, j1, j2) 
+			for (tag, i1, i2, j1, j2) in opcodes]
+	
+	if suffix > 0: opcodes.append(('equal', ahi, len(a), bhi, len(b)))
+	return opcodes, complete
+
+
+def _formatrange(start, stop):
+	"""Convert a range to the unified diff "start,length" format."""
+	beginning = start + 1
+	length = stop - start
+	if length == 1: return '%s'%beginning
+	if not length: beginning -= 1
+	return '%s,%s'%(beginning, length)
+
+
+def unifiedDiff(a, b, fromfile='', tofile='', n=3, maxEdits=DIFF_MAX_EDITS, maxHunks=DIFF_MAX_HUNKS):
+	"""Compare two lists of lines and return a generator of the differences in unified diff format.
+	
+	This is a replacement for difflib.unified_diff that has predictable performance for large files. 
+	The differences are found using the Myers algorithm which is linear in the size of the inputs for 
+	files with a small number of differences. Once more than maxEdits lines would need to be inserted or deleted, 
+	the differing region is reported as a single replacement, of which at most maxEdits lines are 
+	shown from each file. Output stops after maxHunks hunks have been written. In both cases a final line 
+	starting with "..." indicates that the diff was truncated. 
+	
+	@param a: The first list of strings, each ending with a new line character
+	@param b: The second list of strings, each ending with a new line character
+	@param fromfile: The name to display for the first file
+	@param tofile: The name to display for the second file
+	@param n: The number of lines of context to display around each change
+	@param maxEdits: The maximum number of insertions and deletions to search for, or 0 for unlimited
+	@param maxHunks: The maximum number of hunks to output, or 0 for unlimited
+	
+	"""
+	opcodes, complete = _getopcodes(a, b, maxEdits or (len(a) + len(b)))
+	if not opcodes or (len(opcodes) == 1 and opcodes[0][0] == 'equal'): return
+	
+	# group the changes into hunks with up to n lines of context, as per SequenceMatcher.get_grouped_opcodes
+	codes = opcodes[:]
+	if codes[0][0] == 'equal':
+		tag, i1, i2, j1, j2 = codes[0]
+		codes[0] = tag, max(i1, i2-n), i2, max(j1, j2-n), j2
+	if codes[-1][0] == 'equal':
+		tag, i1, i2, j1, j2 = codes[-1]
+		codes[-1] = tag, i1, min(i2, i1+n), j1, min(j2, j1+n)
+	groups, group = [], []
+	for tag, i1, i2, j1, j2 in codes:
+		if tag == 'equal' and i2-i1 > n*2:
+			group.append((tag, i1, min(i2, i1+n), j1, min(j2, j1+n)))
+			groups.append(group)
+			group = []
+			i1, j1 = max(i1, i2-n), max(j1, j2-n)
+		group.append((tag, i1, i2, j1 ,j2))
+	if group and not (len(group) == 1 and group[0][0] == 'equal'): groups.append(group)
+	
+	yield '--- %s\n'%fromfile
+	yield '+++ %s\n'%tofile
+	for hunk, group in enumerate(groups):
+		if maxHunks and hunk == maxHunks:
+			yield '... diff truncated after %d hunks\n'%maxHunks
+			return
+		first, last = group[0], group[-1]
+		yield '@@ -%s +%s @@\n'%(_formatrange(first[1], last[2]), _formatrange(first[3], last[4]))
+		for tag, i1, i2, j1, j2 in group:
+			if tag == 'equal':
+				for line in a[i1:i2]: yield ' ' + line
+				continue
+			if tag in ('replace', 'delete'):
+				for line in a[i1:min(i2, i1+maxEdits) if not complete else i2]: yield '-' + line
+			if tag in ('replace', 'insert'):
+				for line in b[j1:min(j2, j1+maxEdits) if not complete else j2]: yield '+' + line
+	if not complete:
+		yield '... diff truncated as the files differ by more than %d lines\n'%maxEdits
+
+
+def filediff(file1, file2, ignore=[], sort=True, replacementList=[], include=[], unifiedDiffOutput=None, encoding=None, diffMaxEdits=DIFF_MAX_EDITS, diffMaxHunks=DIFF_MAX_HUNKS):
 	"""Perform a file comparison between two (preprocessed) input files, returning true if the files are equivalent.
 	
 	The method reads in the files and loads the contents of each as a list of strings. The two files are 
@@ -115,6 +303,9 @@ def filediff(file1, file2, ignore=[], sort=True, replacementList=[], include=[],
 	@param unifiedDiffOutput: If specified, indicates the full path of a file to which unified diff output will be written, 
 		if the diff fails. 
 	@param encoding: Specifies the encoding to be used for opening the file, or None for default. 
+	@param diffMaxEdits: The maximum number of inserted and deleted lines the unified diff will search for; 
+		files that differ by more than this are reported as a single truncated hunk (see L{unifiedDiff}). 
+	@param diffMaxHunks: The maximum number of hunks that will be written to the unified diff output. 
 	
 	@return: success (True / False)
 	@rtype: boolean
@@ -158,9 +349,10 @@ def filediff(file1, file2, ignore=[], sort=True, replacementList=[], include=[],
 			for i in list2: l2.append("%s\n"%i)
 
 			# nb: have to switch 1 and 2 around to get the right diff for a typical output,ref file pair
-			diff = ''.join(difflib.unified_diff(l2, l1, 
+			diff = ''.join(unifiedDiff(l2, l1, 
 				fromfile='%s (%d lines)'%(os.path.basename(file2), len(l2)),
 				tofile='%s (%d lines)'%(os.path.basename(file1), len(l1)),
+				maxEdits=diffMaxEdits, maxHunks=diffMaxHunks,
 				))
 			if unifiedDiffOutput:
 				with openfile(unifiedDiffOutput, 'w', encoding=encoding) as f:
@@ -18,13 +18,14 @@
 # Contact: moraygrieve@users.sourceforge.net
 
 from __future__ import print_function
-import os.path, logging, copy
+import os.path, logging
 
 from pysys import log
 from pysys.constants import *
 from pysys.exceptions import *
 from pysys.utils.filediff import trimContents
 from pysys.utils.pycompat import openfile
+from pysys.utils.fileutils import readlinesreverse
 
 def getmatches(file, regexpr, ignores=None, encoding=None):
 	"""Look for matches on a regular expression in an input file, return a sequence of the matches.
@@ -107,6 +108,9 @@ def filegrep(file, expr, ignores=None, returnMatch=False, encoding=None):
 def lastgrep(file, expr, ignore=[], include=[], encoding=None):
 	"""Search for matches to a regular expression in the last line of an input file, returning true if a match occurs.
 	
+	The file is read backwards from the end, so only the lines following the last line that is not 
+	excluded by the ignore and include expressions are read, making this efficient even for very large files. 
+	
 	@param file: The full path to the input file
 	@param expr: The regular expression (uncompiled) to search for in the last line of the input file
 	@returns: success (True / False)
@@ -121,21 +125,21 @@ def lastgrep(file, expr, ignore=[], include=[], encoding=None):
 	if not os.path.exists(file):
 		raise FileNotFoundException("unable to find file %s" % (os.path.basename(file)))
 	else:
-		with openfile(file, 'r', encoding=encoding) as f:
-			contents = f.readlines()
-		contents = trimContents(contents, ignore, exclude=True)
-		contents = trimContents(contents, include, exclude=False)
-		log.info('contents: %s', contents)
-		
-		logContents("Contents of %s after pre-processing;" % os.path.basename(file), contents)
-		if len(contents) > 0:
-			line = contents[len(contents)-1]
+		ignore = [re.compile(i) for i in ignore]
+		include = [re.compile(i) for i in include]
+		for line in readlinesreverse(file, encoding=encoding):
+			if any(i.search(line) for i in ignore): continue
+			if include and not any(i.search(line) for i in include): continue
+			
+			log.debug(("Last line of %s after pre-processing: %s" % (os.path.basename(file), line)).rstrip())
 			regexpr = re.compile(expr)
 			if regexpr.search(line) is not None: return True
+			return False
+		log.debug("No lines in %s after pre-processing", os.path.basename(file))
 		return False
 
 
-def orderedgrep(file, exprList, encoding=None):
+def orderedgrep(file, exprList, encoding=None, matchedLines=None):
 	"""Seach for ordered matches to a set of regular expressions in an input file, returning true if the matches occur in the correct order.
 	
 	The ordered grep method will only return true if matches to the set of regular expression in the expression 
@@ -151,32 +155,37 @@ def orderedgrep(file, exprList, encoding=None):
 	an expression list of ["^A.*$", "^C.*$", "^D.*$"] will return true, whilst an expression list of 
 	["^A.*$", "^C.$", "^B.$"] will return false.
 	
+	The file is read in a single pass, a line at a time, so large files can be searched without reading 
+	them into memory. 
+	
 	@param file: The full path to the input file
 	@param exprList: A list of regular expressions (uncompiled) to search for in the input file
 	@param encoding: Specifies the encoding to be used for opening the file, or None for default. 
+	@param matchedLines: An optional list, to which a (lineNumber, line) tuple is appended for each expression 
+	that is matched, in order. On failure this shows how far through the expression list the search got. 
+	Line numbers start from 1. 
 	
-	@returns: success (True / False)
-	@rtype: integer
+	@returns: None if all the expressions were matched in order, otherwise the first expression that 
+	was not matched
+	@rtype: string
 	@raises FileNotFoundException: Raised if the input file does not exist
 		
 	"""
-	list = copy.deepcopy(exprList)
-	list.reverse();
-	expr = list.pop();
-
 	if not os.path.exists(file):
 		raise FileNotFoundException("unable to find file %s" % (os.path.basename(file)))
-	else:
-		with openfile(file, 'r', encoding=encoding) as f:
-			contents = f.readlines()	  
-		for i in range(len(contents)):
-			regexpr = re.compile(expr)
-			if regexpr.search(r"%s"%contents[i]) is not None:
-				try:
-					expr = list.pop();
-				except Exception:
-					return None
-		return expr
+	
+	regexprs = [re.compile(expr) for expr in exprList]
+	if not regexprs: return None
+	index = 0
+	regexpr = regexprs[0]
+	with openfile(file, 'r', encoding=encoding) as f:
+		for lineno, line in enumerate(f):
+			if regexpr.search(line) is not None:
+				if matchedLines is not None: matchedLines.append((lineno+1, line.rstrip('\r\n')))
+				index += 1
+				if index == len(regexprs): return None
+				regexpr = regexprs[index]
+	return exprList[index]
 
 
 def logContents(message, list):
@@ -17,10 +17,13 @@
 
 # Contact: moraygrieve@users.sourceforge.net
 
-import os.path
+import os.path, re, fnmatch
+from multiprocessing.pool import ThreadPool
 
+from pysys.constants import *
 from pysys.exceptions import *
 from pysys.utils.pycompat import openfile
+from pysys.utils.filecopy import filecopy
 
 def replace(input, output, dict={}, marker='', encoding=None):
 	"""Read an input file, and write to output tailoring the file to replace set keywords with values.
@@ -39,6 +42,10 @@ def replace(input, output, dict={}, marker='', encoding=None):
 	  The cat sat on the mat
 	  The dog sat on the hat
 
+	All keys are matched in a single pass over each line using one compiled regular expression, so the 
+	time taken does not depend on the number of keys. Text inserted by a replacement is not itself 
+	searched for keywords, and where keys overlap the longest matching key is used. 
+
 	@param input: The full path to the input file
 	@param output: The full path to the output file with the keywords replaced
 	@param dict: A dictionary of key/value pairs to use in the replacement
@@ -52,10 +59,74 @@ def replace(input, output, dict={}, marker='', encoding=None):
 	if not os.path.exists(input):
 		raise FileNotFoundException("unable to find file %s" % (os.path.basename(input)))
 	else:
-		with openfile(input, 'r', encoding=encoding) as fi, openfile(output, 'w', encoding=encoding) as fo:
-			for line in fi.readlines():
-				for key in list(dict.keys()):
-					line = line.replace('%s%s%s'%(marker, key, marker), "%s" % (dict[key]))
-				fo.write(line)
+		_replacefile(input, output, _createReplacer(dict, marker), encoding)
+
+
+def replacetree(inputDir, outputDir, dict={}, marker='', encoding=None, includes=None, threads=None):
+	"""Copy a directory tree, replacing keywords with values in each file as described in L{replace}. 
+	
+	Files are processed in parallel using a pool of threads. Files that do not match the includes 
+	patterns are copied unchanged, which allows a tree containing binary files to be templated. 
+	
+	@param inputDir: The full path to the input directory
+	@param outputDir: The full path to the output directory, which is created if it does not exist
+	@param dict: A dictionary of key/value pairs to use in the replacement
+	@param marker: The character used to mark key words to be replaced (may be the empty string
+	               if no characters are used)
+	@param encoding: Specifies the encoding to be used for opening the files, or None for default. 
+	@param includes: A list of file name patterns such as C{*.xml} selecting the files to replace keywords in, 
+	or None to replace keywords in all files
+	@param threads: The maximum number of files to process in parallel, defaulting to the number of CPUs
+	@return: The number of files in which keywords were replaced
+	
+	@raises FileNotFoundException: Raised if the input directory does not exist
+	
+	"""
+	if not os.path.isdir(inputDir):
+		raise FileNotFoundException("unable to find directory %s" % (os.path.basename(inputDir)))
+
+	replacer = _createReplacer(dict, marker)
+	tasks = []
+	for root, dirs, files in os.walk(inputDir):
+		target = os.path.join(outputDir, os.path.relpath(root, inputDir))
+		if not os.path.isdir(target): os.makedirs(target)
+		for file in files:
+			template = includes is None or any(fnmatch.fnmatch(file, pattern) for pattern in includes)
+			tasks.append((os.path.join(root, file), os.path.join(target, file), template))
+	
+	def process(task):
+		if task[2]:
+			_replacefile(task[0], task[1], replacer, encoding)
+		else:
+			filecopy(task[0], task[1])
+	
+	threads = min(threads or N_CPUS, len(tasks))
+	if threads <= 1:
+		for task in tasks: process(task)
+	else:
+		pool = ThreadPool(threads)
+		try:
+			pool.map(process, tasks, chunksize=1)
+		finally:
+			pool.close()
+			pool.join()
+	return len([task for task in tasks if task[2]])
 
+
+def _createReplacer(dict, marker):
+	"""Return a function that replaces all the marked keys in a string. 
+	
+	"""
+	values = {}
+	for key in dict: values['%s%s%s'%(marker, key, marker)] = "%s" % (dict[key])
+	if not values: return lambda line: line
 	
+	# longest first, so that where one key is a prefix of another the longer key wins
+	regex = re.compile('|'.join(re.escape(token) for token in sorted(values, key=len, reverse=True)))
+	return lambda line: regex.sub(lambda match: values[match.group(0)], line)
+
+
+def _replacefile(input, output, replacer, encoding):
+	with openfile(input, 'r', encoding=encoding) as fi, openfile(output, 'w', encoding=encoding) as fo:
+		for line in fi:
+			fo.write(replacer(line))
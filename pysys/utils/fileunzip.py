@@ -18,41 +18,84 @@
 # Contact: moraygrieve@users.sourceforge.net
 
 from __future__ import print_function
-import os.path, glob, gzip, shutil, re
+import os.path, glob, gzip, bz2, shutil, re, tarfile, zipfile
+from multiprocessing.pool import ThreadPool
 
 from pysys.constants import *
 from pysys.exceptions import *
 
+try:
+	import lzma
+except ImportError: # not available in Python 2
+	lzma = None
 
-def unzipall(path, binary=False):
-	"""Unzip all .gz files in a given directory.
+# the number of bytes to decompress at a time, which bounds the memory used regardless of the file size
+UNZIP_BUFFER_SIZE = 1024*1024
+
+# supported archive extensions in the order they are checked, mapped to the function used to open 
+# single compressed files, or 'tar'/'zip' for archives containing multiple files
+ARCHIVE_TYPES = [
+	('.tar.gz', 'tar'), ('.tgz', 'tar'), ('.tar.bz2', 'tar'), ('.tar.xz', 'tar'), ('.tar', 'tar'), 
+	('.zip', 'zip'), 
+	('.gz', lambda f: gzip.GzipFile(f, 'rb')), 
+	('.bz2', lambda f: bz2.BZ2File(f, 'rb')), 
+	] + ([('.xz', lambda f: lzma.open(f, 'rb'))] if lzma else [])
+
+
+def unzipall(path, binary=False, threads=None, extensions=None):
+	"""Unzip all archive files in a given directory.
 	
-	Archive files are automatically deleted after unzipping. 
+	Archive files are automatically deleted after unzipping. By default only C{.gz} files are unzipped, but 
+	any of the archive types supported by L{unzip} can be selected using the extensions parameter. Since 
+	decompression releases the Python global interpreter lock the files are unzipped in parallel using a 
+	pool of threads. 
 	
 	@param path: The full path to the directory containing the archive files.
 	@param binary: Boolean flag to indicate if the unzipped files should be written as binary. 
 	The default value of False indicates that on some platforms newline characters will be 
 	converted to the operating system default. 
+	@param threads: The maximum number of files to unzip in parallel, defaulting to the number of CPUs.
+	@param extensions: The list of archive extensions to unzip, e.g. C{['.gz', '.zip']}, or None for just 
+	C{.gz}. Use C{[extension for extension, _ in ARCHIVE_TYPES]} to unzip all supported types. 
 	
 	@raises FileNotFoundException: Raised if the directory path does not exist.
+	@raises IncorrectFileTypeException: Raised if an extension is not a supported archive type.
 	
 	"""
 	if not os.path.exists(path):
 		raise FileNotFoundException("%s path does not exist" % (os.path.basename(path)))
 
-	for file in glob.glob('%s/*.gz'%(path)):
-		unzip(file, True, binary)
-
+	extensions = extensions or ['.gz']
+	for extension in extensions:
+		if extension not in [e for e, _ in ARCHIVE_TYPES]:
+			raise IncorrectFileTypeException("unsupported archive extension %s (%s)"%(extension, ', '.join(e for e, _ in ARCHIVE_TYPES)))
+	files = sorted(set(f for extension in extensions for f in glob.glob('%s/*%s'%(path, extension))))
+	threads = min(threads or N_CPUS, len(files))
+	if threads <= 1:
+		for file in files: unzip(file, True, binary)
+		return
+	
+	pool = ThreadPool(threads)
+	try:
+		pool.map(lambda file: unzip(file, True, binary), files, chunksize=1)
+	finally:
+		pool.close()
+		pool.join()
 
 
 def unzip(zfilename, replace=False, binary=False):
-	"""Unzip a .gz archive and write the contents to disk.
+	"""Unzip an archive and write the contents to disk.
+	
+	For a single compressed file of the form C{file.data.gz}, C{file.data.bz2} or C{file.data.xz} 
+	(Python 3 only), the method will unpack it to C{file.data}. Multi-file archives 
+	(C{.zip}, C{.tar}, C{.tar.gz}, C{.tgz}, C{.tar.bz2} and C{.tar.xz}) are extracted into the directory 
+	containing the archive. The archive file is removed in the process if the C{replace} input parameter 
+	is set to true. 
 	
-	The method will unpack a file of the form C{file.data.gz} to C{file.data}, removing the 
-	archive file in the process if the C{replace} input parameter is set to true. 
+	Decompression is streamed a block at a time, so the memory used does not depend on the size of the file. 
 	
-	By default the unpacked archive is treated as non-binary data, 
-	unless the binary input parameter is set to true.
+	By default the unpacked file is treated as non-binary data, unless the binary input parameter is set 
+	to true. This does not apply to multi-file archives, whose contents are always extracted unchanged. 
 	
 	@param zfilename: The full path to the archive file.
 	@param replace: Boolean flag to indicate if the archive file should be removed after unpacking.
@@ -61,39 +104,41 @@ def unzip(zfilename, replace=False, binary=False):
 	converted to the operating system default. 
 	
 	@raises FileNotFoundException: Raised if the archive file does not exist.
-	@raises IncorrectFileTypeEception: Raised if the archive file does not have a .gz extension.
+	@raises IncorrectFileTypeException: Raised if the archive file does not have a supported extension.
 	
 	"""
 	if not os.path.exists(zfilename):
 		raise FileNotFoundException("unable to find file %s" % (os.path.basename(zfilename)))
 
-	tokens	= zfilename.split('.')
-	if tokens[len(tokens)-1] != 'gz':
-		raise IncorrectFileTypeException("file does not have a .gz extension")
+	for extension, opener in ARCHIVE_TYPES:
+		if zfilename.endswith(extension): break
+	else:
+		raise IncorrectFileTypeException("file does not have a supported archive extension (%s)"%', '.join(e for e, _ in ARCHIVE_TYPES))
 	
-	uzfilename = ''
-	for i in range(len(tokens)-1):
-		uzfilename = uzfilename + tokens[i]
-		if i != len(tokens)-2:
-			uzfilename = uzfilename + '.'
-
-	# must read and write in binary in all cases, since we don't know for 
-	# certain what encoding it's in and want to avoid corrupting 
-	# non-newline characters
-	zfile = gzip.GzipFile(zfilename, 'rb', 9)
-	uzfile = open(uzfilename, 'wb')
-	if binary: 
-		# do an efficient block-by-block copy, in case it's large
-		shutil.copyfileobj(zfile, uzfile)
+	if opener == 'tar':
+		_extracttar(zfilename)
+	elif opener == 'zip':
+		with zipfile.ZipFile(zfilename) as zfile:
+			zfile.extractall(os.path.dirname(zfilename))
 	else:
-		# non-binary means fix newlines.
-		# for compatibility with pre-1.3 PySys this is currently 
-		# implemented for basic cases and only on windows. 
-		buffer = zfile.read()
-		if PLATFORM=='win32': buffer = buffer.replace(b'\n', b'\r\n')
-		uzfile.write(buffer)
-	zfile.close()	 
-	uzfile.close()
+		# must read and write in binary in all cases, since we don't know for 
+		# certain what encoding it's in and want to avoid corrupting 
+		# non-newline characters
+		zfile = opener(zfilename)
+		try:
+			with open(zfilename[:-len(extension)], 'wb') as uzfile:
+				if binary or PLATFORM != 'win32':
+					shutil.copyfileobj(zfile, uzfile, UNZIP_BUFFER_SIZE)
+				else:
+					# non-binary means fix newlines.
+					# for compatibility with pre-1.3 PySys this is currently 
+					# implemented for basic cases and only on windows. 
+					while True:
+						buffer = zfile.read(UNZIP_BUFFER_SIZE)
+						if not buffer: break
+						uzfile.write(buffer.replace(b'\n', b'\r\n'))
+		finally:
+			zfile.close()
 
 	if replace:
 		try:
@@ -102,6 +147,24 @@ def unzip(zfilename, replace=False, binary=False):
 			pass   
 
 
+def _extracttar(tfilename):
+	"""Extract a tar archive into the directory containing it, refusing any entries that would be 
+	written outside that directory. 
+	
+	"""
+	dest = os.path.dirname(os.path.abspath(tfilename))
+	with tarfile.open(tfilename, 'r:*') as tfile:
+		if hasattr(tarfile, 'data_filter'): # Python 3.12+, and security backports
+			tfile.extractall(dest, filter='data')
+			return
+		inside = lambda path: (os.path.abspath(os.path.join(dest, path))+os.sep).startswith(dest+os.sep)
+		for member in tfile.getmembers():
+			if not inside(member.name) or (member.islnk() and not inside(member.linkname)) or (
+					member.issym() and not inside(os.path.join(os.path.dirname(member.name), member.linkname))):
+				raise IncorrectFileTypeException("unable to extract %s from %s as it refers to a location outside the destination directory" % (member.name, os.path.basename(tfilename)))
+		tfile.extractall(dest)
+
+
 # entry point for running the script as an executable
 if __name__ == "__main__":
 	if len(sys.argv) < 2:
@@ -17,7 +17,13 @@
 
 # Contact: moraygrieve@users.sourceforge.net
 
-import os
+import os, re, locale, threading, uuid
+
+from pysys.utils.pycompat import PY2, openfile
+if PY2:
+	import Queue
+else:
+	import queue as Queue
 
 def mkdir(path):
 	"""
@@ -31,3 +37,216 @@ def mkdir(path):
 	except OSError as e:
 		if not os.path.isdir(path):
 			raise e
+
+def readlinesreverse(path, encoding=None, blockSize=64*1024):
+	"""
+	Returns a generator that yields the lines of a text file in reverse order, starting from the last line. 
+	
+	The file is read backwards from the end in blocks, so only as much of the file as is needed by 
+	the caller is read. This makes it cheap to find the last line (or last few lines) of very large 
+	files such as logs. Lines are returned in the same form as when iterating over a file opened 
+	with L{pysys.utils.pycompat.openfile}, i.e. including the trailing new line character. 
+	As with universal newlines mode, C{\\r\\n} and a bare C{\\r} are both treated as line endings and 
+	returned as C{\\n}, except when reading a byte string (no encoding) on Python 2 where only C{\\n} 
+	ends a line. 
+	
+	For encodings in which a new line is not represented by a single byte (e.g. UTF-16), the file is 
+	read forwards and the lines returned in reverse. 
+	
+	@param path: The absolute path of the file to read. 
+	@param encoding: The encoding to use to decode the file, or None for default. 
+	@param blockSize: The number of bytes to read at a time. 
+	"""
+	if PY2 and not encoding: 
+		decode, newline = (lambda b: b), b'\n'
+	else:
+		codec = encoding or locale.getpreferredencoding(False)
+		if u'\n'.encode(codec) != b'\n':
+			with openfile(path, 'r', encoding=encoding) as f:
+				for line in reversed(f.readlines()): yield line
+			return
+		decode, newline = (lambda b: b.decode(codec)), u'\n'
+	
+	# universal newline mode means \r\n and \r are returned as \n, except for python 2 byte strings
+	separator = re.compile(b'\r\n|\r|\n' if (encoding or not PY2) else b'\n')
+	with open(path, 'rb') as f:
+		f.seek(0, os.SEEK_END)
+		pos = f.tell()
+		remainder = b''
+		atEnd = True
+		while pos > 0:
+			size = min(blockSize, pos)
+			pos -= size
+			f.seek(pos)
+			chunk = f.read(size)+remainder
+			ends = [m.span() for m in separator.finditer(chunk)]
+			if not ends:
+				remainder = chunk
+				continue
+			if atEnd:
+				# this is whatever follows the final new line, if anything
+				atEnd = False
+				if ends[-1][1] < len(chunk): yield decode(chunk[ends[-1][1]:])
+			# the first line (and its separator, which might be a \r\n split across blocks) may be 
+			# incomplete until we've read the preceding block
+			for i in range(len(ends)-1, 0, -1):
+				yield decode(chunk[ends[i-1][1]:ends[i][0]])+newline
+			remainder = chunk[:ends[0][1]]
+		if atEnd:
+			if remainder: yield decode(remainder)
+		else:
+			yield decode(remainder[:separator.search(remainder).start()])+newline
+
+def deletedir(path, delTop=True):
+	"""
+	Recursively delete a directory and everything under it. 
+	
+	Symbolic links are deleted rather than followed. Deletion continues past any files or directories 
+	that cannot be deleted, and an OSError for the first failure is then raised. 
+	
+	@param path: The absolute path of the directory to delete. 
+	@param delTop: Indicates if the directory itself should be deleted, or just its contents. 
+	"""
+	failures = []
+	_deletetree(path, delTop, failures)
+	if failures: raise failures[0][1]
+
+def _deletetree(path, delTop, failures):
+	"""
+	Delete the contents of a directory (and optionally the directory itself), appending a (path, exception) 
+	tuple to failures for anything that could not be deleted. 
+	
+	On Python 3 os.scandir is used, which avoids a separate stat call to find the type of each entry. 
+	"""
+	try:
+		if hasattr(os, 'scandir'):
+			entries = [(e.path, e.is_dir(follow_symlinks=False)) for e in os.scandir(path)]
+		else:
+			entries = [(p, os.path.isdir(p) and not os.path.islink(p)) for p in (os.path.join(path, f) for f in os.listdir(path))]
+	except OSError as ex:
+		failures.append((path, ex))
+		return
+	
+	for entry, isdir in entries:
+		if isdir:
+			_deletetree(entry, True, failures)
+		else:
+			try:
+				os.remove(entry)
+			except OSError as ex:
+				failures.append((entry, ex))
+	if delTop:
+		try:
+			os.rmdir(path)
+		except OSError as ex:
+			failures.append((path, ex))
+
+class BackgroundDeleter(object):
+	"""
+	Deletes directory trees using a pool of background threads, so that the caller does not have to wait 
+	for large directories to be deleted. 
+	
+	A directory being purged is first renamed to a temporary name alongside the original, which is 
+	a fast operation that allows the original path to be reused immediately. The renamed directory is then 
+	deleted in the background. If the rename fails (for example because a file in the directory is in use on 
+	Windows) the directory is deleted synchronously instead. If the directory is a symbolic link, the contents of 
+	the directory it refers to are deleted synchronously, leaving the link in place (unless delTop is specified). 
+	
+	Temporary directories left behind by an earlier process that exited before deleting them (for example 
+	C{output.deleting-0123456789ab}) are deleted in the background when the original directory is next purged. 
+	
+	Any failures are held until L{wait} is called, which is usually done at the end of a test run. 
+	A single shared instance is available as C{pysys.utils.fileutils.backgroundDeleter}. 
+	
+	@ivar threads: The maximum number of background threads used for deletion. 
+	@type threads: integer
+	"""
+	def __init__(self, threads=4):
+		self.threads = threads
+		self.__queue = Queue.Queue()
+		self.__workers = []
+		self.__failures = []
+		self.__lock = threading.Lock()
+		self.__pending = set() # paths queued for deletion by this instance
+
+	def purge(self, dir, delTop=False):
+		"""
+		Delete all files and sub-directories of a directory, returning as soon as the directory has been 
+		moved aside. 
+		
+		This method is a no-op if the directory does not exist. 
+		
+		@param dir: The absolute path of the directory to purge. 
+		@param delTop: Indicates if the directory itself should be deleted; if False an empty directory is 
+		left at the original path. 
+		"""
+		if not os.path.isdir(dir): return
+		dir = dir.rstrip('/\\')
+		if os.path.islink(dir):
+			# renaming would move the link rather than the directory it refers to
+			failures = []
+			_deletetree(dir, False, failures)
+			if delTop:
+				try:
+					os.remove(dir)
+				except OSError as ex:
+					failures.append((dir, ex))
+			with self.__lock: self.__failures.extend(failures)
+			return
+		
+		# also delete anything left aside by a previous process that did not finish deleting it
+		prefix = os.path.basename(dir)+'.deleting-'
+		try:
+			stale = [os.path.join(os.path.dirname(dir), f) for f in os.listdir(os.path.dirname(dir) or '.') 
+				if f.startswith(prefix) and len(f) == len(prefix)+12]
+		except OSError:
+			stale = []
+		
+		aside = os.path.join(os.path.dirname(dir), prefix+uuid.uuid4().hex[:12])
+		try:
+			os.rename(dir, aside)
+		except OSError:
+			failures = []
+			_deletetree(dir, delTop, failures)
+			with self.__lock: self.__failures.extend(failures)
+			aside = None
+		else:
+			if not delTop: mkdir(dir)
+		
+		with self.__lock:
+			for path in stale+([aside] if aside else []):
+				if path in self.__pending: continue
+				self.__pending.add(path)
+				if len(self.__workers) < self.threads and self.__queue.unfinished_tasks >= len(self.__workers):
+					worker = threading.Thread(target=self.__run, name='deleter-%d'%(len(self.__workers)+1))
+					worker.daemon = True
+					worker.start()
+					self.__workers.append(worker)
+				self.__queue.put(path)
+
+	def wait(self):
+		"""
+		Wait for all pending deletions to complete, and return details of anything that could not be deleted 
+		since the last call to this method. 
+		
+		@return: A list of (path, exception) tuples, which is empty if everything was deleted. 
+		"""
+		self.__queue.join()
+		with self.__lock:
+			failures, self.__failures = self.__failures, []
+		return failures
+
+	def __run(self):
+		while True:
+			path = self.__queue.get()
+			try:
+				failures = []
+				# a stale directory may already have been deleted by another purge
+				if os.path.lexists(path): _deletetree(path, True, failures)
+				with self.__lock: 
+					self.__failures.extend(failures)
+					self.__pending.discard(path)
+			finally:
+				self.__queue.task_done()
+
+backgroundDeleter = BackgroundDeleter()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# PySys System Test Framework, Copyright (C) 2006-2018  M.B.Grieve
+
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+# Contact: moraygrieve@users.sourceforge.net
+"""
+Utilities for checking whether servers are accepting socket connections.
+
+"""
+
+import socket, select, errno, time
+try:
+	import selectors
+except ImportError: # Python 2
+	selectors = None
+
+from pysys import process_lock
+from pysys.constants import *
+from pysys.utils.allocport import SOCKETS_INHERITABLE
+
+# the initial and maximum delay before retrying a refused connection
+CONNECT_RETRY_INITIAL = 0.01
+CONNECT_RETRY_MAX = 0.1
+
+# errors indicating a non-blocking connect is still in progress (WSAEWOULDBLOCK=10035 on Windows)
+_CONNECT_IN_PROGRESS = set([errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035])
+
+def _createSocket():
+	"""Create a non-blocking TCP socket that is not inherited by child processes.
+	"""
+	if not SOCKETS_INHERITABLE:
+		s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	else:
+		# prevent handles being inherited by other processes started while this test is running
+		with process_lock:
+			s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			if OSFAMILY =='windows':
+				import win32api, win32con
+				win32api.SetHandleInformation(s.fileno(), win32con.HANDLE_FLAG_INHERIT, 0)
+			else:
+				import fcntl
+				fcntl.fcntl(s.fileno(), fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+	if OSFAMILY =='windows':
+		s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, 0)
+	s.setblocking(0)
+	return s
+
+def _waitForConnections(sockets, wait):
+	"""Wait for up to the specified time for non-blocking connects on the specified sockets to complete.
+
+	Uses the selectors module (or poll) where available, since select cannot wait on file descriptors
+	of 1024 or more.
+
+	@return: The set of sockets whose connect has completed, successfully or not. If waiting fails, no
+	sockets are returned so they are all treated as still in progress.
+	"""
+	try:
+		if selectors is not None:
+			selector = selectors.DefaultSelector()
+			try:
+				for s in sockets: selector.register(s, selectors.EVENT_WRITE)
+				return set(key.fileobj for key, events in selector.select(wait))
+			finally:
+				selector.close()
+		if hasattr(select, 'poll'):
+			poller = select.poll()
+			byfd = {}
+			for s in sockets: 
+				byfd[s.fileno()] = s
+				poller.register(s, select.POLLOUT)
+			return set(byfd[fd] for fd, events in poller.poll(wait*1000))
+		_, writable, failed = select.select([], sockets, sockets, wait)
+		return set(writable) | set(failed)
+	except (select.error, OSError, ValueError):
+		time.sleep(wait)
+		return set()
+
+def _close(s):
+	try:
+		s.shutdown(socket.SHUT_RDWR)
+	except Exception:
+		pass
+	s.close()
+
+class SocketConnector(object):
+	"""Repeatedly tries to connect to a set of (host, port) endpoints at the same time, until a connection
+	has been established to each of them.
+
+	Connections are made using non-blocking sockets, waiting for them all to complete together (using
+	the selectors module where available). A new socket is used for each attempt, and refused connections are retried with an exponential
+	backoff from C{CONNECT_RETRY_INITIAL} up to C{CONNECT_RETRY_MAX} seconds. Connections are closed as soon
+	as they are established.
+
+	@ivar pending: The list of endpoints that have not yet accepted a connection.
+	"""
+	def __init__(self, endpoints):
+		"""
+		@param endpoints: A list of (host, port) tuples.
+		"""
+		self.pending = list(endpoints)
+		self.__sockets = {} # endpoint -> socket with a connection in progress
+		self.__retryDelay = dict((endpoint, CONNECT_RETRY_INITIAL) for endpoint in self.pending)
+		self.__retryTime = dict((endpoint, 0) for endpoint in self.pending)
+
+	def poll(self, wait):
+		"""Start connections to any pending endpoints that are due to be retried, and wait for up to the
+		specified time for in-progress connections to complete.
+
+		@param wait: The maximum time in seconds to wait.
+		@return: The list of endpoints that have not yet accepted a connection.
+		"""
+		now = time.time()
+		for endpoint in list(self.pending):
+			if endpoint not in self.__sockets and self.__retryTime[endpoint] <= now:
+				self.__connect(endpoint)
+		if not self.pending: return []
+
+		# don't wait past the time the next refused connection is due to be retried
+		retries = [self.__retryTime[e] for e in self.pending if e not in self.__sockets]
+		if retries: wait = max(0, min(wait, min(retries)-time.time()))
+
+		if not self.__sockets:
+			time.sleep(wait)
+			return self.pending
+
+		completed = _waitForConnections(list(self.__sockets.values()), wait)
+		for endpoint, s in list(self.__sockets.items()):
+			if s in completed:
+				del self.__sockets[endpoint]
+				self.__completed(endpoint, s, s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0 and self.__isConnected(s))
+		return self.pending
+
+	def close(self):
+		"""Close any connections that are still in progress.
+		"""
+		for s in self.__sockets.values(): _close(s)
+		self.__sockets = {}
+
+	def __isConnected(self, s):
+		# a socket reported as writable may have failed without setting SO_ERROR yet on some platforms, 
+		# so check there is a peer
+		try:
+			s.getpeername()
+			return True
+		except socket.error:
+			return False
+
+	def __connect(self, endpoint):
+		s = _createSocket()
+		try:
+			result = s.connect_ex(endpoint)
+		except socket.error: # e.g. the host name cannot be resolved
+			result = -1
+		if result in _CONNECT_IN_PROGRESS:
+			self.__sockets[endpoint] = s
+		else:
+			self.__completed(endpoint, s, result == 0)
+
+	def __completed(self, endpoint, s, connected):
+		_close(s)
+		if connected:
+			self.pending.remove(endpoint)
+		else:
+			self.__retryTime[endpoint] = time.time()+self.__retryDelay[endpoint]
+			self.__retryDelay[endpoint] = min(CONNECT_RETRY_MAX, self.__retryDelay[endpoint]*2)
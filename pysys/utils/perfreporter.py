@@ -19,6 +19,7 @@
 
 import collections, threading, time, math
 
+from pysys import log
 from pysys.constants import *
 from pysys.utils.logutils import BaseLogFormatter
 from pysys.utils.fileutils import mkdir
@@ -46,6 +47,8 @@ class PerformanceUnit(object):
 PerformanceUnit.SECONDS = PerformanceUnit('s', False)
 PerformanceUnit.PER_SECOND = PerformanceUnit('/s', True)
 
+_DATE_TIME_REGEX = re.compile('.*\d{4}[-/]\d{2}[-/]\d{2}\ \d{2}[:/]\d{2}[:/]\d{2}.*')
+
 class CSVPerformanceReporter(object):
 	"""Class for receiving performance results and writing them to a file for later analysis.
 	
@@ -68,8 +71,30 @@ class CSVPerformanceReporter(object):
 	and (optionally) associated with each individual test result (e.g. test mode etc). 
 	The per-run and per-result metadata is not arranged in columns since the structure 
 	differs from row to row.
+	
+	To keep the cost of reporting a result low, files are kept open rather than reopened for each result. 
+	Each test's performance_results.csv is written as results are reported (so it can be used while 
+	the test is validating) and closed when the test completes (see L{testComplete}). The summary files 
+	are kept open for the whole run, with the rows buffered and written at least every C{FLUSH_INTERVAL} 
+	seconds and when the run completes (see L{close}). 
+	
+	When running with multiple cycles, the samples reported for each resultKey can be aggregated during the 
+	run by setting the project property C{performanceAggregateCycles=true}, in which case the summary file 
+	contains a single row for each resultKey (written when the run completes) with the mean, standard 
+	deviation and number of samples, and the min, max and 50th, 90th and 99th percentiles in the result 
+	details. The performance_results.csv file in each test output directory still contains the individual 
+	sample. When aggregating, the following project properties can also be set: 
+	
+		- C{performanceWarmupCycles}: the number of cycles whose results are not aggregated, i.e. results 
+		reported by a test whose C{testCycle} is less than or equal to this are discarded (default 0). 
+		- C{performanceTargetConfidencePercent}: if set, later cycles of a test will not be run (or reported 
+		to the writers) once the 
+		half-width of the 95% confidence interval of the mean is within this percentage of the mean for every 
+		resultKey the test reports (with at least C{MIN_CONVERGED_SAMPLES} samples). See L{hasConverged}. 
 
 	"""
+	MIN_CONVERGED_SAMPLES = 3
+	FLUSH_INTERVAL = 5.0
 
 	def __init__(self, project, summaryfile, testoutdir):
 		"""Construct an instance of the performance reporter.
@@ -82,16 +107,39 @@ class CSVPerformanceReporter(object):
 		self.testoutdir = os.path.basename(testoutdir)
 		self.summaryfile = summaryfile
 		self.project = project
-		self.hostname = HOSTNAME.lower().split('.')[0]
+		self.__hostname = None # only looked up when first needed, since it can be slow
 		self.runStartTime = time.time()
 		
 		self._lock = threading.RLock()
 		self.__previousResultKeys = {} # value = (testid, testobjhash, resultDetails)
-		self.__runDetails = self.getRunDetails()
+		self.__runDetails = None
 		
 		# anything listed here can be passed using just a string literal
 		self.unitAliases = {'s':PerformanceUnit.SECONDS, '/s': PerformanceUnit.PER_SECOND}
 		
+		self.aggregateCycles = getattr(project, 'performanceAggregateCycles', 'false').lower() == 'true'
+		self.warmupCycles = int(getattr(project, 'performanceWarmupCycles', '0') or '0')
+		self.targetConfidencePercent = float(getattr(project, 'performanceTargetConfidencePercent', '') or '0')
+		self.__aggregatedResults = collections.OrderedDict() # key = resultKey, value = dict with statistics and details
+		self.__testResultKeys = {} # key = testId, value = set of aggregated resultKeys
+		
+		self.__testState = {} # key = test output dir, value = dict with summary file and open per-test file
+		self.__pendingSummaryRows = collections.OrderedDict() # key = summary file, value = list of rows to write
+		self.__summaryFiles = {} # key = summary file, value = open file handle
+		self.__flushLock = threading.Lock() # held while writing instead of the main lock, so results can still be reported
+		self.__nextFlushTime = time.time()+self.FLUSH_INTERVAL
+		self.__closed = False
+		
+	@property
+	def hostname(self):
+		"""The unqualified lower case name of this host, which is only looked up when it is first used."""
+		if self.__hostname is None: self.__hostname = getHostname().lower().split('.')[0]
+		return self.__hostname
+	
+	@hostname.setter
+	def hostname(self, value):
+		self.__hostname = value
+
 	def getRunDetails(self):
 		"""Return an dictionary of information about this test run (e.g. hostname, start time, etc).
 		
@@ -144,11 +192,143 @@ class CSVPerformanceReporter(object):
 
 	def getRunHeader(self):
 		"""Return the header string to the CSV file."""
+		if self.__runDetails is None: self.__runDetails = self.getRunDetails()
 		return '# '+CSVPerformanceFile.toCSVLine(CSVPerformanceFile.COLUMNS+[CSVPerformanceFile.RUN_DETAILS, self.__runDetails])+'\n'
 
 	def cleanup(self):
 		"""Called when PySys has finished executing tests."""
-		pass
+		self.close()
+
+	def testComplete(self, testobj):
+		"""Called when a test has completed, to close the performance_results.csv file in its output directory. 
+
+		@param testobj: the test case instance
+		"""
+		with self._lock:
+			state = self.__testState.pop(testobj.output, None)
+			if state and state['file']: state['file'].close()
+			flush = time.time() >= self.__nextFlushTime
+		if flush: self.flush()
+
+	def flush(self):
+		"""Write any buffered rows to the summary files. """
+		with self.__flushLock:
+			with self._lock:
+				pending, self.__pendingSummaryRows = self.__pendingSummaryRows, collections.OrderedDict()
+				self.__nextFlushTime = time.time()+self.FLUSH_INTERVAL
+				closed = self.__closed
+			for path, rows in pending.items():
+				f = self.__summaryFiles.get(path, None)
+				if f is None:
+					mkdir(os.path.dirname(path))
+					alreadyexists = os.path.exists(path)
+					f = open(path, 'a')
+					if not alreadyexists: 
+						log.info('Creating performance summary log file at: %s', path)
+						f.write(self.getRunHeader())
+					if not closed: self.__summaryFiles[path] = f
+				f.writelines(rows)
+				if closed: 
+					f.close()
+				else:
+					f.flush()
+
+	def close(self):
+		"""Called when the run has completed to write the aggregated results (if enabled) and any buffered 
+		rows, and close the summary files. 
+
+		This is called by the runner after L{cleanup}. Any results recorded after this are written immediately. 
+		"""
+		with self._lock:
+			if self.__closed: return
+			if self.aggregateCycles: self.recordAggregatedResults()
+			self.__closed = True
+			# for any tests for which testComplete was not called
+			for state in self.__testState.values():
+				if state['file']: state['file'].close()
+			self.__testState.clear()
+		self.flush()
+		with self.__flushLock:
+			for f in self.__summaryFiles.values(): f.close()
+			self.__summaryFiles = {}
+
+	def __openTestFile(self, path):
+		alreadyexists = os.path.exists(path)
+		f = open(path, 'a')
+		if not alreadyexists: f.write(self.getRunHeader())
+		return f
+
+	def hasConverged(self, testId):
+		"""Return True if further cycles of the specified test are not needed because the performance results
+		it has reported have converged.
+
+		This is only the case when aggregating with a C{performanceTargetConfidencePercent}, and the test has
+		reported at least one result, and for every result the half-width of the 95% confidence interval of
+		the mean is within the target percentage of the mean.
+
+		@param testId: The id of the test.
+		"""
+		if not (self.aggregateCycles and self.targetConfidencePercent > 0): return False
+		with self._lock:
+			keys = self.__testResultKeys.get(testId)
+			if not keys: return False
+			for k in keys:
+				statistics = self.__aggregatedResults[k]['statistics']
+				if statistics.samples < self.MIN_CONVERGED_SAMPLES: return False
+				if statistics.getConfidenceInterval() > abs(statistics.mean)*self.targetConfidencePercent/100.0: return False
+		return True
+
+	def aggregateResult(self, testobj, value, resultKey, unit, toleranceStdDevs, resultDetails):
+		"""Add a sample to the statistics for the specified resultKey, which will be written to the
+		summary file by L{recordAggregatedResults}. 
+
+		@param testobj: the test case instance registering the value
+		@param value: the value to be reported
+		@param resultKey: a unique string that fully identifies what was measured
+		@param unit: identifies the unit the the value is measured in
+		@param toleranceStdDevs: indicates how many standard deviations away from the mean for a regression
+		@param resultDetails:  A dictionary of detailed information that should be recorded together with the result
+
+		"""
+		with self._lock:
+			result = self.__aggregatedResults.get(resultKey, None)
+			if result is None:
+				result = self.__aggregatedResults[resultKey] = {'statistics':SampleStatistics(), 'warmupSamples':0, 
+					'testId':testobj.descriptor.id, 'unit':unit, 'toleranceStdDevs':toleranceStdDevs, 
+					'resultDetails':resultDetails, 'summaryFile':self.__getTestState(testobj)['summaryFile']}
+			warmup = 0 < testobj.testCycle <= self.warmupCycles
+			if warmup:
+				result['warmupSamples'] += 1
+			else:
+				result['statistics'].add(value)
+				self.__testResultKeys.setdefault(testobj.descriptor.id, set()).add(resultKey)
+		if warmup: testobj.log.info('Performance result "%s" is from a warm-up cycle and will not be aggregated', resultKey)
+
+	def recordAggregatedResults(self):
+		"""Write a row for each aggregated resultKey to the performance summary file(s), with the mean,
+		standard deviation and number of samples, and the min, max and percentiles in the result details.
+		"""
+		with self._lock:
+			for resultKey, result in self.__aggregatedResults.items():
+				statistics = result['statistics']
+				if statistics.samples == 0: continue # only warm-up samples
+				resultDetails = collections.OrderedDict(result['resultDetails'])
+				resultDetails['min'] = statistics.getMin()
+				resultDetails['max'] = statistics.getMax()
+				for percentile in [50, 90, 99]:
+					resultDetails['p%d'%percentile] = statistics.getPercentile(percentile)
+				if result['warmupSamples']: resultDetails['warmupSamples'] = result['warmupSamples']
+				data = {'resultKey':resultKey,
+						'testId':result['testId'],
+						'value':str(statistics.mean),
+						'unit':str(result['unit']),
+						'biggerIsBetter':str(result['unit'].biggerIsBetter).upper(),
+						'toleranceStdDevs':str(result['toleranceStdDevs']) if result['toleranceStdDevs'] else '',
+						'samples':str(statistics.samples),
+						'stdDev':str(statistics.getStdDev()),
+						'resultDetails':resultDetails
+						}
+				self.__pendingSummaryRows.setdefault(result['summaryFile'], []).append(CSVPerformanceFile.toCSVLine(data)+'\n')
 
 	def reportResult(self, testobj, value, resultKey, unit, toleranceStdDevs=None, resultDetails=None):
 		"""Report a performance result, with an associated unique key that identifies it.
@@ -166,7 +346,7 @@ class CSVPerformanceReporter(object):
 		# check for correct format for result key
 		if '  ' in resultKey:
 			raise Exception ('Invalid resultKey - contains double space "  ": %s' % resultKey)
-		if re.compile('.*\d{4}[-/]\d{2}[-/]\d{2}\ \d{2}[:/]\d{2}[:/]\d{2}.*').match(resultKey) != None :
+		if _DATE_TIME_REGEX.match(resultKey) != None :
 			raise Exception ('Invalid resultKey - contains what appears to be a date time - which would imply alteration of the result key in each run: %s' % resultKey)
 		if '\n' in resultKey:
 			raise Exception ('Invalid resultKey - contains a new line: %s' % resultKey)
@@ -209,6 +389,7 @@ class CSVPerformanceReporter(object):
 			testobj.log.warn('Performance result "%s" will not be recorded as test has failed', resultKey)
 			return
 
+		if self.aggregateCycles: self.aggregateResult(testobj, value, resultKey, unit, toleranceStdDevs, resultDetails)
 		formatted = self.formatResult(testobj, value, resultKey, unit, toleranceStdDevs, resultDetails)
 		self.recordResult(formatted, testobj)
 
@@ -238,28 +419,37 @@ class CSVPerformanceReporter(object):
 	def recordResult(self, formatted, testobj):
 		"""Record results to the performance summary file.
 
+		The row is written to the test's performance_results.csv immediately, and buffered for the 
+		summary file, to be written by L{flush}. 
+
 		@param formatted: the formatted string to write
 		@param testobj: object reference to the calling test
 
 		"""
 		# generate a file in the test output directory for convenience/triaging, plus add to the global summary
-		path = testobj.output+'/performance_results.csv'
-		if not os.path.exists(path):
-			with open(path, 'w') as f:
-				f.write(self.getRunHeader())
-		with open(path, 'a') as f:
-			f.write(formatted)
-		
-		# now the global one
-		path = self.getRunSummaryFile(testobj)
-		mkdir(os.path.dirname(path))
 		with self._lock:
-			alreadyexists = os.path.exists(path)
-			with open(path, 'a') as f:
-				if not alreadyexists: 
-					testobj.log.info('Creating performance summary log file at: %s', path)
-					f.write(self.getRunHeader())
-				f.write(formatted)
+			state = self.__getTestState(testobj)
+			if self.__closed:
+				with self.__openTestFile(testobj.output+'/performance_results.csv') as f: f.write(formatted)
+			else:
+				if not state['file']: state['file'] = self.__openTestFile(testobj.output+'/performance_results.csv')
+				state['file'].write(formatted)
+				state['file'].flush()
+			
+			# when aggregating, the global one gets a single row per resultKey at the end of the run
+			if not self.aggregateCycles: 
+				self.__pendingSummaryRows.setdefault(state['summaryFile'], []).append(formatted)
+			flush = self.__closed or time.time() >= self.__nextFlushTime
+		if flush: self.flush()
+
+	def __getTestState(self, testobj):
+		"""Return the cached summary file and open per-test file for the specified test. Must be called with the lock. 
+		"""
+		state = self.__testState.get(testobj.output, None)
+		if state is None:
+			state = {'summaryFile':self.getRunSummaryFile(testobj), 'file':None}
+			if not self.__closed: self.__testState[testobj.output] = state
+		return state
 	
 
 class CSVPerformanceFile(object):
@@ -442,9 +632,241 @@ class CSVPerformanceFile(object):
 
 
 
+def welchTTest(mean1, stdDev1, samples1, mean2, stdDev2, samples2):
+	"""Perform Welch's unequal variances t-test, to determine whether two sets of samples are likely to have 
+	different means, using only the mean, sample standard deviation and number of samples of each set. 
+
+	@return: A tuple (t, degreesOfFreedom, pValue) where pValue is the two-tailed probability of seeing a 
+	difference at least this large if the means were equal, or None if either set has fewer than 2 samples. 
+	"""
+	if samples1 < 2 or samples2 < 2: return None
+	var1, var2 = stdDev1**2/samples1, stdDev2**2/samples2
+	if var1+var2 == 0: 
+		# no variation at all, so any difference is certain
+		return (0.0, float(samples1+samples2-2), 1.0) if mean1 == mean2 else (float('inf'), float(samples1+samples2-2), 0.0)
+	t = (mean2-mean1)/math.sqrt(var1+var2)
+	df = (var1+var2)**2 / (var1**2/(samples1-1) + var2**2/(samples2-1))
+	return t, df, _regularizedIncompleteBeta(df/(df+t*t), df/2.0, 0.5)
+
+def _regularizedIncompleteBeta(x, a, b):
+	"""Return the regularized incomplete beta function I_x(a,b), evaluated using a continued fraction 
+	(see Numerical Recipes, section 6.4). 
+	"""
+	if x <= 0: return 0.0
+	if x >= 1: return 1.0
+	front = math.exp(math.lgamma(a+b)-math.lgamma(a)-math.lgamma(b) + a*math.log(x) + b*math.log(1-x))
+	if x > (a+1)/(a+b+2): 
+		# the continued fraction converges faster using the symmetry relation
+		return 1.0-_regularizedIncompleteBeta(1-x, b, a)
+	
+	tiny = 1e-300
+	c, d = 1.0, 1.0-(a+b)*x/(a+1)
+	if abs(d) < tiny: d = tiny
+	d = 1.0/d
+	result = d
+	for m in range(1, 300):
+		for numerator in [m*(b-m)*x/((a+2*m-1)*(a+2*m)), -(a+m)*(a+b+m)*x/((a+2*m)*(a+2*m+1))]:
+			d = 1.0+numerator*d
+			if abs(d) < tiny: d = tiny
+			c = 1.0+numerator/c
+			if abs(c) < tiny: c = tiny
+			d = 1.0/d
+			result *= d*c
+		if abs(d*c-1.0) < 1e-12: break
+	return front*result/a
+
+def _studentTCriticalValue(confidence, df):
+	"""Return the value t such that a Student's t distributed variable with the specified degrees of freedom
+	lies in the range -t to t with the specified probability, found by bisection.
+	"""
+	low, high = 0.0, 1.0
+	while _regularizedIncompleteBeta(df/(df+high*high), df/2.0, 0.5) > 1-confidence: high *= 2
+	for i in range(100):
+		mid = (low+high)/2
+		if _regularizedIncompleteBeta(df/(df+mid*mid), df/2.0, 0.5) > 1-confidence:
+			low = mid
+		else:
+			high = mid
+		if high-low < 1e-9: break
+	return (low+high)/2
+
+class SampleStatistics(object):
+	"""Accumulates samples of a performance result one at a time, calculating the mean and sample standard
+	deviation using Welford's online algorithm, and keeping the samples for calculating the minimum,
+	maximum and percentiles.
+
+	@ivar samples: The number of samples added.
+	@ivar mean: The mean of the samples added.
+	"""
+	def __init__(self):
+		self.samples = 0
+		self.mean = 0.0
+		self.__m2 = 0.0 # sum of squared differences from the mean
+		self.__values = []
+
+	def add(self, value):
+		"""Add a sample. """
+		value = float(value)
+		self.samples += 1
+		delta = value-self.mean
+		self.mean += delta/self.samples
+		self.__m2 += delta*(value-self.mean)
+		self.__values.append(value)
+
+	def getStdDev(self):
+		"""Return the sample standard deviation (using the Bessel-corrected unbiased estimate), or 0 if there are
+		fewer than 2 samples. """
+		if self.samples < 2: return 0.0
+		return math.sqrt(self.__m2/(self.samples-1))
+
+	def getMin(self):
+		return min(self.__values)
+
+	def getMax(self):
+		return max(self.__values)
+
+	def getPercentile(self, percentile):
+		"""Return the specified percentile (between 0 and 100) of the samples, interpolating linearly between
+		the closest samples. """
+		values = sorted(self.__values)
+		rank = (len(values)-1)*percentile/100.0
+		lower = int(math.floor(rank))
+		upper = min(lower+1, len(values)-1)
+		return values[lower]+(values[upper]-values[lower])*(rank-lower)
+
+	def getConfidenceInterval(self, confidence=0.95):
+		"""Return the half-width of the confidence interval for the mean, based on the Student's t
+		distribution, or None if there are fewer than 2 samples.
+		"""
+		if self.samples < 2: return None
+		return _studentTCriticalValue(confidence, self.samples-1.0)*self.getStdDev()/math.sqrt(self.samples)
+
+class PerformanceComparison(object):
+	"""Compares performance results from a candidate set of runs against a baseline. 
+	
+	Results are matched up by resultKey, after aggregating each set with L{CSVPerformanceFile.aggregate}. 
+	For each result the percentage change in the mean is calculated, and where both sets have at 
+	least 2 samples, Welch's t-test (see L{welchTTest}) is used to determine whether the change is 
+	statistically significant. A change is reported as a REGRESSION or IMPROVEMENT (according to 
+	biggerIsBetter) only if every applicable check is met: 
+	
+		- the p-value is less than alpha (if both sets have at least 2 samples), 
+		- the change is more than toleranceStdDevs baseline standard deviations (if the result specifies 
+		toleranceStdDevs and the baseline has a non-zero standard deviation), 
+		- the percentage change is more than tolerancePercent (if specified). 
+	
+	Otherwise the status is UNCHANGED, or INCONCLUSIVE if none of the checks could be applied. Results only 
+	in the candidate or only in the baseline have the status NEW or MISSING. 
+	
+	@ivar results: A list of dictionaries, one for each resultKey, with the keys in L{COLUMNS}. 
+	"""
+	COLUMNS = ['status', 'resultKey', 'testId', 'unit', 'biggerIsBetter', 'percentChange', 'pValue', 
+		'baselineValue', 'baselineStdDev', 'baselineSamples', 'value', 'stdDev', 'samples', 'toleranceStdDevs']
+	
+	REGRESSION, IMPROVEMENT, UNCHANGED, INCONCLUSIVE, NEW, MISSING = 'REGRESSION', 'IMPROVEMENT', 'UNCHANGED', 'INCONCLUSIVE', 'NEW', 'MISSING'
+	
+	def __init__(self, baseline, candidate, alpha=0.05, tolerancePercent=None):
+		"""
+		@param baseline: A L{CSVPerformanceFile} or list of files containing the baseline results. 
+		@param candidate: A L{CSVPerformanceFile} or list of files containing the results to compare. 
+		@param alpha: The significance level for the t-test. 
+		@param tolerancePercent: The minimum percentage change to report, or None. 
+		"""
+		self.alpha, self.tolerancePercent = alpha, tolerancePercent
+		baseline = dict((r['resultKey'], r) for r in CSVPerformanceFile.aggregate(baseline).results)
+		candidate = dict((r['resultKey'], r) for r in CSVPerformanceFile.aggregate(candidate).results)
+		self.results = [self.__compare(baseline.get(key), candidate.get(key)) for key in sorted(set(baseline) | set(candidate))]
+	
+	def __compare(self, base, cand):
+		r = collections.OrderedDict((k, '') for k in self.COLUMNS)
+		for k in ['resultKey', 'testId', 'unit', 'biggerIsBetter', 'toleranceStdDevs']:
+			r[k] = (cand or base).get(k, '')
+		if base:
+			r['baselineValue'], r['baselineStdDev'], r['baselineSamples'] = base['value'], base['stdDev'], base['samples']
+		if cand:
+			r['value'], r['stdDev'], r['samples'] = cand['value'], cand['stdDev'], cand['samples']
+		if not (base and cand):
+			r['status'] = self.NEW if cand else self.MISSING
+			return r
+		
+		diff = cand['value']-base['value']
+		if base['value'] != 0: r['percentChange'] = 100.0*diff/abs(base['value'])
+		
+		checks = []
+		ttest = welchTTest(base['value'], base['stdDev'], base['samples'], cand['value'], cand['stdDev'], cand['samples'])
+		if ttest is not None:
+			r['pValue'] = ttest[2]
+			checks.append(ttest[2] < self.alpha)
+		tolerance = cand['toleranceStdDevs'] or base['toleranceStdDevs']
+		if tolerance and base['stdDev'] > 0:
+			checks.append(abs(diff) > tolerance*base['stdDev'])
+		if self.tolerancePercent is not None and r['percentChange'] != '':
+			checks.append(abs(r['percentChange']) > self.tolerancePercent)
+		
+		if not checks:
+			r['status'] = self.INCONCLUSIVE
+		elif not all(checks) or diff == 0:
+			r['status'] = self.UNCHANGED
+		else:
+			r['status'] = self.IMPROVEMENT if (diff > 0) == r['biggerIsBetter'] else self.REGRESSION
+		return r
+	
+	def getRegressions(self):
+		"""Return the list of results whose status is REGRESSION. """
+		return [r for r in self.results if r['status'] == self.REGRESSION]
+	
+	def sortResults(self, sortBy='improvement'):
+		"""Sort the results. 
+		
+		@param sortBy: The column to sort by, or 'improvement' to sort by the percentage change in the 
+		better direction (so the worst regressions are first) with results that have no percentage change last. 
+		"""
+		if sortBy == 'improvement':
+			key = lambda r: (r['percentChange'] == '', 
+				(r['percentChange'] if r['biggerIsBetter'] else -r['percentChange']) if r['percentChange'] != '' else 0, r['resultKey'])
+		else:
+			assert sortBy in self.COLUMNS, 'Unknown sort column: %s'%sortBy
+			key = lambda r: (r[sortBy] == '', r[sortBy], r['resultKey'])
+		self.results.sort(key=key)
+	
+	def toCSV(self):
+		"""Return the comparison as a string of comma-separated values, with a header line. """
+		def format(value):
+			if isinstance(value, bool): return str(value).upper()
+			if isinstance(value, float): return '%0.6g'%value
+			return str(value)
+		lines = ['# '+CSVPerformanceFile.toCSVLine(list(self.COLUMNS))]
+		for r in self.results:
+			lines.append(CSVPerformanceFile.toCSVLine([format(r[k]) for k in self.COLUMNS]))
+		return '\n'.join(lines)+'\n'
+
+def _loadPerformanceFiles(paths):
+	"""Load the performance files from a list of .csv files or directories containing .csv files. 
+	"""
+	files = []
+	for p in paths:
+		if os.path.isfile(p):
+			files.append(p)
+		elif os.path.isdir(p):
+			for (dirpath, dirnames, filenames) in os.walk(p):
+				for f in sorted(filenames):
+					if f.endswith('.csv'):
+						files.append(dirpath+'/'+f)
+		else:
+			raise Exception('Cannot find file: %s'%p)
+	
+	if not files:
+		raise Exception('No .csv files found')
+	result = []
+	for p in files:
+		with open(p) as f:
+			result.append(CSVPerformanceFile(f.read()))
+	return result
+
 if __name__ == "__main__":
 	USAGE = """
 python -m pysys.utils.perfreporter aggregate PATH1 PATH2... > aggregated.csv
+python -m pysys.utils.perfreporter compare [OPTIONS] BASELINE_PATH CANDIDATE_PATH > comparison.csv
 
 where PATH is a .csv file or directory of .csv files. 
 
@@ -454,36 +876,50 @@ values for that resultKey and the 'stdDev' updated with the standard deviation.
 This can also be used with one or more .csv file to aggregate results from multiple 
 cycles. 
 
+The compare command aggregates the baseline and candidate results and compares 
+them for each resultKey, writing a report with the status (REGRESSION, 
+IMPROVEMENT, UNCHANGED, INCONCLUSIVE, NEW or MISSING), percentage change 
+and the p-value from Welch's t-test. The exit status is 2 if there are any 
+regressions. Options: 
+   -a, --alpha NUM             significance level for the t-test (default 0.05)
+   -t, --tolerancePercent NUM  ignore changes smaller than this percentage
+   -s, --sort COLUMN           sort by a column of the report, or by 
+                               "improvement" (the default, which puts the 
+                               worst regressions first)
+
 """
-	# could later add support for automatically comparing files
 	args = sys.argv[1:]
-	if '-h' in sys.argv or '--help' in args or len(args) <2 or args[0] not in ['aggregate']:
+	if '-h' in sys.argv or '--help' in args or len(args) <2 or args[0] not in ['aggregate', 'compare']:
 		sys.stderr.write(USAGE)
 		sys.exit(1)
 	
 	cmd = args[0]
 	
-	paths = []
-	for p in args[1:]:
-		if os.path.isfile(p):
-			paths.append(p)
-		elif os.path.isdir(p):
-			for (dirpath, dirnames, filenames) in os.walk(p):
-				for f in sorted(filenames):
-					if f.endswith('.csv'):
-						paths.append(dirpath+'/'+f)
-		else:
-			raise Exception('Cannot find file: %s'%p)
-	
-	if not paths:
-		raise Exception('No .csv files found')
-	files = []
-	for p in paths:
-		with open(p) as f:
-			files.append(CSVPerformanceFile(f.read()))
-	
 	if cmd == 'aggregate':
-		f = CSVPerformanceFile.aggregate(files)
+		f = CSVPerformanceFile.aggregate(_loadPerformanceFiles(args[1:]))
 		sys.stdout.write('# '+CSVPerformanceFile.toCSVLine(CSVPerformanceFile.COLUMNS+[CSVPerformanceFile.RUN_DETAILS, f.runDetails])+'\n')
 		for r in f.results:
 			sys.stdout.write(CSVPerformanceFile.toCSVLine(r)+'\n')
+	
+	elif cmd == 'compare':
+		import getopt
+		try:
+			optlist, paths = getopt.getopt(args[1:], 'a:t:s:', ['alpha=', 'tolerancePercent=', 'sort='])
+		except getopt.GetoptError as e:
+			sys.stderr.write('%s\n%s'%(e, USAGE))
+			sys.exit(1)
+		if len(paths) != 2:
+			sys.stderr.write(USAGE)
+			sys.exit(1)
+		options = dict(optlist)
+		comparison = PerformanceComparison(_loadPerformanceFiles([paths[0]]), _loadPerformanceFiles([paths[1]]), 
+			alpha=float(options.get('-a', options.get('--alpha', '0.05'))), 
+			tolerancePercent=float(options.get('-t', options.get('--tolerancePercent', 'nan'))) if ('-t' in options or '--tolerancePercent' in options) else None)
+		comparison.sortResults(options.get('-s', options.get('--sort', 'improvement')))
+		sys.stdout.write(comparison.toCSV())
+		
+		regressions = comparison.getRegressions()
+		sys.stderr.write('Compared %d results: %s\n'%(len(comparison.results), ', '.join(
+			'%d %s'%(len([r for r in comparison.results if r['status']==status]), status) for status in 
+			[comparison.REGRESSION, comparison.IMPROVEMENT, comparison.UNCHANGED, comparison.INCONCLUSIVE, comparison.NEW, comparison.MISSING])))
+		if regressions: sys.exit(2)
@@ -25,9 +25,10 @@ of a set of tests. There are currently three distinct types of writers, namely R
 Summary, each of which performs output at different stages of a run i.e.
 
    - "Record" writers output the outcome of a specific test after completion of that test, to allow
-runtime auditing of the test output, e.g. into a relational database. Four implementations of record
+runtime auditing of the test output, e.g. into a relational database. Five implementations of record
 writers are distributed with the PySys framework, namely the L{writer.TextResultsWriter}, the
-L{writer.XMLResultsWriter}, the L{writer.JUnitXMLResultsWriter} and the L{writer.CSVResultsWriter}.
+L{writer.XMLResultsWriter}, the L{writer.JUnitXMLResultsWriter}, the L{writer.CSVResultsWriter} and the 
+L{writer.JSONLinesResultsWriter}.
 Whilst the record writers distributed with PySys all subclass L{writer.BaseResultsWriter} best practice
 is to subclass L{writer.BaseRecordResultsWriter} when writing custom implementations. Record writers
 are enabled when the --record flag is given to the PySys launcher.
@@ -62,16 +63,20 @@ breaking writer implementations already in existence.
 
 """
 
-__all__ = ["BaseResultsWriter", "BaseRecordResultsWriter", "BaseSummaryResultsWriter", "BaseProgressResultsWriter", "TextResultsWriter", "XMLResultsWriter", "CSVResultsWriter", "JUnitXMLResultsWriter", "ConsoleSummaryResultsWriter", "ConsoleProgressResultsWriter"]
+__all__ = ["TestResult", "BaseResultsWriter", "BaseRecordResultsWriter", "BaseSummaryResultsWriter", "BaseProgressResultsWriter", "TextResultsWriter", "XMLResultsWriter", "CSVResultsWriter", "JSONLinesResultsWriter", "JUnitXMLResultsWriter", "ConsoleSummaryResultsWriter", "ConsoleProgressResultsWriter", "readJSONLinesResults"]
 
-import time, stat, logging, sys
+import time, stat, logging, sys, json, collections, codecs, locale
 if sys.version_info[0] == 2:
 	from urlparse import urlunparse
+	from StringIO import StringIO
 else:
 	from urllib.parse import urlunparse
+	from io import StringIO
 
 from pysys.constants import *
 from pysys.utils.logutils import ColorLogFormatter
+from pysys.utils.pycompat import PY2
+from pysys.utils.fileutils import backgroundDeleter
 
 from xml.dom.minidom import getDOMImplementation
 
@@ -118,9 +123,9 @@ class BaseResultsWriter(object):
 		This method is always invoked from the same thread as setup() and cleanup(), even 
 		when multiple tests are running in parallel. 
 
-		@param testObj: Reference to an instance of a L{pysys.basetest.BaseTest} class. The writer 
-		can extract data from this object but should not store a reference to it. 
-		The testObj.descriptor.id indicates the test that ran. 
+		@param testObj: The L{TestResult} record for the test that completed. For compatibility this provides 
+		the same descriptor, output, getOutcome() and getOutcomeReason() members as the test object that was 
+		passed in earlier versions of PySys. The testObj.descriptor.id indicates the test that ran. 
 		@param cycle: The cycle number. These start from 0, so please add 1 to this value before using. 
 		@param testTime: Duration of the test in seconds. 
 		@param testStart: The time when the test started. 
@@ -151,9 +156,18 @@ class BaseRecordResultsWriter(BaseResultsWriter):
 	
 	For compatibility reasons writers that do not subclass BaseSummaryResultsWriter or BaseProgressResultsWriter are
 	treated as "record" writers even if they do not inherit from this class.
+	
+	Record writers can be run in the background by setting the background property to true in the project 
+	file. The runner then passes results to the writer through a queue, and processResult is called on a 
+	dedicated thread for this writer so that a slow writer does not delay the reporting of other tests. The 
+	setup and cleanup methods are still called from the main thread, and cleanup is only called once all 
+	queued results have been processed. 
+	
+	@ivar background: Indicates if processResult should be called on a background thread
+	@type background: string (true | false)
 
 	"""
-	pass
+	background = "false"
 
 
 class BaseSummaryResultsWriter(BaseResultsWriter):
@@ -176,6 +190,145 @@ class BaseProgressResultsWriter(BaseResultsWriter):
 	pass
 
 
+class TestResult(object):
+	"""Immutable record of the result of a single test, passed to writers when a test completes. 
+	
+	This holds only the details writers need, so the test object (and its processes, monitors and 
+	outcome call records) can be released as soon as the runner has finished with it. For compatibility 
+	with writers written for earlier versions of PySys, which were passed the test object itself, 
+	this class also provides the C{descriptor}, C{output}, C{outcome} and C{mode} attributes and the 
+	C{getOutcome()} and C{getOutcomeReason()} methods of L{pysys.basetest.BaseTest}, and resolves C{log} 
+	and C{project} to the PySys logger and the project. Other attributes of the test object are not 
+	available. 
+	
+	@ivar id: The id of the test
+	@type id: string
+	@ivar descriptor: The descriptor of the test (shared with the runner, so not copied)
+	@type descriptor: L{pysys.xml.descriptor.XMLDescriptorContainer}
+	@ivar cycle: The cycle number. These start from 0, so please add 1 to this value before using. 
+	@type cycle: integer
+	@ivar outcome: The list of outcomes added by the test, as for L{pysys.basetest.BaseTest}
+	@type outcome: list
+	@ivar finalOutcome: The overall outcome of the test, as defined in L{pysys.constants}
+	@type finalOutcome: integer
+	@ivar mode: The user defined mode the test was run in, or None
+	@type mode: string
+	@ivar outcomeReason: The reason for the overall outcome, or '' if not specified
+	@type outcomeReason: string
+	@ivar testStart: The time when the test started
+	@type testStart: float
+	@ivar testTime: Duration of the test in seconds
+	@type testTime: float
+	@ivar output: Full path to the output directory of the test
+	@type output: string
+	@ivar performanceResults: A tuple of (resultKey, value, unit) tuples for each performance 
+	result reported by the test
+	@type performanceResults: tuple
+	
+	"""
+	__slots__ = ['id', 'descriptor', 'cycle', 'outcome', 'finalOutcome', 'outcomeReason', 'testStart', 'testTime', 'output', 
+		'performanceResults', 'mode']
+	
+	def __init__(self, descriptor, cycle, outcome, outcomeReason, testStart, testTime, output, performanceResults=(), mode=None):
+		"""Create an instance of the TestResult class. 
+		
+		Use L{fromTest} to create a TestResult from a test object. 
+		
+		@param outcome: The list of outcomes added by the test, or a single outcome
+		
+		"""
+		outcome = list(outcome) if isinstance(outcome, (list, tuple)) else [outcome]
+		finalOutcome = sorted(outcome, key=PRECEDENT.index)[0] if outcome else NOTVERIFIED
+		for name, value in [('id', descriptor.id), ('descriptor', descriptor), ('cycle', cycle), ('outcome', outcome), 
+				('finalOutcome', finalOutcome), ('outcomeReason', outcomeReason), ('testStart', testStart), 
+				('testTime', testTime), ('output', output), ('performanceResults', tuple(performanceResults)), ('mode', mode)]:
+			object.__setattr__(self, name, value)
+	
+	@staticmethod
+	def fromTest(testObj, cycle=0, testStart=0, testTime=0):
+		"""Create a TestResult from a test object that has completed. 
+		
+		@param testObj: Reference to an instance of a L{pysys.basetest.BaseTest} class
+		@param cycle: The cycle number
+		@param testStart: The time when the test started
+		@param testTime: Duration of the test in seconds
+		@return: The new TestResult
+		@rtype: L{TestResult}
+		
+		"""
+		return TestResult(testObj.descriptor, cycle, testObj.outcome, testObj.getOutcomeReason(), 
+			testStart, testTime, testObj.output, getattr(testObj, 'performanceResults', ()), getattr(testObj, 'mode', None))
+	
+	def __setattr__(self, name, value):
+		raise AttributeError('TestResult is immutable')
+
+	def __getattr__(self, name):
+		# only called for attributes not found by normal lookup
+		if name == 'log': 
+			import pysys
+			return pysys.log
+		if name == 'project': 
+			import pysys.constants
+			return pysys.constants.PROJECT
+		raise AttributeError('TestResult has no attribute %r; writers are passed a TestResult record rather than the test object, '
+			'which provides only the descriptor, output, outcome, mode, log and project attributes of the test'%name)
+
+	def getOutcome(self): 
+		"""Get the overall outcome of the test. Provided for compatibility with L{pysys.basetest.BaseTest}. 
+		
+		@return: The overall outcome
+		@rtype:  integer
+		
+		"""
+		return self.finalOutcome
+	
+	def getOutcomeReason(self): 
+		"""Get the reason for the overall outcome. Provided for compatibility with L{pysys.basetest.BaseTest}. 
+		
+		@return: The overall test outcome reason or '' if not specified
+		@rtype:  string
+		
+		"""
+		return self.outcomeReason
+	
+	def __repr__(self):
+		return 'TestResult(%s, cycle=%d, %s)'%(self.id, self.cycle+1, LOOKUP[self.finalOutcome])
+
+
+class _XMLStreamWriter(object):
+	"""Writes XML to a UTF-8 file a piece at a time, escaping text and attribute values. 
+	
+	"""
+	__invalidChars = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+	
+	def __init__(self, path):
+		self.fp = open(path, 'wb')
+	
+	def write(self, markup):
+		self.fp.write(markup.encode('utf-8'))
+	
+	def writeText(self, text):
+		self.write(self.escape(text))
+	
+	def attributes(self, attributes):
+		return u''.join(u' %s="%s"'%(name, self.escape(value, quote=True)) for name, value in attributes)
+	
+	def escape(self, text, quote=False):
+		if PY2 and isinstance(text, str): text = text.decode(locale.getpreferredencoding(), 'replace')
+		text = text.replace(u'&', u'&amp;').replace(u'<', u'&lt;').replace(u'>', u'&gt;')
+		if quote: text = text.replace(u'"', u'&quot;').replace(u'\n', u'&#10;').replace(u'\r', u'&#13;').replace(u'\t', u'&#9;')
+		return self.__invalidChars.sub(u'?', text)
+	
+	def tell(self):
+		return self.fp.tell()
+	
+	def seek(self, position):
+		self.fp.seek(position)
+	
+	def close(self):
+		self.fp.close()
+
+
 class flushfile(): 
 	"""Utility class to flush on each write operation - for internal use only.  
 	
@@ -205,6 +358,12 @@ class flushfile():
 		
 		"""
 		if self.fp is not None: self.fp.seek(index)
+
+	def tell(self):
+		"""Return the current position of the file object.
+		
+		"""
+		if self.fp is not None: return self.fp.tell()
 	
 	def close(self):
 		"""Close the file objet.
@@ -249,7 +408,7 @@ class TextResultsWriter(BaseRecordResultsWriter):
 		self.fp = flushfile(open(self.logfile, "w"))
 		self.fp.write('DATE:       %s (GMT)\n' % (time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time())) ))
 		self.fp.write('PLATFORM:   %s\n' % (PLATFORM))
-		self.fp.write('TEST HOST:  %s\n' % (HOSTNAME))
+		self.fp.write('TEST HOST:  %s\n' % (getHostname()))
 
 	def cleanup(self, **kwargs):
 		"""Implementation of the cleanup method. 
@@ -285,8 +444,14 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 	"""Class to log results to logfile in XML format.
 	
 	The class creates a DOM document to represent the test output results and writes the DOM to the 
-	logfile using toprettyxml(). The outputDir, stylesheet, useFileURL attributes of the class can 
-	be over-ridden in the PySys project file using the nested <property> tag on the <writer> tag.
+	logfile using toprettyxml(). The outputDir, stylesheet, useFileURL and streaming attributes of the 
+	class can be over-ridden in the PySys project file using the nested <property> tag on the <writer> tag.
+	
+	By default the whole document is re-written after each test completes, which becomes slow for runs 
+	with many thousands of results. In streaming mode each result is instead appended to the end of the 
+	file together with the closing tags, and only the status and completed attributes of the root element 
+	are updated in place (in a fixed-width region of the start tag), so the file is a valid XML document 
+	whenever it is read. 
 	 
 	@ivar outputDir: Path to output directory to write the test summary files
 	@type outputDir: string
@@ -294,11 +459,14 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 	@type stylesheet: string
 	@ivar useFileURL: Indicates if full file URLs are to be used for local resource references 
 	@type useFileURL: string (true | false)
+	@ivar streaming: Indicates if results are appended to the file rather than re-writing the whole document
+	@type streaming: string (true | false)
 	
 	"""
 	outputDir = None
 	stylesheet = DEFAULT_STYLESHEET
 	useFileURL = "false"
+	streaming = "false"
 
 	def __init__(self, logfile):
 		"""Create an instance of the TextResultsWriter class.
@@ -323,7 +491,8 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 		self.logfile = os.path.join(self.outputDir, self.logfile) if self.outputDir is not None else self.logfile
 		
 		try:
-			self.fp = flushfile(open(self.logfile, "w"))
+			self.__streaming = str(self.streaming).lower() == "true"
+			self.fp = flushfile(open(self.logfile, "wb" if self.__streaming else "w"))
 		
 			impl = getDOMImplementation()
 			self.document = impl.createDocument(None, "pysyslog", None)
@@ -352,7 +521,7 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 
 			# add the test host node
 			element = self.document.createElement("host")
-			element.appendChild(self.document.createTextNode(HOSTNAME))
+			element.appendChild(self.document.createTextNode(getHostname()))
 			self.rootElement.appendChild(element)
 
 			# add the test host node
@@ -375,7 +544,10 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 			self.rootElement.appendChild(element)
 				
 			# write the file out
-			self.fp.write(self.document.toprettyxml(indent="  "))
+			if self.__streaming:
+				self.__writeStreamingHeader()
+			else:
+				self.fp.write(self.document.toprettyxml(indent="  "))
 		except Exception:
 			log.info("caught %s in XMLResultsWriter: %s", sys.exc_info()[0], sys.exc_info()[1], exc_info=1)
 
@@ -388,9 +560,12 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 				
 		"""
 		if self.fp: 
-			self.fp.seek(0)
 			self.statusAttribute.value="complete"
-			self.fp.write(self.document.toprettyxml(indent="  "))
+			if self.__streaming:
+				self.__writeStreamingRootAttributes()
+			else:
+				self.fp.seek(0)
+				self.fp.write(self.document.toprettyxml(indent="  "))
 			self.fp.close()
 			self.fp = None
 			
@@ -403,6 +578,10 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 		@param kwargs: Variable argument list
 		
 		"""	
+		if self.__streaming:
+			self.__processResultStreaming(testObj, **kwargs)
+			return
+		
 		self.fp.seek(0)
 		
 		if "cycle" in kwargs: 
@@ -410,6 +589,83 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 				self.cycle = kwargs["cycle"]
 				self.__createResultsNode()
 		
+		self.resultsElement.appendChild(self.__createResultElement(testObj))
+	
+		# update the count of completed tests
+		self.numResults = self.numResults + 1
+		self.completedAttribute.value="%s/%s" % (self.numResults, self.numTests)
+				
+		# write the file out
+		self.fp.write(self.document.toprettyxml(indent="  "))
+
+	def __processResultStreaming(self, testObj, **kwargs):
+		"""Append the result to the end of the file, followed by the closing tags, then update 
+		the completed attribute of the root element. 
+		
+		"""
+		xml = []
+		if "cycle" in kwargs: 
+			if self.cycle != kwargs["cycle"]:
+				if self.cycle != -1: xml.append('  </results>\n')
+				self.cycle = kwargs["cycle"]
+				xml.append('  <results cycle="%d">\n'%(self.cycle+1))
+		
+		resultElement = self.__createResultElement(testObj)
+		buf = StringIO()
+		resultElement.writexml(buf, indent="    ", addindent="  ", newl="\n")
+		xml.append(buf.getvalue())
+		resultElement.unlink()
+		xml = ''.join(xml).encode('utf-8')
+		
+		closingTags = ('  </results>\n' if self.cycle != -1 else '')+'</pysyslog>\n'
+		self.fp.seek(self.__tailPosition)
+		self.fp.write(xml+closingTags.encode('ascii'))
+		self.__tailPosition += len(xml)
+		
+		# update the count of completed tests
+		self.numResults = self.numResults + 1
+		self.completedAttribute.value="%s/%s" % (self.numResults, self.numTests)
+		self.__writeStreamingRootAttributes()
+
+	def __writeStreamingHeader(self):
+		"""Write the prolog, root start tag and initial child elements for streaming mode. 
+		
+		"""
+		buf = StringIO()
+		buf.write('<?xml version="1.0" encoding="utf-8"?>\n')
+		for node in self.document.childNodes:
+			if node is not self.rootElement: buf.write(node.toxml()+'\n')
+		buf.write('<pysyslog')
+		self.fp.write(buf.getvalue().encode('utf-8'))
+		self.__rootAttributesPosition = self.fp.tell()
+		
+		# reserve enough space for the largest values the attributes will ever have
+		self.__rootAttributesWidth = len(self.__formatRootAttributes('complete', '%d/%d'%(10**12, 10**12)))
+		self.__writeStreamingRootAttributes()
+		
+		buf = StringIO()
+		buf.write('>\n')
+		for node in self.rootElement.childNodes:
+			node.writexml(buf, indent="  ", addindent="  ", newl="\n")
+		self.fp.write(buf.getvalue().encode('utf-8'))
+		self.__tailPosition = self.fp.tell()
+		self.fp.write(b'</pysyslog>\n')
+
+	def __formatRootAttributes(self, status, completed):
+		return ' status="%s" completed="%s"'%(status, completed)
+
+	def __writeStreamingRootAttributes(self):
+		"""Overwrite the attributes of the root element in place, padding with whitespace. 
+		
+		"""
+		attributes = self.__formatRootAttributes(self.statusAttribute.value, self.completedAttribute.value)
+		self.fp.seek(self.__rootAttributesPosition)
+		self.fp.write(attributes.ljust(self.__rootAttributesWidth).encode('ascii'))
+
+	def __createResultElement(self, testObj):
+		"""Create the result element for the specified test. 
+		
+		"""
 		# create the results entry
 		resultElement = self.document.createElement("result")
 		nameAttribute = self.document.createAttribute("id")
@@ -434,15 +690,7 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 		element = self.document.createElement("output")
 		element.appendChild(self.document.createTextNode(self.__pathToURL(testObj.output)))
 		resultElement.appendChild(element)
-		
-		self.resultsElement.appendChild(resultElement)
-	
-		# update the count of completed tests
-		self.numResults = self.numResults + 1
-		self.completedAttribute.value="%s/%s" % (self.numResults, self.numTests)
-				
-		# write the file out
-		self.fp.write(self.document.toprettyxml(indent="  "))
+		return resultElement
 
 	def __createResultsNode(self):
 		self.resultsElement = self.document.createElement("results")
@@ -457,17 +705,33 @@ class XMLResultsWriter(BaseRecordResultsWriter):
 		except Exception:
 			return path
 		else:
-			return urlunparse(["file", HOSTNAME, path.replace("\\", "/"), "","",""])
+			return urlunparse(["file", getHostname(), path.replace("\\", "/"), "","",""])
 	
 	
 class JUnitXMLResultsWriter(BaseRecordResultsWriter):
 	"""Class to log test results in Apache Ant JUnit XML format (one output file per test per cycle). 
 	
+	The XML is streamed directly to the output file, and for failed tests the run.log is copied into the 
+	system-out element in small blocks, so memory usage does not depend on the size of the run.log. The 
+	amount of the run.log that is included can be limited using the maxLogSize property, in which case 
+	only the end of the run.log is included. 
+	
+	If the singleFile property is set to true, a single file containing a test suite with all the results 
+	of the run is written instead of one file per test. The file name is given by the (optional) file 
+	attribute of the writer, defaulting to TEST-pysys.xml. 
+	
 	@ivar outputDir: Path to output directory to write the test summary files
 	@type outputDir: string
+	@ivar maxLogSize: The maximum number of bytes from the end of the run.log to include for a failed 
+	test, or 0 to include it all
+	@type maxLogSize: string
+	@ivar singleFile: Indicates if all results should be written to a single file for the run
+	@type singleFile: string (true | false)
 	
 	"""
 	outputDir = None
+	maxLogSize = "0"
+	singleFile = "false"
 	
 	def __init__(self, logfile):
 		"""Create an instance of the TextResultsWriter class.
@@ -476,6 +740,8 @@ class JUnitXMLResultsWriter(BaseRecordResultsWriter):
 		
 		"""	
 		self.cycle = -1
+		self.logfile = time.strftime(logfile, time.gmtime(time.time())) if logfile else 'TEST-pysys.xml'
+		self.__suite = None
 
 	def setup(self, **kwargs):	
 		"""Implementation of the setup method.
@@ -489,6 +755,14 @@ class JUnitXMLResultsWriter(BaseRecordResultsWriter):
 		if os.path.exists(self.outputDir): self.purgeDirectory(self.outputDir, True)
 		os.makedirs(self.outputDir)
 		self.cycles = kwargs.pop('cycles', 0)
+		
+		if str(self.singleFile).lower() == 'true':
+			# the counts are not known until the end, so reserve space for them in the testsuite start tag
+			self.__suite = _XMLStreamWriter(os.path.join(self.outputDir, self.logfile))
+			self.__suiteCounts = [0, 0, 0] # tests, failures, skipped
+			self.__suite.write(u'<?xml version="1.0" encoding="utf-8"?>\n<testsuite')
+			self.__suiteAttributesPosition = self.__suite.tell()
+			self.__suite.write(self.__suiteAttributes(10**12, 10**12, 10**12)+u'>\n')
 
 	def cleanup(self, **kwargs):
 		"""Implementation of the cleanup method. 
@@ -496,14 +770,19 @@ class JUnitXMLResultsWriter(BaseRecordResultsWriter):
 		@param kwargs: Variable argument list
 				
 		"""
-		pass
+		if self.__suite:
+			self.__suite.write(u'</testsuite>\n')
+			self.__suite.seek(self.__suiteAttributesPosition)
+			self.__suite.write(self.__suiteAttributes(*self.__suiteCounts))
+			self.__suite.close()
+			self.__suite = None
 
 	def processResult(self, testObj, **kwargs):
 		"""Implementation of the processResult method. 
 		
 		Creates a test summary file in the Apache Ant Junit XML format. 
 		
-		@param testObj: Reference to an instance of a L{pysys.basetest.BaseTest} class
+		@param testObj: The L{TestResult} for the test that completed
 		@param kwargs: Variable argument list
 		
 		"""	
@@ -511,73 +790,70 @@ class JUnitXMLResultsWriter(BaseRecordResultsWriter):
 			if self.cycle != kwargs["cycle"]:
 				self.cycle = kwargs["cycle"]
 		
-		impl = getDOMImplementation()		
-		document = impl.createDocument(None, 'testsuite', None)		
-		rootElement = document.documentElement
-		attr1 = document.createAttribute('name')
-		attr1.value = testObj.descriptor.id
-		attr2 = document.createAttribute('tests')
-		attr2.value='1'
-		attr3 = document.createAttribute('failures')
-		attr3.value = '%d'%(int)(testObj.getOutcome() in FAILS)	
-		attr4 = document.createAttribute('skipped')	
-		attr4.value = '%d'%(int)(testObj.getOutcome() == SKIPPED)		
-		rootElement.setAttributeNode(attr1)
-		rootElement.setAttributeNode(attr2)
-		rootElement.setAttributeNode(attr3)
-		rootElement.setAttributeNode(attr4)
-		
-		# add the testcase information
-		testcase = document.createElement('testcase')
-		attr1 = document.createAttribute('classname')
-		attr1.value = testObj.descriptor.classname
-		attr2 = document.createAttribute('name')
-		attr2.value = testObj.descriptor.id		   	
-		testcase.setAttributeNode(attr1)
-		testcase.setAttributeNode(attr2)
-		
-		# add in failure information if the test has failed
-		if (testObj.getOutcome() in FAILS):
-			failure = document.createElement('failure')
-			attr1 = document.createAttribute('message')
-			attr1.value = LOOKUP[testObj.getOutcome()]
-			failure.setAttributeNode(attr1)
-			failure.appendChild(document.createTextNode( testObj.getOutcomeReason() ))		
-						
-			stdout = document.createElement('system-out')
-			fp = open(os.path.join(testObj.output, 'run.log'))
-			stdout.appendChild(document.createTextNode(fp.read()))
-			fp.close()
-			
-			testcase.appendChild(failure)
-			testcase.appendChild(stdout)
-		rootElement.appendChild(testcase)
+		if self.__suite:
+			self.__writeTestcase(self.__suite, testObj)
+			self.__suiteCounts[0] += 1
+			self.__suiteCounts[1] += int(testObj.getOutcome() in FAILS)
+			self.__suiteCounts[2] += int(testObj.getOutcome() == SKIPPED)
+			return
 		
 		# write out the test result
 		if self.cycles > 1:
-			fp = open(os.path.join(self.outputDir,'TEST-%s.%s.xml'%(testObj.descriptor.id, self.cycle+1)), 'w')
+			path = os.path.join(self.outputDir,'TEST-%s.%s.xml'%(testObj.descriptor.id, self.cycle+1))
 		else:
-			fp = open(os.path.join(self.outputDir,'TEST-%s.xml'%(testObj.descriptor.id)), 'w')
-		fp.write(document.toprettyxml(indent='	'))
-		fp.close()
+			path = os.path.join(self.outputDir,'TEST-%s.xml'%(testObj.descriptor.id))
+		fp = _XMLStreamWriter(path)
+		try:
+			fp.write(u'<?xml version="1.0" encoding="utf-8"?>\n<testsuite%s>\n'%fp.attributes([
+				('failures', '%d'%int(testObj.getOutcome() in FAILS)), 
+				('name', testObj.descriptor.id), 
+				('skipped', '%d'%int(testObj.getOutcome() == SKIPPED)), 
+				('tests', '1')]))
+			self.__writeTestcase(fp, testObj)
+			fp.write(u'</testsuite>\n')
+		finally:
+			fp.close()
 
-	def purgeDirectory(self, dir, delTop=False):
-		for file in os.listdir(dir):
-			path = os.path.join(dir, file)
-			if PLATFORM in ['sunos', 'linux']:
-				mode = os.lstat(path)[stat.ST_MODE]
-			else:
-				mode = os.stat(path)[stat.ST_MODE]
+	def __suiteAttributes(self, tests, failures, skipped):
+		attributes = ' failures="%d" name="pysys" skipped="%d" tests="%d"'%(failures, skipped, tests)
+		return attributes.ljust(len(' failures="%d" name="pysys" skipped="%d" tests="%d"'%(10**12, 10**12, 10**12)))
+
+	def __writeTestcase(self, fp, testObj):
+		"""Write the testcase element for a test, including failure information if the test has failed. 
+		
+		"""
+		fp.write(u'\t<testcase%s'%fp.attributes([('classname', testObj.descriptor.classname), ('name', testObj.descriptor.id)]))
+		if testObj.getOutcome() not in FAILS:
+			fp.write(u'/>\n')
+			return
 		
-			if stat.S_ISLNK(mode):
-				os.unlink(path)
-			if stat.S_ISREG(mode):
-				os.remove(path)
-			elif stat.S_ISDIR(mode):
-				self.purgeDirectory(path, delTop=True)
+		fp.write(u'>\n\t\t<failure%s>'%fp.attributes([('message', LOOKUP[testObj.getOutcome()])]))
+		fp.writeText(testObj.getOutcomeReason())
+		fp.write(u'</failure>\n\t\t<system-out>')
+		self.__writeRunLog(fp, os.path.join(testObj.output, 'run.log'))
+		fp.write(u'</system-out>\n\t</testcase>\n')
+	
+	def __writeRunLog(self, fp, path):
+		"""Copy the run.log into the output a block at a time, keeping only the end of the file if it is 
+		larger than maxLogSize. 
+		
+		"""
+		maxLogSize = int(self.maxLogSize or 0)
+		size = os.path.getsize(path)
+		decoder = codecs.getincrementaldecoder(locale.getpreferredencoding())(errors='replace')
+		with open(path, 'rb') as f:
+			if maxLogSize > 0 and size > maxLogSize:
+				f.seek(size-maxLogSize)
+				f.readline() # skip to the start of the next line
+				fp.writeText(u'... run.log truncated, showing the last %d of %d bytes ...\n'%(size-f.tell(), size))
+			while True:
+				data = f.read(64*1024)
+				if not data: break
+				fp.writeText(decoder.decode(data))
+			fp.writeText(decoder.decode(b'', True))
 
-		if delTop: 
-			os.rmdir(dir)
+	def purgeDirectory(self, dir, delTop=False):
+		backgroundDeleter.purge(dir, delTop)
 
 
 class CSVResultsWriter(BaseRecordResultsWriter):
@@ -653,6 +929,120 @@ class CSVResultsWriter(BaseRecordResultsWriter):
 		self.fp.write('%s \n' % ','.join(csv))
 
 
+class JSONLinesResultsWriter(BaseRecordResultsWriter):
+	"""Class to log results to logfile in JSON Lines format (one JSON object per line).
+	
+	Each line is written as soon as the test completes and is never modified, so the file can be read 
+	while the tests are running, and is fast to produce and to parse even for very large numbers of results. 
+	Use L{readJSONLinesResults} to read and filter the results. Each line is a JSON object of the form ::
+	
+	    {"id": "MyTest_001", "title": "...", "cycle": 1, "outcome": "FAILED", "outcomeReason": "...", 
+	     "startTime": 1540000000.0, "duration": 1.23, "output": "/path/to/output", "host": "myhost", 
+	     "performanceResults": [{"resultKey": "...", "value": 123.0, "unit": "/s", "biggerIsBetter": true}]}
+	
+	The cycle starts from 1, startTime is in seconds since the epoch, and duration is in seconds. 
+
+	Writing of the test summary file defaults to the working directory. This can be be over-ridden in the PySys
+	project file using the nested <property> tag on the <writer> tag.
+
+	@ivar outputDir: Path to output directory to write the test summary files
+	@type outputDir: string
+
+	"""
+	outputDir = None
+
+	def __init__(self, logfile):
+		"""Create an instance of the JSONLinesResultsWriter class.
+
+		@param logfile: The filename template for the logging of test results
+
+		"""
+		self.logfile = time.strftime(logfile, time.gmtime(time.time()))
+		self.fp = None
+
+	def setup(self, **kwargs):
+		"""Implementation of the setup method.
+
+		Creates the file handle to the logfile.
+
+		@param kwargs: Variable argument list
+
+		"""
+		self.logfile = os.path.join(self.outputDir, self.logfile) if self.outputDir is not None else self.logfile
+		self.fp = flushfile(open(self.logfile, "w"))
+
+	def cleanup(self, **kwargs):
+		"""Implementation of the cleanup method.
+
+		Closes the file handle to the logfile.
+
+		@param kwargs: Variable argument list
+
+		"""
+		if self.fp:
+			self.fp.close()
+			self.fp = None
+
+	def processResult(self, testObj, **kwargs):
+		"""Implementation of the processResult method.
+
+		Writes a line containing all the details of the test result to the logfile.
+
+		@param testObj: The L{TestResult} for the test that completed
+		@param kwargs: Variable argument list
+
+		"""
+		record = collections.OrderedDict()
+		record['id'] = testObj.descriptor.id
+		record['title'] = testObj.descriptor.title
+		record['cycle'] = kwargs.get('cycle', 0)+1
+		record['outcome'] = LOOKUP[testObj.getOutcome()]
+		record['outcomeReason'] = testObj.getOutcomeReason()
+		record['startTime'] = kwargs.get('testStart', 0)
+		record['duration'] = kwargs.get('testTime', 0)
+		record['output'] = testObj.output
+		record['host'] = getHostname()
+		record['performanceResults'] = [
+			collections.OrderedDict([('resultKey', resultKey), ('value', value), ('unit', str(unit)), 
+				('biggerIsBetter', getattr(unit, 'biggerIsBetter', None))])
+			for (resultKey, value, unit) in getattr(testObj, 'performanceResults', ())]
+		self.fp.write(json.dumps(record)+'\n')
+
+
+def readJSONLinesResults(file, ids=None, outcomes=None, cycles=None, filter=None):
+	"""Read the results from a file written by L{JSONLinesResultsWriter}, returning a generator 
+	that yields a dictionary for each result that matches the specified filters. 
+	
+	The file is read a line at a time, so very large files can be processed without 
+	reading them into memory. For example, to print the ids of all failed tests ::
+	
+	    for result in readJSONLinesResults('testsummary.jsonl', outcomes=['FAILED', 'TIMED OUT']):
+	        print(result['id'])
+	
+	@param file: The full path to the file to read
+	@param ids: An optional list of test ids to include
+	@param outcomes: An optional list of outcomes to include, as strings such as C{'FAILED'}
+	@param cycles: An optional list of cycle numbers to include (starting from 1)
+	@param filter: An optional function that is called with each result dictionary that matches 
+	the other filters, and returns True if the result should be included
+	@return: A generator of dictionaries, one per result
+	
+	"""
+	ids = set(ids) if ids is not None else None
+	outcomes = set(outcomes) if outcomes is not None else None
+	cycles = set(cycles) if cycles is not None else None
+	with open(file) as f:
+		for line in f:
+			line = line.strip()
+			if not line: continue
+			result = json.loads(line)
+			if ids is not None and result['id'] not in ids: continue
+			if outcomes is not None and result['outcome'] not in outcomes: continue
+			if cycles is not None and result['cycle'] not in cycles: continue
+			if filter is not None and not filter(result): continue
+			yield result
+
+
 class ConsoleSummaryResultsWriter(BaseSummaryResultsWriter):
 	"""Default summary writer that is used to list a summary of the test results at the end of execution.
 
@@ -17,7 +17,7 @@
 
 # Contact: moraygrieve@users.sourceforge.net
 
-import os.path, logging, xml.dom.minidom, collections
+import os.path, logging, collections, json, hashlib
 
 from pysys.constants import *
 from pysys import __version__
@@ -70,6 +70,28 @@ PROPERTY_EXPAND_ENV = "(?P<replace>\${%s.(?P<key>.*?)})"
 PROPERTY_EXPAND = "(?P<replace>\${(?P<key>.*?)})"
 PROPERTY_FILE = "(?P<name>^.*)=(?P<value>.*)$"
 
+# incremented whenever the format of the cached project configuration changes
+PROJECT_CACHE_VERSION = 1
+
+_PROPERTY_EXPAND_REGEX = re.compile(PROPERTY_EXPAND, re.M)
+_PROPERTY_FILE_REGEX = re.compile(PROPERTY_FILE, re.M)
+_ENVIRONMENT_REGEXES = {}
+
+def _getEnvironmentRegex(environment):
+	if environment not in _ENVIRONMENT_REGEXES:
+		_ENVIRONMENT_REGEXES[environment] = re.compile(PROPERTY_EXPAND_ENV%environment, re.M)
+	return _ENVIRONMENT_REGEXES[environment]
+
+def _getFileSignature(path):
+	"""Return a JSON-serializable value that changes whenever the specified file is modified, or None 
+	if it does not exist. 
+	"""
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	return [getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size]
+
 
 class XMLProjectParser(object):
 	def __init__(self, dirname, file):
@@ -80,10 +102,15 @@ class XMLProjectParser(object):
 		self.osfamily = 'osfamily'
 		self.properties = {self.rootdir:self.dirname, self.osfamily:OSFAMILY}
 		
+		# the files and environment variables the configuration depends on, for validating cached configurations
+		self.dependentFiles = {self.xmlfile:_getFileSignature(self.xmlfile)}
+		self.dependentEnvironment = {}
+		
 		if not os.path.exists(self.xmlfile):
 			raise Exception("Unable to find supplied project file \"%s\"" % self.xmlfile)
 		
 		try:
+			import xml.dom.minidom
 			self.doc = xml.dom.minidom.parse(self.xmlfile)
 		except Exception:
 			raise Exception(sys.exc_info()[1])
@@ -145,52 +172,56 @@ class XMLProjectParser(object):
 
 
 	def getPropertiesFromFile(self, file):
+		self.dependentFiles[file] = _getFileSignature(file)
 		if os.path.exists(file):
 			try:
 				fp = open(file, "r")
 			except Exception: 
 				pass
 			else:
-				for line in fp.readlines():
-					regex = re.compile(PROPERTY_FILE, re.M)
-					if regex.search(line) is not None:
-						name = re.match(regex, line).group('name')
-						value = re.match(regex, line).group('value')					
-						value = self.expandFromProperty(value, "")				
-						self.properties[name.strip()] = value.strip()
+				with fp:
+					for line in fp:
+						match = _PROPERTY_FILE_REGEX.match(line)
+						if match is not None:
+							value = self.expandFromProperty(match.group('value'), "")
+							self.properties[match.group('name').strip()] = value.strip()
 
 
 	def expandFromEnvironent(self, value, default):
-		regex = re.compile(PROPERTY_EXPAND_ENV%self.environment, re.M)
-		while regex.search(value) is not None:
-			matches = regex.findall(value)				
-			for m in matches:
-				try:
-					insert = os.environ[m[1]]
-				except Exception:
-					if default==value:
-						raise Exception('Cannot expand default property value "%s": cannot resolve %s'%(default or value, m[1]))
-					value = default
-					break
-				value = value.replace(m[0], insert)
-		return value		
+		def lookup(key):
+			self.dependentEnvironment[key] = os.environ.get(key)
+			return self.dependentEnvironment[key]
+		return self.__expand(_getEnvironmentRegex(self.environment), lookup, value, default)
 
 
 	def expandFromProperty(self, value, default):
-		regex = re.compile(PROPERTY_EXPAND, re.M)
-		while regex.search(value) is not None:
-			matches = regex.findall(value)
-			for m in matches:
-				try:
-					insert = self.properties[m[1]]
-				except Exception as e:
-					log.debug('Failed to expand properties in "%s" - %s: %s', value, e.__class__.__name__, e)
-					if default==value:
-						raise Exception('Cannot expand default property value "%s": cannot resolve %s'%(default or value, m[1]))
-					value = default
-					break
-				value = value.replace(m[0], insert)
-		return value
+		return self.__expand(_PROPERTY_EXPAND_REGEX, self.properties.get, value, default)
+
+
+	def __expand(self, regex, lookup, value, default):
+		"""Replace all references matching the regex in a single pass, repeating only if the inserted 
+		values themselves contain references. If any reference cannot be resolved the default is expanded 
+		instead, or if the value is the default an exception is raised. 
+		"""
+		missing = []
+		def replace(match):
+			insert = lookup(match.group('key'))
+			if insert is None:
+				missing.append(match.group('key'))
+				return match.group('replace')
+			return insert
+		
+		while True:
+			expanded = regex.sub(replace, value)
+			if missing:
+				log.debug('Failed to expand properties in "%s" - cannot resolve %s', value, missing[0])
+				if default==value:
+					raise Exception('Cannot expand default property value "%s": cannot resolve %s'%(default or value, missing[0]))
+				value, missing = default, []
+			elif expanded == value:
+				return value
+			else:
+				value = expanded
 
 
 	def getRunnerDetails(self):
@@ -202,14 +233,21 @@ class XMLProjectParser(object):
 
 
 	def getPerformanceReporterDetails(self):
+		mod, classname, summaryfile = self._getPerformanceReporterConfig()
+		return getattr(import_module(mod, sys.path), classname), summaryfile
+
+
+	def _getPerformanceReporterConfig(self):
+		"""Return the (module, classname, summaryfile) of the performance reporter, without importing it. 
+		"""
 		nodeList = self.root.getElementsByTagName('performance-reporter')
-		cls, optionsDict = self._parseClassAndConfigDict(nodeList[0] if nodeList else None, 'pysys.utils.perfreporter.CSVPerformanceReporter')
+		mod, classname, optionsDict = self._parseClassNameAndConfigDict(nodeList[0] if nodeList else None, 'pysys.utils.perfreporter.CSVPerformanceReporter')
 			
 		summaryfile = optionsDict.pop('summaryfile', '')
 		summaryfile = self.expandFromProperty(summaryfile, summaryfile)
 		if optionsDict: raise Exception('Unexpected performancereporter attribute(s): '+', '.join(list(optionsDict.keys())))
 		
-		return cls, summaryfile
+		return mod, classname, summaryfile
 
 
 	def getMakerDetails(self):
@@ -221,7 +259,14 @@ class XMLProjectParser(object):
 
 
 	def createFormatters(self):
-		stdout = runlog = None
+		formatters = self._getFormatterConfigs()
+		return tuple(_createFormatter(formatters.get(name)) for name in ['stdout', 'runlog'])
+
+
+	def _getFormatterConfigs(self):
+		"""Return a dictionary mapping the formatter name to (module, classname, options), without importing it. 
+		"""
+		formatters = {}
 		
 		formattersNodeList = self.root.getElementsByTagName('formatters')
 		if formattersNodeList:
@@ -232,13 +277,9 @@ class XMLProjectParser(object):
 				if fname not in ['stdout', 'runlog']:
 					raise Exception('Formatter "%s" is invalid - must be stdout or runlog'%fname)
 
-				if fname == 'stdout':
-					cls, options = self._parseClassAndConfigDict(formatterNode, 'pysys.utils.logutils.ColorLogFormatter')
-					stdout = cls(options)
-				else:
-					cls, options = self._parseClassAndConfigDict(formatterNode, 'pysys.utils.logutils.BaseLogFormatter')
-					runlog = cls(options)
-		return stdout, runlog
+				formatters[fname] = self._parseClassNameAndConfigDict(formatterNode, 
+					'pysys.utils.logutils.ColorLogFormatter' if fname == 'stdout' else 'pysys.utils.logutils.BaseLogFormatter')
+		return formatters
 
 
 	def getWriterDetails(self):
@@ -273,23 +314,23 @@ class XMLProjectParser(object):
 		
 
 	def addToPath(self):		
-		pathNodeList = self.root.getElementsByTagName('path')
+		_addToPath(self.getPathDetails())
 
-		for pathNode in pathNodeList:
+
+	def getPathDetails(self):
+		"""Return a list of (raw, value) for each python <path>, where value is the normalized directory, 
+		or an empty string if it could not be expanded. 
+		"""
+		paths = []
+		for pathNode in self.root.getElementsByTagName('path'):
 				raw = self.expandFromEnvironent(pathNode.getAttribute("value"), "")
 				value = self.expandFromProperty(raw, "")
 				relative = pathNode.getAttribute("relative")
-				if not value: 
-					log.warn('Cannot add directory to the python <path>: "%s"', raw)
-					continue
-
-				if relative == "true": value = os.path.join(self.dirname, value)
-				value = os.path.normpath(value)
-				if not os.path.isdir(value): 
-					log.warn('Cannot add non-existent directory to the python <path>: "%s"', value)
-				else:
-					log.debug('Adding value to path ')
-					sys.path.append(value)
+				if value:
+					if relative == "true": value = os.path.join(self.dirname, value)
+					value = os.path.normpath(value)
+				paths.append((raw, value))
+		return paths
 
 
 	def writeXml(self):
@@ -309,6 +350,18 @@ class XMLProjectParser(object):
 		@param defaultClass: a string specifying the default fully-qualified class
 		@return: a tuple of (pythonclass, propertiesdict)
 		"""
+		mod, classname, optionsDict = self._parseClassNameAndConfigDict(node, defaultClass)
+		module = import_module(mod, sys.path)
+		cls = getattr(module, classname)
+		return cls, optionsDict
+
+
+	def _parseClassNameAndConfigDict(self, node, defaultClass):
+		"""Parses a dictionary of arbitrary options and a python class name out of the specified XML node, 
+		as for L{_parseClassAndConfigDict} but without importing the module. 
+
+		@return: a tuple of (modulename, classname, propertiesdict)
+		"""
 		optionsDict = {}
 		if node:
 			for att in range(node.attributes.length):
@@ -322,9 +375,93 @@ class XMLProjectParser(object):
 		classname = optionsDict.pop('classname', defaultClass)
 		mod = optionsDict.pop('module', '.'.join(classname.split('.')[:-1]))
 		classname = classname.split('.')[-1]
-		module = import_module(mod, sys.path)
-		cls = getattr(module, classname)
-		return cls, optionsDict
+		return mod, classname, optionsDict
+
+
+def _addToPath(paths):
+	"""Add directories to the python path, as returned by L{XMLProjectParser.getPathDetails}. 
+	"""
+	for raw, value in paths:
+		if not value: 
+			log.warn('Cannot add directory to the python <path>: "%s"', raw)
+		elif not os.path.isdir(value): 
+			log.warn('Cannot add non-existent directory to the python <path>: "%s"', value)
+		else:
+			log.debug('Adding value to path ')
+			sys.path.append(value)
+
+
+def _createFormatter(config):
+	"""Create a formatter from the (module, classname, options) returned by L{XMLProjectParser._getFormatterConfigs}, 
+	or return None if config is None. 
+	"""
+	if config is None: return None
+	mod, classname, options = config
+	return getattr(import_module(mod, sys.path), classname)(options)
+
+
+class ProjectConfigurationCache(object):
+	"""Stores the resolved configuration from a project file, so that subsequent invocations of PySys 
+	do not need to parse the XML, read property files and expand properties again. 
+	
+	The configuration is serialized as JSON in a file named from a hash of the project file path, 
+	and is only used if the project file, any property files it reads (including ones that did not exist), 
+	the values of any environment variables it references, the PySys and Python versions and the 
+	platform are all unchanged. 
+	
+	Caching is disabled unless the C{PYSYS_PROJECT_CACHE_DIR} environment variable is set to the 
+	directory in which to store the cache. 
+	"""
+	def __init__(self, projectFile, cacheDir=None):
+		if cacheDir is None:
+			cacheDir = os.getenv('PYSYS_PROJECT_CACHE_DIR', '')
+		self.projectFile = os.path.abspath(projectFile)
+		self.path = os.path.join(cacheDir, hashlib.sha1(self.projectFile.encode('utf-8')).hexdigest()+'.json') if cacheDir else None
+		
+	def __getKey(self):
+		return [PROJECT_CACHE_VERSION, __version__, list(sys.version_info), sys.platform, self.projectFile, 
+			_getFileSignature(__file__)]
+
+	def load(self):
+		"""Return the cached configuration dictionary, or None if there is no valid cached configuration. 
+		"""
+		if not self.path: return None
+		try:
+			with open(self.path, 'r') as f:
+				cached = json.load(f)
+		except Exception:
+			return None
+		
+		if cached.get('key') != self.__getKey(): return None
+		for file, signature in cached['files'].items():
+			if _getFileSignature(file) != signature: return None
+		for name, value in cached['environment'].items():
+			if os.environ.get(name) != value: return None
+		log.debug('Using cached project configuration from %s', self.path)
+		return cached['configuration']
+
+	def save(self, configuration, files, environment):
+		"""Save the configuration, ignoring any errors since the cache is only an optimization. 
+		
+		@param configuration: The JSON-serializable configuration dictionary. 
+		@param files: A dictionary of the files the configuration was read from, and their signatures before reading.
+		@param environment: A dictionary of the environment variables used by the configuration, and their values. 
+		"""
+		if not self.path: return
+		tmp = '%s.%d.tmp'%(self.path, os.getpid())
+		try:
+			if not os.path.exists(os.path.dirname(self.path)): os.makedirs(os.path.dirname(self.path))
+			with open(tmp, 'w') as f:
+				json.dump({'key':self.__getKey(), 'files':files, 'environment':environment, 
+					'configuration':configuration}, f)
+			try:
+				os.replace(tmp, self.path)
+			except AttributeError: # python 2
+				if os.path.exists(self.path): os.remove(self.path)
+				os.rename(tmp, self.path)
+		except Exception as e:
+			log.debug('Failed to cache project configuration in %s - %s: %s', self.path, e.__class__.__name__, e)
+			if os.path.exists(tmp): os.remove(tmp)
 
 
 class Project(object):
@@ -353,41 +490,60 @@ class Project(object):
 
 		self.projectFile = None
 		if projectFile is not None and os.path.exists(os.path.join(root, projectFile)):
-			from pysys.xml.project import XMLProjectParser
-			try:
-				parser = XMLProjectParser(root, projectFile)
-			except Exception as e: 
-				raise Exception("Error parsing project file \"%s\": %s" % (os.path.join(root, projectFile),sys.exc_info()[1]))
-			else:
+			self.projectFile = os.path.join(root, projectFile)
+			cache = ProjectConfigurationCache(self.projectFile)
+			config = cache.load()
+			if config is None:
+				from pysys.xml.project import XMLProjectParser
+				try:
+					parser = XMLProjectParser(root, projectFile)
+				except Exception as e: 
+					raise Exception("Error parsing project file \"%s\": %s" % (os.path.join(root, projectFile),sys.exc_info()[1]))
 				parser.checkVersions()
-				self.projectFile = os.path.join(root, projectFile)
 				
-				# get the properties
-				properties = parser.getProperties()
-				keys = list(properties.keys())
-				keys.sort()
-				for key in keys: setattr(self, key, properties[key])
+				config = {
+					'properties':parser.getProperties(),
+					'paths':parser.getPathDetails(),
+					'runner':parser.getRunnerDetails(),
+					'maker':parser.getMakerDetails(),
+					'writers':parser.getWriterDetails(),
+					'performanceReporter':parser._getPerformanceReporterConfig(),
+					'formatters':parser._getFormatterConfigs(),
+				}
+				parser.unlink()
+				cache.save(config, parser.dependentFiles, parser.dependentEnvironment)
 				
-				# add to the python path
-				parser.addToPath()
-		
-				# get the runner if specified
-				self.runnerClassname, self.runnerModule = parser.getRunnerDetails()
-		
-				# get the maker if specified
-				self.makerClassname, self.makerModule = parser.getMakerDetails()
-
-				# get the loggers to use
-				self.writers = parser.getWriterDetails()
+			# set the properties as data attributes
+			properties = config['properties']
+			keys = list(properties.keys())
+			keys.sort()
+			for key in keys: setattr(self, key, properties[key])
+			
+			# add to the python path
+			_addToPath(config['paths'])
+	
+			# get the runner and maker if specified
+			self.runnerClassname, self.runnerModule = config['runner']
+			self.makerClassname, self.makerModule = config['maker']
 
-				perfReporterDetails = parser.getPerformanceReporterDetails()
-				self._createPerformanceReporters = lambda testoutdir: [perfReporterDetails[0](self, perfReporterDetails[1], testoutdir)]
+			# get the loggers to use
+			self.writers = config['writers']
 
-				# get the stdout and runlog formatters
-				stdoutformatter, runlogformatter = parser.createFormatters()
-				
-				# set the data attributes
-				parser.unlink()
+			# the default performance reporter is only imported when a run creates it, but a custom one is 
+			# checked now so that a misconfigured project fails immediately
+			perfReporterModule, perfReporterClassname, perfReporterSummaryFile = config['performanceReporter']
+			if (perfReporterModule, perfReporterClassname) != ('pysys.utils.perfreporter', 'CSVPerformanceReporter'):
+				try:
+					getattr(import_module(perfReporterModule, sys.path), perfReporterClassname)
+				except Exception as e:
+					raise Exception("Error loading performance reporter %s.%s from project file \"%s\": %s"%(
+						perfReporterModule, perfReporterClassname, self.projectFile, e))
+			self._createPerformanceReporters = lambda testoutdir: [getattr(import_module(perfReporterModule, sys.path), 
+				perfReporterClassname)(self, perfReporterSummaryFile, testoutdir)]
+
+			# get the stdout and runlog formatters
+			stdoutformatter = _createFormatter(config['formatters'].get('stdout'))
+			runlogformatter = _createFormatter(config['formatters'].get('runlog'))
 
 		if not stdoutformatter: stdoutformatter = ColorLogFormatter({})
 		if not runlogformatter: runlogformatter = BaseLogFormatter({})